@@ -1,11 +1,17 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
 import json
+import time
 from enum import Enum
-import pandas as pd
 from pydantic import BaseModel
 from blackboard import Blackboard, EventType
 from model.LLMClient import LLMClient
-from agents.decorators import agent_error_handler
+from model.async_runtime import run_sync
+from agents.decorators import agent_error_handler, track_latency
+from agents.rule_extractor import RuleBasedExtractor
+from model.catalog_names import CatalogNames
+from model.semantic_cache import SemanticRequirementsCache
+from model.metrics import REQUIREMENTS_EXTRACTIONS
 import re
 
 
@@ -38,13 +44,30 @@ class HardwareRequirements(BaseModel):
     ram: Dict[str, Any]
 
 class BDIAgent:
-    def __init__(self, llm_client: LLMClient, blackboard: Blackboard):
+    def __init__(self, llm_client: LLMClient, blackboard: Blackboard,
+                 rule_extractor: Optional[RuleBasedExtractor] = None, fast_path_threshold: float = 0.7,
+                 catalog: Optional[CatalogNames] = None, name_token_budget: int = 100,
+                 llm_response: bool = False, stream_interval: float = 0.08,
+                 requirements_cache: Optional[SemanticRequirementsCache] = None):
         """
         :param llm_client: Cliente para el modelo de lenguaje (OpenAI/Gemini)
+        :param rule_extractor: Extractor por reglas para consultas comunes (sin LLM)
+        :param fast_path_threshold: Confianza mínima para aceptar el extractor por reglas
+        :param catalog: Nombres de CPU/GPU del catálogo (cargados una vez y compartidos)
+        :param name_token_budget: Tokens máximos por lista de nombres (CPU y GPU) en el prompt
+        :param llm_response: Redactar la respuesta final con el LLM (en streaming) en lugar de la plantilla
+        :param stream_interval: Segundos mínimos entre publicaciones de la respuesta parcial
+        :param requirements_cache: Caché semántica de requisitos; evita el LLM en paráfrasis de consultas previas
         """
         
         self.blackboard = blackboard
         self.llm = llm_client
+        self.catalog = catalog or CatalogNames()
+        self.rule_extractor = rule_extractor or RuleBasedExtractor(self.catalog)
+        self.name_token_budget = name_token_budget
+        self.fast_path_threshold = fast_path_threshold
+        self.stream_interval = stream_interval
+        self.requirements_cache = requirements_cache
         self.current_beliefs = {}  # Creencias actuales del sistema
         self.user_desires = {}  # Deseos expresados por el usuario
         self.intentions = []  # Planes de acción generados
@@ -57,9 +80,10 @@ class BDIAgent:
         
         self.blackboard.subscribe(
             EventType.OPTIMIZATION_DONE,
-            self.generate_user_response
+            self.generate_user_response_llm if llm_response else self.generate_user_response
         )
          
+    @track_latency
     @agent_error_handler
     def extract_requirements(self):
         """
@@ -68,23 +92,27 @@ class BDIAgent:
         2. Identificación de deseos (Desires)
         3. Generación de intenciones (Intentions)
         """
-        # Paso 1: Extraer información cruda con LLM
-
-        cpu = pd.read_csv('src/data/component_specs/CPU_specs.csv')
-        cpu_names = cpu['Model_Name'].unique().tolist()
-        
-        gpu = pd.read_csv('src/data/component_specs/GPU_specs.csv')
-        gpu_names = cpu['Model_Name'].unique().tolist()
+        # Paso 1: Extraer información cruda (reglas locales; LLM si la confianza es baja)
+        user_input = self.blackboard.get("user_input")
+        text = user_input.get("user_input", "") if isinstance(user_input, dict) else str(user_input or "")
+        raw_data = self._extract_with_rules(text)
+        requirements, vector = None, None
+        
+        if raw_data is None:
+            # Paráfrasis de una consulta ya resuelta por el LLM: se reutilizan sus requisitos
+            requirements, vector = self._lookup_cached_requirements(text)
+            
+        if raw_data is None and requirements is None:
+            # Solo los nombres del catálogo más parecidos a la petición, dentro del presupuesto de tokens
+            cpu_names = self.catalog.shortlist('CPU', text, self.name_token_budget)
+            gpu_names = self.catalog.shortlist('GPU', text, self.name_token_budget)
 
-        raw_data = self._ask_llm(self.blackboard.get("user_input"), cpu_names, gpu_names)
+            raw_data = self._ask_llm(text, cpu_names, gpu_names)
+            REQUIREMENTS_EXTRACTIONS.inc(path='llm')
         
         # Paso 2: Validar y normalizar
-        try:
-            requirements = self._validate_output(raw_data)
-        except Exception as e:
-            raw_data['use_case'] = "general"
-            print(f"⚠️ Error: {str(e)}. Usando valores por defecto en use_case 'general'.")
-            requirements = self._validate_output(raw_data)
+        if requirements is None:
+            requirements = self._validate_and_cache(text, raw_data, vector)
         
         
         # Paso 3: Actualizar estados internos
@@ -99,9 +127,119 @@ class BDIAgent:
 
         print("[BDIAgent] Requerimientos extraíos")
         
+    def _extract_with_rules(self, text: str) -> Optional[Dict[str, Any]]:
+        """Extracción local por reglas; None si la confianza no alcanza el umbral"""
+        raw_data, confidence = self.rule_extractor.extract(text)
+        if confidence < self.fast_path_threshold:
+            return None
+        
+        REQUIREMENTS_EXTRACTIONS.inc(path='rules')
+        print(f"[BDIAgent] Requerimientos extraídos por reglas (confianza {confidence:.2f})")
+        return raw_data
+        
+    def extract_requirements_batch(self, texts: List[str], max_concurrency: int = 8) -> List[HardwareRequirements]:
+        """
+        Extrae los requisitos de muchas consultas a la vez, sin pasar por el blackboard
+        (barridos de evaluación). Cada texto sigue la misma vía que extract_requirements:
+        reglas, caché semántica y, para el resto, el LLM. Las consultas al LLM se lanzan
+        concurrentemente (como mucho max_concurrency a la vez, además de los límites del
+        proveedor del cliente) y los textos repetidos se consultan una sola vez.
+        Si la consulta de un texto falla, se usa la extracción por reglas aunque su confianza sea baja.
+        
+        :return: Requisitos validados, en el orden de texts
+        """
+        results: List[Optional[HardwareRequirements]] = [None] * len(texts)
+        pending: Dict[str, List[Tuple[int, Any]]] = {}  # prompt -> [(índice, embedding)]
+        
+        for i, text in enumerate(texts):
+            raw_data = self._extract_with_rules(text)
+            if raw_data is not None:
+                results[i] = self._validate_and_cache(text, raw_data)
+                continue
+            requirements, vector = self._lookup_cached_requirements(text)
+            if requirements is not None:
+                results[i] = requirements
+                continue
+            prompt = self._build_extraction_prompt(
+                text,
+                self.catalog.shortlist('CPU', text, self.name_token_budget),
+                self.catalog.shortlist('GPU', text, self.name_token_budget)
+            )
+            pending.setdefault(prompt, []).append((i, vector))
+        
+        prompts = list(pending)
+        responses = run_sync(self._agenerate_all(prompts, max_concurrency)) if prompts else []
+        
+        for prompt, response in zip(prompts, responses):
+            for i, vector in pending[prompt]:
+                if isinstance(response, Exception):
+                    print(f"[BDIAgent] Error del LLM en la consulta {i} ({str(response)}); usando extracción por reglas")
+                    raw_data, _ = self.rule_extractor.extract(texts[i])
+                    results[i] = self._validate_and_cache(texts[i], raw_data)
+                    continue
+                REQUIREMENTS_EXTRACTIONS.inc(path='llm')
+                try:
+                    raw_data = self._parse_llm_json(response)
+                except ValueError as e:
+                    print(f"[BDIAgent] Respuesta inválida en la consulta {i} ({str(e)}); usando extracción por reglas")
+                    raw_data, _ = self.rule_extractor.extract(texts[i])
+                    vector = None
+                results[i] = self._validate_and_cache(texts[i], raw_data, vector)
+        
+        print(f"[BDIAgent] Lote de {len(texts)} consultas: {sum(len(v) for v in pending.values())} por LLM ({len(prompts)} llamadas)")
+        return results
+        
+    async def _agenerate_all(self, prompts: List[str], max_concurrency: int) -> List[Any]:
+        """Respuestas del LLM en el orden de prompts; los errores se devuelven en su posición"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def generate(prompt: str) -> str:
+            async with semaphore:
+                return await self.llm.agenerate(prompt)
+        
+        return await asyncio.gather(*(generate(prompt) for prompt in prompts), return_exceptions=True)
+        
+    def _validate_and_cache(self, text: str, raw_data: Dict, vector: Any = None) -> HardwareRequirements:
+        """Valida los datos extraídos y, si venían limpios del LLM (con embedding), los guarda en la caché semántica"""
+        try:
+            requirements = self._validate_output(raw_data)
+        except Exception as e:
+            print(f"⚠️ Error: {str(e)}. Usando valores por defecto en use_case 'general'.")
+            return self._fallback_requirements(text, raw_data)
+        
+        if self.requirements_cache is not None and vector is not None:
+            self.requirements_cache.store(text, requirements, vector)
+        return requirements
+        
+    def _fallback_requirements(self, text: str, raw_data: Any) -> HardwareRequirements:
+        """Reintenta con use_case 'general'; si tampoco valida, usa la extracción por reglas del texto"""
+        try:
+            return self._validate_output({**raw_data, 'use_case': "general"})
+        except Exception as e:
+            print(f"⚠️ Error: {str(e)}. Usando la extracción por reglas.")
+        
+        raw_data, _ = self.rule_extractor.extract(text)
+        if not raw_data:
+            # Combinación de casos de uso que las reglas no admiten: valores por defecto de 'general'
+            raw_data, _ = self.rule_extractor.extract("")
+        return self._validate_output(raw_data)
+        
+    def _lookup_cached_requirements(self, text: str):
+        """(requisitos de una consulta equivalente o None, embedding de la consulta para guardarla después)"""
+        if self.requirements_cache is None or not text.strip():
+            return None, None
+        vector = self.requirements_cache.embed(text)
+        requirements = self.requirements_cache.lookup(text, vector)
+        if requirements is not None:
+            REQUIREMENTS_EXTRACTIONS.inc(path='cache')
+        return requirements, vector
+        
     def _ask_llm(self, text: str, cpu_names, gpu_names) -> Dict[str, Any]:
         """Consulta al modelo de lenguaje para extracción estructurada"""
-        
+        response = self.llm.generate(self._build_extraction_prompt(text, cpu_names, gpu_names))
+        return self._parse_llm_json(response)
+
+    def _build_extraction_prompt(self, text: str, cpu_names, gpu_names) -> str:
         sytem_prompt = f"""
             Eres un experto en hardware de computadoras. Extrae los siguientes datos del texto:
             
@@ -188,9 +326,9 @@ class BDIAgent:
             - cpu : {cpu_names}
             - gpu : {gpu_names}
             """
-        prompt = f"{sytem_prompt}\n{anser_prompt}\n{rules}"        
-        response = self.llm.generate(prompt)
-        
+        return f"{sytem_prompt}\n{anser_prompt}\n{rules}"
+
+    def _parse_llm_json(self, response: str) -> Dict[str, Any]:
         try:
             return json.loads(response) 
         except json.JSONDecodeError:
@@ -271,6 +409,7 @@ class BDIAgent:
         
         return [questions[field] for field in self.current_beliefs['missing_fields'] if field in questions]
     
+    @track_latency
     @agent_error_handler
     def generate_user_response(self):
         """
@@ -289,10 +428,16 @@ class BDIAgent:
                     for comp_name, meta in comps.items():
                         response += comp_name + ":\n" + self._format_component_description(comp_name, meta) + "\n"
                     break                        
+                for warning in build.get('compatibility_warnings', []):
+                    response += f"⚠️ {warning}\n"
                 response += "\n"
+        elif 'optimization_agent' in (self.blackboard.get("degraded_stages") or []):
+            response = "⏱ Se agotó el tiempo de la petición antes de encontrar una configuración válida. Intenta de nuevo o relaja los requisitos.\n"
         else:
             response = "No se encontraron configuraciones que cumplan con los requisitos del usuario." 
         
+        response += self._degraded_notice()
+        
         self.blackboard.update(
             section="user_response",
             data={"response": response},
@@ -300,10 +445,20 @@ class BDIAgent:
             notify=True
         )
         
+    def _degraded_notice(self) -> str:
+        degraded = self.blackboard.get("degraded_stages") or []
+        if degraded:
+            return "\n⚠️ Resultado parcial: algunas etapas se cortaron por límite de tiempo (" + ", ".join(degraded) + ").\n"
+        return ""
+        
+    @track_latency
+    @agent_error_handler
     def generate_user_response_llm(self):
         """
         Genera una respuesta en lenguaje natural basada en las configuraciones optimizadas
         y contextualizada con el estado interno BDI.
+        El texto se recibe en streaming y se publica en 'partial_response' a medida que llega,
+        para que la interfaz lo muestre antes de que termine la generación.
         """
         user_input = self.blackboard.get("user_input", {}).get("user_input", "")
         optimized_builds = self.blackboard.get("optimized_configs", [])
@@ -385,7 +540,18 @@ class BDIAgent:
             PD: En caso de que no haya ninguna configuracion optimizada, simplemente responde que no se encontraron configuraciones que cumplan con los requisitos del usuario.
         """
         
-        response = self.llm.generate(prompt)
+        response = ""
+        last_publish = 0.0
+        for chunk in self.llm.generate_stream(prompt):
+            if self.blackboard.is_cancelled():
+                return
+            response += chunk
+            now = time.monotonic()
+            if now - last_publish >= self.stream_interval:
+                self.blackboard.update("partial_response", response, "bdi_agent", notify=False)
+                last_publish = now
+        
+        response += self._degraded_notice()
         
         self.blackboard.update(
             section="user_response",
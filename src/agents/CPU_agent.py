@@ -1,10 +1,9 @@
 import json
 import re
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from typing import Dict, List, Any, Tuple
 from agents.BDI_agent import HardwareRequirements, UseCase
-from agents.decorators import agent_error_handler
+from agents.decorators import agent_error_handler, track_latency
 from blackboard import *
 
 class CPUAgent:
@@ -66,6 +65,7 @@ class CPUAgent:
         
         return None
     
+    @track_latency
     @agent_error_handler
     def process_requirements(self):
         """
@@ -94,6 +94,7 @@ class CPUAgent:
         requirement_embedding = self.embedding_model.encode([requirement_text])[0]
         
         # 4. Calcular similitud con todas las CPUs en la base vectorial
+        from sklearn.metrics.pairwise import cosine_similarity  # import diferido (arranque)
         similarities = cosine_similarity(
             [requirement_embedding],
             self.vector_db['embeddings']
@@ -102,6 +103,11 @@ class CPUAgent:
         # 5. Filtrar y puntuar CPUs candidatas
         candidates = []
         for i, metadata in enumerate(self.vector_db['metadata']):
+            # Plazo agotado o petición cancelada: proponer lo encontrado hasta ahora
+            if self.blackboard.should_stop():
+                self.blackboard.mark_degraded('cpu_agent')
+                break
+            
             # 5.1. Procesar precio (convertir de string a float)
             try:
                 if isinstance(metadata.get('Price'), str):
@@ -137,6 +143,7 @@ class CPUAgent:
             # 5.6. Agregar a candidatos válidos
             candidates.append({
                 'metadata': metadata,
+                'catalog_index': i,
                 'similarity': similarities[i],
                 'score': cpu_score,
                 'price': price
@@ -1,9 +1,7 @@
 from time import sleep
-import pandas as pd
 import numpy as np
 from typing import Dict, List, Any
-from sklearn.metrics.pairwise import cosine_similarity
-from agents.decorators import agent_error_handler
+from agents.decorators import agent_error_handler, track_latency
 from blackboard import Blackboard, EventType
 from agents.BDI_agent import HardwareRequirements, UseCase
 import re
@@ -28,6 +26,7 @@ class GPUAgent:
 
     def _load_gpu_benchmarks(self, path: str) -> Dict[str, Dict]:
         """Carga y normaliza los benchmarks de GPU desde CSV"""
+        import pandas as pd  # Solo aquí: pandas pesa en el arranque (ver model/vectorDB.py)
         df = pd.read_csv(path)
         
         df_numeric = df.select_dtypes(include=['int64', 'float64'])
@@ -54,6 +53,7 @@ class GPUAgent:
         name = re.sub(r'(®|™|nvidia|geforce|radeon|amd|\s+)', '', name)
         return name.strip()
 
+    @track_latency
     @agent_error_handler
     def process_requirements(self):
         """Procesa los requisitos del usuario para recomendar GPUs"""
@@ -69,6 +69,7 @@ class GPUAgent:
         requirement_embedding = self.embedding_model.encode([requirement_text])[0]
         
         # Calcular similitud con todas las GPUs
+        from sklearn.metrics.pairwise import cosine_similarity  # import diferido (arranque)
         similarities = cosine_similarity(
             [requirement_embedding],
             self.vector_db['embeddings']
@@ -77,6 +78,11 @@ class GPUAgent:
         # Filtrar GPUs que cumplan con requisitos
         candidates = []
         for i, metadata in enumerate(self.vector_db['metadata']):
+            # Plazo agotado o petición cancelada: proponer lo encontrado hasta ahora
+            if self.blackboard.should_stop():
+                self.blackboard.mark_degraded('gpu_agent')
+                break
+            
             gpu_name = metadata.get('Model_Name', '')
             gpu_bench = self._find_matching_gpu(gpu_name)
             
@@ -105,6 +111,7 @@ class GPUAgent:
             
             candidates.append({
                 'metadata': metadata,
+                'catalog_index': i,
                 'similarity': similarities[i],
                 'benchmark': gpu_bench,
                 'price': price
@@ -1,8 +1,6 @@
 import re
-import pandas as pd
 from typing import Dict, List, Any
-from sklearn.metrics.pairwise import cosine_similarity
-from agents.decorators import agent_error_handler
+from agents.decorators import agent_error_handler, track_latency
 from blackboard import Blackboard, EventType
 from agents.BDI_agent import HardwareRequirements, UseCase
 
@@ -22,6 +20,7 @@ class MotherboardAgent:
             self.process_requirements
         )
 
+    @track_latency
     @agent_error_handler
     def process_requirements(self):
         """Procesa los requisitos y componentes seleccionados para recomendar motherboards"""
@@ -34,6 +33,7 @@ class MotherboardAgent:
         requirement_embedding = self.embedding_model.encode([requirement_text])[0]
         
         # Calcular similitud con todas las motherboards
+        from sklearn.metrics.pairwise import cosine_similarity  # import diferido (arranque)
         similarities = cosine_similarity(
             [requirement_embedding],
             self.vector_db['embeddings']
@@ -42,6 +42,11 @@ class MotherboardAgent:
         # Filtrar motherboards que cumplan con requisitos
         candidates = []
         for i, metadata in enumerate(self.vector_db['metadata']):
+            # Plazo agotado o petición cancelada: proponer lo encontrado hasta ahora
+            if self.blackboard.should_stop():
+                self.blackboard.mark_degraded('motherboard_agent')
+                break
+            
             
             # Verificar restricciones del usuario
             if not self._check_constraints(metadata, requirements.constraints):
@@ -58,6 +63,7 @@ class MotherboardAgent:
             
             candidates.append({
                 'metadata': metadata,
+                'catalog_index': i,
                 'similarity': similarities[i],
                 'price': price,
             })
@@ -1,7 +1,6 @@
 from typing import Dict, List, Any
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from agents.decorators import agent_error_handler
+from agents.decorators import agent_error_handler, track_latency
 from blackboard import Blackboard, EventType
 from agents.BDI_agent import HardwareRequirements, UseCase
 
@@ -21,6 +20,7 @@ class PSUAgent:
             self.process_requirements
         )
 
+    @track_latency
     @agent_error_handler
     def process_requirements(self):
         """Procesa los requisitos del usuario para recomendar fuentes de poder"""
@@ -33,6 +33,7 @@ class PSUAgent:
         requirement_embedding = self.embedding_model.encode([requirement_text])[0]
         
         # Calcular similitud con todas las PSUs
+        from sklearn.metrics.pairwise import cosine_similarity  # import diferido (arranque)
         similarities = cosine_similarity(
             [requirement_embedding],
             self.vector_db['embeddings']
@@ -41,6 +42,11 @@ class PSUAgent:
         # Filtrar y ordenar candidatos
         candidates = []
         for i, metadata in enumerate(self.vector_db['metadata']):
+            # Plazo agotado o petición cancelada: proponer lo encontrado hasta ahora
+            if self.blackboard.should_stop():
+                self.blackboard.mark_degraded('psu_agent')
+                break
+            
             # Verificar presupuesto
             try:
                 price = float(metadata.get('Price', float('inf')))
@@ -53,6 +59,7 @@ class PSUAgent:
             
             candidates.append({
                 'metadata': metadata,
+                'catalog_index': i,
                 'similarity': similarities[i],
                 'price': price
             })
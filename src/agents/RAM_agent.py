@@ -1,8 +1,7 @@
 from typing import Dict, List, Any
 import re
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from agents.decorators import agent_error_handler
+from agents.decorators import agent_error_handler, track_latency
 from blackboard import Blackboard, EventType
 from agents.BDI_agent import HardwareRequirements
 
@@ -22,6 +21,7 @@ class RAMAgent:
             self.process_requirements
         )
 
+    @track_latency
     @agent_error_handler
     def process_requirements(self):
         """Procesa los requisitos del usuario para recomendar módulos RAM"""
@@ -36,6 +36,7 @@ class RAMAgent:
         requirement_embedding = self.embedding_model.encode([requirement_text])[0]
         
         # Calcular similitud con todos los módulos RAM
+        from sklearn.metrics.pairwise import cosine_similarity  # import diferido (arranque)
         similarities = cosine_similarity(
             [requirement_embedding],
             self.vector_db['embeddings']
@@ -44,6 +45,11 @@ class RAMAgent:
         # Filtrar y ordenar candidatos
         candidates = []
         for i, metadata in enumerate(self.vector_db['metadata']):
+            # Plazo agotado o petición cancelada: proponer lo encontrado hasta ahora
+            if self.blackboard.should_stop():
+                self.blackboard.mark_degraded('ram_agent')
+                break
+            
                 
             # Verificar presupuesto
             try:
@@ -57,6 +63,7 @@ class RAMAgent:
             
             candidates.append({
                 'metadata': metadata,
+                'catalog_index': i,
                 'similarity': similarities[i],
                 'price': price
             })
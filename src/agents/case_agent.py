@@ -1,7 +1,6 @@
 from typing import Dict, List, Any
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from agents.decorators import agent_error_handler
+from agents.decorators import agent_error_handler, track_latency
 from blackboard import Blackboard, EventType
 from agents.BDI_agent import HardwareRequirements, UseCase
 
@@ -21,6 +20,7 @@ class CaseAgent:
             self.process_requirements
         )
 
+    @track_latency
     @agent_error_handler
     def process_requirements(self):
         """Procesa los requisitos del usuario para recomendar gabinetes"""
@@ -33,6 +33,7 @@ class CaseAgent:
         requirement_embedding = self.embedding_model.encode([requirement_text])[0]
         
         # Calcular similitud con todos los gabinetes
+        from sklearn.metrics.pairwise import cosine_similarity  # import diferido (arranque)
         similarities = cosine_similarity(
             [requirement_embedding],
             self.vector_db['embeddings']
@@ -44,6 +45,11 @@ class CaseAgent:
         # Filtrar y ordenar candidatos
         candidates = []
         for i, metadata in enumerate(self.vector_db['metadata']):
+            # Plazo agotado o petición cancelada: proponer lo encontrado hasta ahora
+            if self.blackboard.should_stop():
+                self.blackboard.mark_degraded('case_agent')
+                break
+            
             # Verificar compatibilidad con componentes seleccionados
             if not self._check_components_compatibility(metadata, component_proposals):
                 continue
@@ -60,6 +66,7 @@ class CaseAgent:
             
             candidates.append({
                 'metadata': metadata,
+                'catalog_index': i,
                 'similarity': similarities[i],
                 'price': price,
                 'aesthetics_score': self._calculate_aesthetics_score(metadata, requirements)
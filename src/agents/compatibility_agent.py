@@ -1,8 +1,21 @@
-from typing import Dict, List, Any, Tuple, Set
-from dataclasses import dataclass
+from typing import Dict, List, Any, Tuple, Set, Optional, Callable, Iterator, Sequence
+from dataclasses import dataclass, field
 from blackboard import *
-from enum import Enum
-import re
+from enum import Enum, IntEnum
+from agents.decorators import track_latency
+from model.metrics import (
+    COMPATIBILITY_PAIRS, COMPATIBILITY_ISSUES, COMPATIBILITY_MATRIX_LOOKUPS, COMPATIBILITY_CHUNK_SECONDS,
+    COMPATIBILITY_PAIR_CACHE, COMPATIBILITY_RULE_CALLS, COMPATIBILITY_RULE_PAIRS, COMPATIBILITY_RULE_SECONDS
+)
+from model.process_pool import map_in_pool, deadline_checker
+from model.rule_dsl import CompiledRule, compile_features
+from functools import lru_cache
+import hashlib
+import json
+import numpy as np
+import os
+import threading
+import time
 
 class ComponentType(Enum):
     CPU = "CPU"
@@ -16,12 +29,25 @@ class ComponentType(Enum):
     CASE = "Case"
     COOLER = "Cooler"
 
+class RuleId(IntEnum):
+    """Identificador compacto de cada regla (columna de regla en CompatibilityConflicts)"""
+    SOCKET = 0
+    CHIPSET = 1
+    PCIE = 2
+    SIZE = 3
+    RAM_TYPE = 4
+    RAM_SPEED = 5
+    TDP = 6
+    SOCKET_SUPPORT = 7
+    POWER = 8
+
 @dataclass
 class ComponentInfo:
     type: ComponentType
     model_name: str
     key_features: Dict[str, Any]
     full_metadata: Dict[str, Any]
+    catalog_index: Optional[int] = None  # Fila en el catálogo de embeddings (matriz precalculada)
 
 @dataclass
 class CompatibilityIssue:
@@ -31,10 +57,131 @@ class CompatibilityIssue:
     reason: str
     severity: str  # "critical", "warning", "info"
 
+@dataclass
+class CompatibilityConflicts:
+    """
+    Incompatibilidades de una petición en forma compacta: por par de tipos (en orden de llegada),
+    un array int32 (k, 3) con (índice_a, índice_b, RuleId), ordenado por esas columnas. Los índices
+    son posiciones en las propuestas consolidadas de cada tipo. Los motivos no se guardan: issues()
+    los genera ejecutando la regla solo cuando se construye el reporte.
+    `unverified` son los pares de tipos cuyas reglas no críticas no llegaron a evaluarse por plazo:
+    sus incompatibilidades críticas sí están en `pairs`, pero sus builds no están verificadas del todo.
+    """
+    pairs: Dict[Tuple[str, str], np.ndarray] = field(default_factory=dict)
+    unverified: Set[Tuple[str, str]] = field(default_factory=set)
+
+    def __len__(self) -> int:
+        return sum(len(array) for array in self.pairs.values())
+
+    def __iter__(self) -> Iterator[Tuple[str, int, str, int, RuleId]]:
+        for (type_a, type_b), array in self.pairs.items():
+            for index_a, index_b, rule in array.tolist():
+                yield type_a, index_a, type_b, index_b, RuleId(rule)
+
+    def severities(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for array in self.pairs.values():
+            for rule, count in zip(*np.unique(array[:, 2], return_counts=True)):
+                counts[rule_severity(RuleId(rule))] = counts.get(rule_severity(RuleId(rule)), 0) + int(count)
+        return counts
+
+    def issues(self, components: Dict[ComponentType, List[ComponentInfo]]) -> List[CompatibilityIssue]:
+        """Incompatibilidades con componentes y motivo, para el reporte"""
+        compatibility_rules = CompatibilityAgent._load_compatibility_rules()
+        issues = []
+        for type_a, index_a, type_b, index_b, rule in self:
+            component_a = components[ComponentType(type_a)][index_a]
+            component_b = components[ComponentType(type_b)][index_b]
+            _, swapped = _rules_for_pair(compatibility_rules, component_a.type, component_b.type)
+            rule_func = rule_function(rule)
+            if swapped:
+                _, reason = rule_func(component_b, component_a)
+            else:
+                _, reason = rule_func(component_a, component_b)
+            issues.append(CompatibilityIssue(
+                component_a=component_a,
+                component_b=component_b,
+                rule=rule_func.__name__,
+                reason=reason,
+                severity=rule_severity(rule)
+            ))
+        return issues
+
+class RuleProfile:
+    """
+    Perfil acumulado de cada regla: llamadas, pares evaluados, pares rechazados y tiempo.
+    Los bloques del pool devuelven sus estadísticas; aquí se suman, se exportan a métricas y se
+    usan para ordenar la evaluación (primero las reglas baratas y muy selectivas).
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def record(self, rules: List[CompiledRule], stats: np.ndarray):
+        """:param stats: (regla, [llamadas, pares, rechazados, segundos]) en el orden de rules"""
+        with self._lock:
+            for rule, row in zip(rules, stats):
+                if not row[0]:
+                    continue
+                calls, pairs, rejected, seconds = map(float, row)
+                self._stats[rule.__name__] = self._stats.get(rule.__name__, np.zeros(4)) + row
+                COMPATIBILITY_RULE_CALLS.inc(calls, rule=rule.__name__)
+                COMPATIBILITY_RULE_PAIRS.inc(pairs - rejected, rule=rule.__name__, result='passed')
+                COMPATIBILITY_RULE_PAIRS.inc(rejected, rule=rule.__name__, result='rejected')
+                COMPATIBILITY_RULE_SECONDS.inc(seconds, rule=rule.__name__)
+
+    def cost(self, rule: CompiledRule) -> float:
+        """
+        Segundos por par rechazado (coste por par / tasa de rechazo). Las reglas sin datos cuestan 0
+        para evaluarse pronto y perfilarse; las que nunca rechazan quedan al final.
+        """
+        calls, pairs, rejected, seconds = self._stats.get(rule.__name__, np.zeros(4))
+        if not pairs:
+            return 0.0
+        return seconds / max(rejected, pairs * 1e-3)
+
+    def order(self, rules: List[CompiledRule]) -> Tuple[int, ...]:
+        """Posiciones de las reglas en orden de evaluación: primero las críticas, después por coste"""
+        with self._lock:
+            return tuple(sorted(range(len(rules)), key=lambda p: (not _is_critical(rules[p]), self.cost(rules[p]))))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {'calls': int(calls), 'pairs': int(pairs), 'rejection_rate': float(rejected / pairs) if pairs else 0.0,
+                       'seconds': float(seconds)}
+                for name, (calls, pairs, rejected, seconds) in self._stats.items()
+            }
+
 class CompatibilityAgent:
-    def __init__(self, blackboard: Blackboard):
+    def __init__(self, blackboard: Blackboard, matrix_store=None, chunk_size: Optional[int] = None,
+                 short_circuit: Optional[bool] = None):
+        """
+        :param matrix_store: CompatibilityMatrixStore con la matriz precalculada del catálogo
+                             (src/build_compat_matrix.py); sin ella las reglas se evalúan en cada petición
+        :param chunk_size: Filas del primer tipo por tarea del pool (COMPATIBILITY_CHUNK_SIZE, 64 por defecto)
+        :param short_circuit: No evaluar (ni reportar) reglas no críticas sobre pares ya incompatibles por
+                              una regla crítica (COMPATIBILITY_SHORT_CIRCUIT, activo por defecto)
+        """
         self.blackboard = blackboard
+        self.matrix_store = matrix_store
+        self.chunk_size = chunk_size or int(os.getenv("COMPATIBILITY_CHUNK_SIZE", "64"))
+        if short_circuit is None:
+            short_circuit = os.getenv("COMPATIBILITY_SHORT_CIRCUIT", "1") != "0"
+        self.short_circuit = short_circuit
         self.compatibility_rules = self._load_compatibility_rules()
+        self.rule_profile = RuleProfile()
+        
+        # Resultado por par de tipos (en el orden de las reglas): {par: ((huellas_a, huellas_b), filas)}
+        self._pair_cache: Dict[Tuple[ComponentType, ComponentType], Tuple[Tuple[tuple, tuple], np.ndarray]] = {}
+        self._cache_lock = threading.Lock()
+        
+        # Evaluar cada par en cuanto sus dos tipos tengan propuestas
+        self.blackboard.subscribe(
+            EventType.COMPONENTS_PROPOSED,
+            self.evaluate_ready_pairs
+        )
         
         # Suscribirse a eventos de actualización de componentes
         self.blackboard.subscribe(
@@ -42,45 +189,28 @@ class CompatibilityAgent:
             self.check_compatibility
         )
 
-    def _load_compatibility_rules(self) -> Dict[Tuple[ComponentType, ComponentType], List[Callable]]:
-        """Carga las reglas de compatibilidad entre pares de componentes"""
-        rules = {}
-        
-        # Reglas CPU-Motherboard
-        rules[(ComponentType.CPU, ComponentType.MOTHERBOARD)] = [
-            self._validate_socket_compatibility,
-            self._validate_chipset_compatibility
-        ]
-        
-        # Reglas CPU-Cooler
-        rules[(ComponentType.CPU, ComponentType.COOLER)] = [
-            self._validate_tdp_compatibility,
-            self._validate_socket_support
-        ]
-        
-        # Reglas GPU-Motherboard
-        rules[(ComponentType.GPU, ComponentType.MOTHERBOARD)] = [
-            self._validate_pcie_compatibility
-        ]
-        
-        # Reglas GPU-Case
-        rules[(ComponentType.GPU, ComponentType.CASE)] = [
-            self._validate_size_compatibility
-        ]
-        
-        # Reglas RAM-Motherboard
-        rules[(ComponentType.RAM, ComponentType.MOTHERBOARD)] = [
-            self._validate_ram_type_compatibility,
-            self._validate_ram_speed_compatibility
-        ]
-        
-        # Reglas PSU-GPU
-        rules[(ComponentType.PSU, ComponentType.GPU)] = [
-            self._validate_power_compatibility
-        ]
-        
-        return rules
+    @classmethod
+    def _load_compatibility_rules(cls) -> Dict[Tuple[ComponentType, ComponentType], List[CompiledRule]]:
+        """
+        Reglas de compatibilidad compiladas (RULE_SPECS) por par de componentes.
+        La clave sigue el orden de los lados de cada regla: (tipo del 1.º, tipo del 2.º).
+        """
+        return _compiled_rules()
 
+    @track_latency
+    def evaluate_ready_pairs(self):
+        """
+        Evalúa los pares de tipos cuyos dos lados ya propusieron, sin esperar al resto de agentes.
+        Solo se recalculan los pares cuyas propuestas cambiaron (p. ej. un agente que vuelve a proponer).
+        """
+        if self.blackboard.is_cancelled():
+            return
+        components = self._extract_component_info(self.blackboard.get_proposed_components())
+        result = self._pair_results(components)
+        if result is not None and result[1]:
+            self.blackboard.mark_degraded('compatibility_agent')
+
+    @track_latency
     def check_compatibility(self):
         """Verifica la compatibilidad entre todos los componentes propuestos"""
         component_proposals = self.blackboard.get_consolidated_components() or {}
@@ -91,45 +221,144 @@ class CompatibilityAgent:
         # Extraer información estructurada de los componentes
         components = self._extract_component_info(component_proposals)
         
-        # Verificar todas las combinaciones posibles de componentes
-        issues = []
-        component_types = list(components.keys())
+        # Pares ya evaluados mientras llegaban las propuestas; se calculan solo los que falten
+        result = self._pair_results(components)
+        if result is None:
+            return  # Petición cancelada
+        found, out_of_time = result
+        conflicts = assemble_conflicts(components, found, self.compatibility_rules, out_of_time)
+        
+        if out_of_time:
+            self.blackboard.mark_degraded('compatibility_agent')
         
-        for i, type_a in enumerate(component_types):
-            for type_b in component_types[i+1:]:
-                # Verificar si hay reglas para este par
-                rule_key = (type_a, type_b)
-                reverse_key = (type_b, type_a)
-                
-                rules = self.compatibility_rules.get(rule_key, [])
-                if not rules:
-                    rules = self.compatibility_rules.get(reverse_key, []) 
-                
-                for component_a in components[type_a]:
-                    for component_b in components[type_b]:
-                        for rule_func in rules:
-                            is_compatible, reason = rule_func(component_a, component_b)
-                            
-                            if not is_compatible:
-                                severity = "critical" if "socket" in reason.lower() else "warning"
-                                issues.append(CompatibilityIssue(
-                                    component_a=component_a,
-                                    component_b=component_b,
-                                    rule=rule_func.__name__,
-                                    reason=reason,
-                                    severity=severity
-                                ))
+        for severity, count in conflicts.severities().items():
+            COMPATIBILITY_ISSUES.inc(count, severity=severity)
         
-        # Actualizar el blackboard con los problemas encontrados
+        # Actualizar el blackboard con los problemas encontrados (índices en las propuestas consolidadas)
         self.blackboard.update(
             section='compatibility_issues',
-            data=issues,
+            data=conflicts,
             agent_id='compatibility_agent',
             notify=True
         )
 
         print("[CompatibilityAgent] Reglas de compatibilidad definidas")
 
+    def _rule_pairs(self, components: Dict[ComponentType, List[ComponentInfo]]) -> List[Tuple[ComponentType, ComponentType]]:
+        """Pares de tipos con reglas (en el orden de las reglas) cuyos dos lados tienen candidatos"""
+        return [
+            pair for pair in self.compatibility_rules
+            if components.get(pair[0]) and components.get(pair[1])
+        ]
+
+    def _pair_results(self, components: Dict[ComponentType, List[ComponentInfo]]
+                      ) -> Optional[Tuple[Dict[Tuple[ComponentType, ComponentType], np.ndarray], bool]]:
+        """
+        Incompatibilidades de cada par con candidatos en ambos lados: de la caché si las propuestas
+        de los dos tipos no cambiaron; el resto se evalúa (matriz precalculada o reglas) y se guarda.
+        Devuelve ({par: filas (índice_1.º, índice_2.º, RuleId)}, pares con reglas no críticas sin evaluar
+        por plazo) o None si se canceló.
+        """
+        with self._cache_lock:
+            keys = {comp_type: tuple(fingerprint(c) for c in comps) for comp_type, comps in components.items()}
+            found = {}
+            stale = []
+            for pair in self._rule_pairs(components):
+                cached = self._pair_cache.get(pair)
+                if cached is not None and cached[0] == (keys[pair[0]], keys[pair[1]]):
+                    found[pair] = cached[1]
+                else:
+                    stale.append(pair)
+            COMPATIBILITY_PAIR_CACHE.inc(len(found), result='hit')
+            COMPATIBILITY_PAIR_CACHE.inc(len(stale), result='miss')
+            if not stale:
+                return found, set()
+            
+            result = self._evaluate_pairs(components, stale)
+            if result is None:
+                return None
+            evaluated, out_of_time = result
+            for pair in stale:
+                found[pair] = evaluated[pair]
+                if pair not in out_of_time:
+                    self._pair_cache[pair] = ((keys[pair[0]], keys[pair[1]]), evaluated[pair])
+            return found, out_of_time
+
+    def _evaluate_pairs(self, components: Dict[ComponentType, List[ComponentInfo]],
+                        pairs: List[Tuple[ComponentType, ComponentType]]):
+        """Evalúa los pares indicados: lectura de bits en la matriz si la cubre; si no, reglas en el pool"""
+        found = {}
+        pending = []
+        for first, second in pairs:
+            rows = None
+            if self.matrix_store is not None:
+                rows = self.matrix_store.lookup_pair(first, components[first], second, components[second],
+                                                     self.short_circuit)
+                COMPATIBILITY_MATRIX_LOOKUPS.inc(result='hit' if rows is not None else 'fallback')
+            if rows is not None:
+                found[(first, second)] = rows
+            else:
+                pending.append((first, second))
+        if not pending:
+            return found, set()
+        
+        result = self._evaluate_rules(components, pending)
+        if result is None:
+            return None
+        evaluated, out_of_time = result
+        found.update(evaluated)
+        return found, out_of_time
+
+    def _evaluate_rules(self, components: Dict[ComponentType, List[ComponentInfo]],
+                        pairs: List[Tuple[ComponentType, ComponentType]]):
+        """
+        Evalúa las reglas en el pool de procesos: cada par de tipos es independiente y los pares
+        grandes se dividen en bloques de chunk_size filas del primer tipo. Las tareas llevan
+        entradas compactas (nombre + key_features) y los bloques se unen en orden.
+        Devuelve ({par: filas}, pares que agotaron el plazo) o None si se canceló.
+        """
+        self._record_pair_evaluations(components, pairs)
+        # Las reglas críticas se completan aunque venza el plazo; el resto se corta al vencer
+        deadline = self.blackboard.stage_deadline()
+        features = {
+            comp_type: [(c.model_name, c.key_features) for c in comps]
+            for comp_type, comps in components.items()
+        }
+        
+        tasks = []  # (par, desplazamiento de las filas)
+        arguments = []
+        for first, second in pairs:
+            # Orden de las reglas según el perfil acumulado: si se agota el plazo, ya se evaluaron las más útiles
+            order = self.rule_profile.order(self.compatibility_rules[(first, second)])
+            for offset in range(0, len(features[first]), self.chunk_size):
+                tasks.append(((first, second), offset))
+                arguments.append((first.value, features[first][offset:offset + self.chunk_size],
+                                  second.value, features[second], deadline, order, self.short_circuit))
+        
+        results = map_in_pool(evaluate_compatibility_chunk, arguments, should_stop=self.blackboard.is_cancelled)
+        if results is None:
+            return None
+        
+        out_of_time = set()
+        chunks: Dict[Tuple[ComponentType, ComponentType], List[np.ndarray]] = {pair: [] for pair in pairs}
+        for (pair, offset), (rows, chunk_out_of_time, seconds, stats) in zip(tasks, results):
+            COMPATIBILITY_CHUNK_SECONDS.observe(seconds, type_a=pair[0].value, type_b=pair[1].value)
+            self.rule_profile.record(self.compatibility_rules[pair], stats)
+            if chunk_out_of_time:
+                out_of_time.add(pair)
+            rows[:, 0] += offset
+            chunks[pair].append(rows)
+        return {pair: np.concatenate(blocks) for pair, blocks in chunks.items()}, out_of_time
+
+    def _record_pair_evaluations(self, components: Dict[ComponentType, List[ComponentInfo]],
+                                 pairs: List[Tuple[ComponentType, ComponentType]]):
+        """Contabiliza en métricas las evaluaciones de reglas que requiere cada par de tipos"""
+        for first, second in pairs:
+            COMPATIBILITY_PAIRS.inc(
+                len(components[first]) * len(components[second]) * len(self.compatibility_rules[(first, second)]),
+                type_a=first.value, type_b=second.value
+            )
+
     def _extract_component_info(self, proposals: Dict[str, List[Dict]]) -> Dict[ComponentType, List[ComponentInfo]]:
         """Convierte las propuestas en una estructura más manejable"""
         components = {}
@@ -143,208 +372,23 @@ class CompatibilityAgent:
             components[enum_type] = []
             
             for proposal in proposals_list:
-                metadata = proposal['metadata']
-                model_name = metadata.get('Model_Name', 'Unknown')
-                
-                # Extraer características clave según el tipo de componente
-                key_features = {}
-                if enum_type == ComponentType.CPU:
-                    key_features = {
-                        'socket': metadata.get('Details_CPU Socket TypeCPU Socket Type', ''),
-                        'generation': metadata.get('Model_Series',''),
-                        'tdp': metadata.get('Details_Thermal Design PowerThermal Design Power', ''),
-                        'ram_type': metadata.get('Details_Memory Types', '')
-                    }
-                elif enum_type == ComponentType.MOTHERBOARD:
-                    key_features = {
-                        'socket': metadata.get('Supported CPU_CPU Socket TypeCPU Socket Type', ''),
-                        'max_ram': metadata.get('Memory_Maximum Memory Supported', ''),
-                        'ram_type_spped': metadata.get('Memory_Memory Standard', ''),
-                        'ram_slots': metadata.get('Memory_Number of Memory Slots', ''),
-                        'pcie_slots': metadata.get('Expansion Slots_PCI Express 5.0 x16', ''),
-                        'pcie_slots2': metadata.get('Memory_Buffer Supported', ''),
-                        'supported_gpu': metadata.get('Supported CPU_CPU Type', '')
-                    }
-                elif enum_type == ComponentType.GPU:
-                    key_features = {
-                        'length': metadata.get('Form Factor & Dimensions - Max GPU Length', ''),
-                        'power': metadata.get('Details - Recommended PSU Wattage', ''),
-                        'interface': metadata.get('Interface - InterfaceInterface', '')
-                    }
-                elif enum_type == ComponentType.SSD:
-                    key_features = {
-                        'form_factor': metadata.get('Details_Form FactorForm Factor', ''),
-                        'protocol': metadata.get('Details_Protocol', '')
-                    }
-                    
-                elif enum_type == ComponentType.HDD:
-                    key_features = {
-                        
-                    }
-                    
-                elif enum_type == ComponentType.RAM:
-                    key_features = {
-                        'ram_type_spped': metadata.get('Details_SpeedSpeed', '')
-                    }
-                
-                elif enum_type == ComponentType.CASE:
-                    key_features = {
-                        'max_gpu_length': metadata.get('Dimensions & Weight_Max GPU Length', '')
-                    }
-                    
-                components[enum_type].append(ComponentInfo(
-                    type=enum_type,
-                    model_name=model_name,
-                    key_features=key_features,
-                    full_metadata=metadata
-                ))
+                components[enum_type].append(
+                    component_info(enum_type, proposal['metadata'], proposal.get('catalog_index'))
+                )
         
         return components
 
-    # Implementaciones de validadores específicos
-    def _validate_socket_compatibility(self, mobo: ComponentInfo, cpu: ComponentInfo) -> Tuple[bool, str]:
-        """Valida que el socket del CPU coincida con el de la motherboard"""
-        cpu_socket = cpu.key_features.get('socket', '').strip()
-        mobo_socket = mobo.key_features.get('socket', '').strip()
-        
-        cpu_socket = cpu_socket[len('Socket '):] if cpu_socket.startswith('Socket ') else cpu_socket
-        
-        if not cpu_socket or not mobo_socket:
-            return False, "Información de socket no disponible"
-        
-        if cpu_socket != mobo_socket:
-            return False, f"Socket incompatible: CPU ({cpu_socket}) vs Motherboard ({mobo_socket})"
-        
-        return True, "Sockets compatibles"
-
-    def _validate_chipset_compatibility(self, mobo: ComponentInfo, cpu: ComponentInfo) -> Tuple[bool, str]:
-        """Valida compatibilidad de chipset (ej: Z790 con Intel 13th/14th gen)"""
-        # Implementación simplificada - en una implementación real usarías una DB de compatibilidad
-        cpu_model = cpu.key_features.get('generation', '').lower()
-        mobo_chipset = mobo.key_features.get('supported_gpu', '').lower()
-        
-        # print(cpu_model)
-        # print(mobo_chipset)
-        
-        if '12th' in cpu_model:
-            if '12th' in mobo_chipset:
-                return True, "Chipset compatible"
-            return False, f"Chipset no compatible con CPU {cpu.model_name}"
-        
-        if '13th' in cpu_model:
-            if '13th' in mobo_chipset:
-                return True, "Chipset compatible"
-            return False, f"Chipset no compatible con CPU {cpu.model_name}"
-        
-        if '14th' in cpu_model:
-            if '14th' in mobo_chipset:
-                return True, "Chipset compatible"
-            return False, f"Chipset no compatible con CPU {cpu.model_name}"
-        
-        if '7000' in cpu_model:
-            if '7000' in mobo_chipset:
-                return True, "Chipset compatible"
-            return False, f"Chipset no compatible con CPU {cpu.model_name}"
-        
-        if '8000' in cpu_model:
-            if '8000' in mobo_chipset:
-                return True, "Chipset compatible"
-            return False, f"Chipset no compatible con CPU {cpu.model_name}"
-
-        if '9000' in cpu_model:
-            if '9000' in mobo_chipset:
-                return True, "Chipset compatible"
-            return False, f"Chipset no compatible con CPU {cpu.model_name}"
-        
-        return True, "Compatibilidad de chipset asumida"
-
-    def _validate_pcie_compatibility(self, mobo: ComponentInfo, gpu: ComponentInfo) -> Tuple[bool, str]:
-        """Valida compatibilidad de slot PCIe entre GPU y motherboard"""
-        gpu_interface = gpu.key_features.get('interface', '').lower()
-        mobo_pcie_slots = mobo.key_features.get('pcie_slots', '').lower()
-        mobo_pcie_slots2 = mobo.key_features.get('pcie_slots2', '').lower()
-        
-        if '4.0' in gpu_interface:
-            if '4.0 x16' in mobo_pcie_slots2 or '5.0 x16' in mobo_pcie_slots:
-                return True, "PCIe compatible"
-        
-        if '5.0' in gpu_interface:
-            if '5.0 x16' in mobo_pcie_slots:
-               return True, "PCIe compatible"
-        
-        return False, "PCIe no compatible"
-
-    def _validate_size_compatibility(self, gpu: ComponentInfo, case: ComponentInfo) -> Tuple[bool, str]:
-        """Valida que la GPU quepa en el gabinete"""
-        gpu_length = gpu.key_features.get('length', '')
-        case_max_gpu = case.key_features.get('max_gpu_length', '')
-        
-        try:
-            # Extraer valores numéricos (asumiendo formato "300 mm")
-            gpu_value = float(re.search(r'[\d.]+', gpu_length).group())
-            case_value = float(re.search(r'[\d.]+', case_max_gpu).group())
-            
-            # print(gpu_value)
-            # print(case_value)
-            
-            # Comparar valores (asumiendo misma unidad)
-            if gpu_value > case_value:
-                return False, f"GPU ({gpu_length}) más grande que espacio disponible en gabinete ({case_max_gpu})"
-            
-        except (AttributeError, ValueError):
-            return True, "No se pudieron verificar dimensiones"
-
-        return True, "Dimensiones compatibles"
-
-    def _validate_ram_type_compatibility(self, mobo: ComponentInfo, ram: ComponentInfo) -> Tuple[bool, str]:
-        """Valida que el tipo de RAM sea compatible con la motherboard"""
-        ram_type = ram.key_features.get('ram_type_spped', '').upper()
-        mobo_ram_types = mobo.key_features.get('ram_type_spped', '').upper()
-        
-        if not ram_type or not mobo_ram_types:
-            return False, "Información de RAM no disponible"
-        
-        if 'DDR4' in ram_type and 'DDR4' in mobo_ram_types:
-            return True, "Tipo de RAM compatible (DDR4)"
-        
-        if 'DDR5' in ram_type and 'DDR5' in mobo_ram_types:
-            return True, "Tipo de RAM compatible (DDR5)"           
-        
-        return True, "Tipo de RAM compatible"
-
-    def _validate_ram_speed_compatibility(self, mobo: ComponentInfo, ram: ComponentInfo) -> Tuple[bool, str]:
-        """Valida que la velocidad de RAM sea compatible con la motherboard"""
-        ram_speed = ram.key_features.get('ram_type_spped', '')
-        mobo_speed = mobo.key_features.get('ram_type_spped', '')
-     
-        ram_speed_match = re.search(r'\b\d{4}\b', ram_speed)
-        if not ram_speed_match:  return False, "No se encontró velocidad RAM válida"
-        
-        ram_speed = ram_speed_match.group()
-        
-        if ram_speed in mobo_speed: 
-            return True, "Velocidad RAM compatible"
-        
-        return False, "Velocidad de RAM no compatible"
-
-    def _validate_tdp_compatibility(self, cpu: ComponentInfo, cooler: ComponentInfo) -> Tuple[bool, str]:
-        
-        return True, "TDP compatible"
-
-    def _validate_socket_support(self, cpu: ComponentInfo, cooler: ComponentInfo) -> Tuple[bool, str]:
-        return True, "Socket soportado"
-
-    def _validate_power_compatibility(self, psu: ComponentInfo, gpu: ComponentInfo) -> Tuple[bool, str]:
-        
-        return True, "Potencia compatible"
-
     def get_compatibility_report(self) -> str:
         """Genera un reporte detallado de compatibilidad"""
-        issues = self.blackboard.get('compatibility_issues', [])
+        conflicts = self.blackboard.get('compatibility_issues')
         
-        if not issues:
+        if not conflicts and not getattr(conflicts, 'unverified', None):
             return "✅ Todos los componentes son compatibles entre sí"
         
+        # Los motivos se generan aquí, solo para las incompatibilidades del reporte
+        components = self._extract_component_info(self.blackboard.get_consolidated_components() or {})
+        issues = conflicts.issues(components)
+        
         report = ["## Reporte Detallado de Compatibilidad", ""]
         
         # Agrupar por severidad
@@ -367,6 +411,12 @@ class CompatibilityAgent:
                 report.append(f"- **{comp_a}** y **{comp_b}**: {issue.reason}")
             report.append("")
         
+        if conflicts.unverified:
+            report.append("### ⏱ Sin verificar por límite de tiempo")
+            for type_a, type_b in sorted(conflicts.unverified):
+                report.append(f"- **{type_a}** y **{type_b}**: solo se comprobaron las reglas críticas")
+            report.append("")
+        
         # Resumen estadístico
         incompatible_pairs = set()
         for issue in issues:
@@ -386,4 +436,322 @@ class CompatibilityAgent:
             report.append("- Revise las advertencias para posibles mejoras")
         report.append("- Considere alternativas para los componentes marcados")
         
-        return "\n".join(report)
\ No newline at end of file
+        return "\n".join(report)
+
+
+def fingerprint(component: ComponentInfo) -> str:
+    """Huella de lo que leen las reglas de un componente; si cambia, sus pares se recalculan"""
+    payload = json.dumps([component.model_name, component.key_features], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def component_info(enum_type: ComponentType, metadata: Dict[str, Any],
+                   catalog_index: Optional[int] = None) -> ComponentInfo:
+    """Extrae el nombre y las características clave que leen las reglas a partir de los metadatos del catálogo"""
+    model_name = metadata.get('Model_Name', 'Unknown')
+
+    # Extraer características clave según el tipo de componente
+    key_features = {}
+    if enum_type == ComponentType.CPU:
+        key_features = {
+            'socket': metadata.get('Details_CPU Socket TypeCPU Socket Type', ''),
+            'generation': metadata.get('Model_Series',''),
+            'tdp': metadata.get('Details_Thermal Design PowerThermal Design Power', ''),
+            'ram_type': metadata.get('Details_Memory Types', '')
+        }
+    elif enum_type == ComponentType.MOTHERBOARD:
+        key_features = {
+            'socket': metadata.get('Supported CPU_CPU Socket TypeCPU Socket Type', ''),
+            'max_ram': metadata.get('Memory_Maximum Memory Supported', ''),
+            'ram_type_spped': metadata.get('Memory_Memory Standard', ''),
+            'ram_slots': metadata.get('Memory_Number of Memory Slots', ''),
+            'pcie_slots': metadata.get('Expansion Slots_PCI Express 5.0 x16', ''),
+            'pcie_slots2': metadata.get('Memory_Buffer Supported', ''),
+            'supported_gpu': metadata.get('Supported CPU_CPU Type', '')
+        }
+    elif enum_type == ComponentType.GPU:
+        key_features = {
+            'length': metadata.get('Form Factor & Dimensions - Max GPU Length', ''),
+            'power': metadata.get('Details - Recommended PSU Wattage', ''),
+            'interface': metadata.get('Interface - InterfaceInterface', '')
+        }
+    elif enum_type == ComponentType.SSD:
+        key_features = {
+            'form_factor': metadata.get('Details_Form FactorForm Factor', ''),
+            'protocol': metadata.get('Details_Protocol', '')
+        }
+
+    elif enum_type == ComponentType.HDD:
+        key_features = {}
+
+    elif enum_type == ComponentType.RAM:
+        key_features = {
+            'ram_type_spped': metadata.get('Details_SpeedSpeed', '')
+        }
+
+    elif enum_type == ComponentType.CASE:
+        key_features = {
+            'max_gpu_length': metadata.get('Dimensions & Weight_Max GPU Length', '')
+        }
+
+    return ComponentInfo(
+        type=enum_type,
+        model_name=model_name,
+        key_features=key_features,
+        full_metadata=metadata,
+        catalog_index=catalog_index
+    )
+
+
+# --- Reglas declarativas (lenguaje en src/model/rule_dsl.py) ---
+
+# Tablas de búsqueda: generaciones de CPU que la placa debe listar entre las soportadas
+RULE_TABLES = {
+    'GENERATIONS': ('12th', '13th', '14th', '7000', '8000', '9000'),
+}
+
+# Características por tipo (alias = nombre de ComponentType), calculadas una vez por componente
+RULE_FEATURES = {
+    'CPU': {
+        'socket': "removeprefix(strip(socket), 'Socket ')",
+        'generation': "first_of(lower(generation), GENERATIONS)",
+    },
+    'MOTHERBOARD': {
+        'socket': "strip(socket)",
+        'generations': "tokens_in(lower(supported_gpu), GENERATIONS)",
+        'pcie4_x16': "contains(lower(pcie_slots2), '4.0 x16')",
+        'pcie5_x16': "contains(lower(pcie_slots), '5.0 x16')",
+        'ram': "upper(ram_type_spped)",
+        'ram_speeds': "digit_windows(ram_type_spped, 4)",
+    },
+    'GPU': {
+        'pcie4': "contains(lower(interface), '4.0')",
+        'pcie5': "contains(lower(interface), '5.0')",
+        'length': "number(length)",
+        'length_text': "text(length)",
+    },
+    'CASE': {
+        'max_gpu_length': "number(max_gpu_length)",
+        'max_gpu_length_text': "text(max_gpu_length)",
+    },
+    'RAM': {
+        'ram': "upper(ram_type_spped)",
+        'speed': r"match(ram_type_spped, r'\b\d{4}\b')",
+    },
+}
+
+# Regla: (primer tipo, segundo tipo, [(condición que debe cumplirse, motivo si no se cumple)])
+RULE_SPECS = {
+    RuleId.SOCKET: ('MOTHERBOARD', 'CPU', [
+        ("CPU.socket != '' and MOTHERBOARD.socket != ''", "Información de socket no disponible"),
+        ("CPU.socket == MOTHERBOARD.socket",
+         "Socket incompatible: CPU ({CPU.socket}) vs Motherboard ({MOTHERBOARD.socket})"),
+    ]),
+    RuleId.CHIPSET: ('MOTHERBOARD', 'CPU', [
+        ("CPU.generation == '' or CPU.generation in MOTHERBOARD.generations",
+         "Chipset no compatible con CPU {CPU.model_name}"),
+    ]),
+    RuleId.PCIE: ('MOTHERBOARD', 'GPU', [
+        ("(GPU.pcie4 and (MOTHERBOARD.pcie4_x16 or MOTHERBOARD.pcie5_x16)) or (GPU.pcie5 and MOTHERBOARD.pcie5_x16)",
+         "PCIe no compatible"),
+    ]),
+    RuleId.SIZE: ('GPU', 'CASE', [
+        # Longitudes no numéricas: no se pueden verificar y se asumen compatibles
+        ("not GPU.length > CASE.max_gpu_length",
+         "GPU ({GPU.length_text}) más grande que espacio disponible en gabinete ({CASE.max_gpu_length_text})"),
+    ]),
+    RuleId.RAM_TYPE: ('MOTHERBOARD', 'RAM', [
+        ("RAM.ram != '' and MOTHERBOARD.ram != ''", "Información de RAM no disponible"),
+    ]),
+    RuleId.RAM_SPEED: ('MOTHERBOARD', 'RAM', [
+        ("RAM.speed != ''", "No se encontró velocidad RAM válida"),
+        ("RAM.speed in MOTHERBOARD.ram_speeds", "Velocidad de RAM no compatible"),
+    ]),
+    RuleId.TDP: ('CPU', 'COOLER', []),
+    RuleId.SOCKET_SUPPORT: ('CPU', 'COOLER', []),
+    RuleId.POWER: ('PSU', 'GPU', []),
+}
+
+
+@lru_cache(maxsize=None)
+def _compiled_rule_list() -> Tuple[CompiledRule, ...]:
+    features = compile_features(RULE_FEATURES, RULE_TABLES)
+    return tuple(
+        CompiledRule(rule.name.lower(), first, second, checks, features)
+        for rule, (first, second, checks) in RULE_SPECS.items()
+    )
+
+
+def _compiled_rules() -> Dict[Tuple[ComponentType, ComponentType], List[CompiledRule]]:
+    rules: Dict[Tuple[ComponentType, ComponentType], List[CompiledRule]] = {}
+    for rule in _compiled_rule_list():
+        rules.setdefault((ComponentType[rule.first], ComponentType[rule.second]), []).append(rule)
+    return rules
+
+
+def rule_id(rule: CompiledRule) -> RuleId:
+    return RuleId[rule.__name__.upper()]
+
+
+def rule_function(rule: RuleId) -> CompiledRule:
+    return _compiled_rule_list()[list(RULE_SPECS).index(rule)]
+
+
+def rule_severity(rule: RuleId) -> str:
+    """Un socket distinto impide montar el CPU; el resto son advertencias"""
+    return "critical" if rule == RuleId.SOCKET else "warning"
+
+
+def _rules_for_pair(
+    compatibility_rules: Dict[Tuple[ComponentType, ComponentType], List[CompiledRule]],
+    type_a: ComponentType,
+    type_b: ComponentType
+) -> Tuple[List[CompiledRule], bool]:
+    """Reglas del par y si hay que invertir los argumentos (la regla espera (type_b, type_a))"""
+    rules = compatibility_rules.get((type_a, type_b), [])
+    if rules:
+        return rules, False
+    return compatibility_rules.get((type_b, type_a), []), True
+
+
+def _is_critical(rule: CompiledRule) -> bool:
+    return rule_severity(rule_id(rule)) == "critical"
+
+
+def _evaluate_pair(
+    components_a: List[ComponentInfo],
+    components_b: List[ComponentInfo],
+    rules: List[CompiledRule],
+    swapped: bool,
+    should_stop: Callable[[], bool],
+    order: Optional[Sequence[int]] = None,
+    short_circuit: bool = True
+) -> Tuple[np.ndarray, bool, np.ndarray]:
+    """
+    Evalúa las reglas de un par de tipos sobre todos los pares de componentes: cada regla
+    compilada calcula de una vez la matriz de compatibilidad de ambas listas.
+    :param order: posiciones de las reglas en el orden de evaluación (por defecto, el declarado);
+                  las críticas se evalúan siempre antes que el resto
+    :param short_circuit: no evaluar las reglas no críticas sobre pares ya incompatibles por una crítica
+    :return: matriz (regla, índice_a, índice_b) de incompatibilidades, si se agotó el plazo y
+             estadísticas por regla (llamadas, pares evaluados, pares rechazados, segundos).
+             Si se agota el plazo, las reglas críticas se evalúan igualmente (son baratas) y las no
+             críticas restantes se omiten: el par queda sin verificar, no incompatible
+    """
+    failing = np.zeros((len(rules), len(components_a), len(components_b)), dtype=bool)
+    stats = np.zeros((len(rules), 4))
+    critical = np.zeros(failing.shape[1:], dtype=bool)
+    order = sorted(order if order is not None else range(len(rules)), key=lambda p: not _is_critical(rules[p]))
+    for rule_position in order:
+        rule = rules[rule_position]
+        # Plazo agotado: solo se omiten las reglas no críticas (van después de las críticas)
+        if not _is_critical(rule) and should_stop():
+            return failing, True, stats
+        start = time.perf_counter()
+        
+        # Solo las filas y columnas con algún par aún sin incompatibilidad crítica
+        alive = ~critical if short_circuit and not _is_critical(rule) and critical.any() else None
+        rows = np.flatnonzero(alive.any(axis=1)) if alive is not None else np.arange(failing.shape[1])
+        cols = np.flatnonzero(alive.any(axis=0)) if alive is not None else np.arange(failing.shape[2])
+        if len(rows) and len(cols):
+            block_a, block_b = [components_a[i] for i in rows], [components_b[j] for j in cols]
+            if swapped:
+                block = ~rule.compatible(block_b, block_a).T
+            else:
+                block = ~rule.compatible(block_a, block_b)
+            failing[rule_position][np.ix_(rows, cols)] = block
+            if alive is not None:
+                failing[rule_position] &= alive
+        if _is_critical(rule):
+            critical |= failing[rule_position]
+        stats[rule_position] += (1, len(rows) * len(cols), failing[rule_position].sum(),
+                                 time.perf_counter() - start)
+    
+    return failing, False, stats
+
+
+def short_circuit_failing(rules: List[CompiledRule], failing: np.ndarray) -> np.ndarray:
+    """Quita de las reglas no críticas los pares ya incompatibles por una regla crítica (como _evaluate_pair)"""
+    critical = np.zeros(failing.shape[1:], dtype=bool)
+    for rule_position, rule in enumerate(rules):
+        if _is_critical(rule):
+            critical |= failing[rule_position]
+    if critical.any():
+        for rule_position, rule in enumerate(rules):
+            if not _is_critical(rule):
+                failing[rule_position] &= ~critical
+    return failing
+
+
+def _failing_rows(rules: List[CompiledRule], failing: np.ndarray) -> np.ndarray:
+    """
+    Filas (índice_a, índice_b, RuleId) de los pares incompatibles de failing (posición de la regla,
+    índice_a, índice_b), ordenadas por (índice_a, índice_b, regla) como la evaluación par a par
+    """
+    found = np.argwhere(failing.transpose(1, 2, 0)).astype(np.int32)
+    found[:, 2] = np.array([rule_id(rule) for rule in rules], dtype=np.int32)[found[:, 2]]
+    return found
+
+
+def assemble_conflicts(
+    components: Dict[ComponentType, List[ComponentInfo]],
+    found: Dict[Tuple[ComponentType, ComponentType], np.ndarray],
+    compatibility_rules: Dict[Tuple[ComponentType, ComponentType], List[CompiledRule]],
+    unverified: Optional[Set[Tuple[ComponentType, ComponentType]]] = None
+) -> CompatibilityConflicts:
+    """
+    Une los resultados por par (en el orden de las reglas) en un CompatibilityConflicts con los pares
+    en orden de llegada de las propuestas, como la evaluación de todos los pares de una vez
+    :param unverified: pares (en el orden de las reglas) con reglas no críticas sin evaluar por plazo
+    """
+    conflicts = CompatibilityConflicts()
+    component_types = list(components.keys())
+    for i, type_a in enumerate(component_types):
+        for type_b in component_types[i+1:]:
+            rules, swapped = _rules_for_pair(compatibility_rules, type_a, type_b)
+            key = (type_b, type_a) if swapped else (type_a, type_b)
+            if rules and unverified and key in unverified:
+                conflicts.unverified.add((type_a.value, type_b.value))
+            rows = found.get(key) if rules else None
+            if rows is None or not len(rows):
+                continue
+            if swapped:
+                rows = rows[:, [1, 0, 2]]
+                rows = rows[np.lexsort((rows[:, 2], rows[:, 1], rows[:, 0]))]
+            conflicts.pairs[(type_a.value, type_b.value)] = rows
+    return conflicts
+
+
+def _component_infos(comp_type: ComponentType, items: List[Tuple[str, Dict[str, Any]]]) -> List[ComponentInfo]:
+    return [
+        ComponentInfo(type=comp_type, model_name=name, key_features=key_features, full_metadata={})
+        for name, key_features in items
+    ]
+
+
+def evaluate_compatibility_chunk(
+    type_a: str,
+    rows: List[Tuple[str, Dict[str, Any]]],
+    type_b: str,
+    cols: List[Tuple[str, Dict[str, Any]]],
+    deadline: Optional[float],
+    order: Optional[Sequence[int]] = None,
+    short_circuit: bool = True
+) -> Tuple[np.ndarray, bool, float, np.ndarray]:
+    """
+    Punto de entrada para el pool de procesos: un bloque de filas de un par de tipos.
+    :param rows: [(model_name, key_features)] del bloque del primer tipo, en el orden de las propuestas
+    :param cols: [(model_name, key_features)] de todo el segundo tipo
+    :param deadline: plazo absoluto de la petición (time.time()) o None
+    :param order/short_circuit: ver _evaluate_pair
+    :return: filas (índice en el bloque, índice_b, RuleId), si se agotó el plazo, duración del bloque
+             y estadísticas por regla (las métricas se registran en el proceso principal)
+    """
+    start = time.perf_counter()
+    enum_a, enum_b = ComponentType(type_a), ComponentType(type_b)
+    rules, swapped = _rules_for_pair(CompatibilityAgent._load_compatibility_rules(), enum_a, enum_b)
+    failing, out_of_time, stats = _evaluate_pair(
+        _component_infos(enum_a, rows), _component_infos(enum_b, cols), rules, swapped,
+        deadline_checker(deadline), order, short_circuit
+    )
+    return _failing_rows(rules, failing), out_of_time, time.perf_counter() - start, stats
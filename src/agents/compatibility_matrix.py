@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from agents.compatibility_agent import (
+    CompatibilityAgent, ComponentInfo, ComponentType, component_info, fingerprint,
+    CompatibilityConflicts, assemble_conflicts, short_circuit_failing, _failing_rows
+)
+from model.rule_dsl import CompiledRule
+
+# Catálogo de embeddings (CSVToEmbeddings.load_embeddings) de cada tipo con reglas
+CATALOG_NAMES = {
+    ComponentType.CPU: 'CPU',
+    ComponentType.GPU: 'GPU',
+    ComponentType.MOTHERBOARD: 'Motherboard',
+    ComponentType.RAM: 'RAM',
+    ComponentType.SSD: 'SSD',
+    ComponentType.HDD: 'HDD',
+    ComponentType.PSU: 'PSU',
+    ComponentType.CASE: 'case',
+}
+
+MANIFEST = 'manifest.json'
+
+
+def _fill_block(bits: np.ndarray, rule: CompiledRule, first: List[ComponentInfo], rows: List[int],
+                second: List[ComponentInfo], cols: List[int]):
+    """Marca en bits (n_first, n_second) los pares rows x cols que incumplen la regla"""
+    bits[np.ix_(rows, cols)] = ~rule.compatible([first[i] for i in rows], [second[j] for j in cols])
+
+
+class CompatibilityMatrixStore:
+    """
+    Matriz de compatibilidad precalculada para todo el catálogo.
+
+    Por cada par de tipos con reglas se guarda `{primero}__{segundo}.npy` con forma
+    (n_reglas, n_primero, ceil(n_segundo / 8)): un bit por par de filas del catálogo y regla,
+    1 = incompatible, empaquetado con np.packbits. El par sigue el orden de parámetros de las
+    reglas y los índices son las filas de CSVToEmbeddings.load_embeddings(tipo).
+    `manifest.json` guarda los nombres de las reglas y la huella de cada SKU, de modo que al
+    añadir o cambiar SKUs solo se recalculan sus filas y columnas.
+
+    En la petición los ficheros se abren con mmap y la compatibilidad de las propuestas es
+    una lectura de bits sobre sus índices.
+    """
+
+    def __init__(self, directory: str = "src/data/compat_matrix"):
+        self.directory = directory
+        self.compatibility_rules = CompatibilityAgent._load_compatibility_rules()
+        self.manifest: Optional[Dict[str, Any]] = None
+        self._matrices: Dict[Tuple[ComponentType, ComponentType], np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @staticmethod
+    def _pair_name(first: ComponentType, second: ComponentType) -> str:
+        return f"{CATALOG_NAMES[first]}__{CATALOG_NAMES[second]}"
+
+    def _catalog_pairs(self) -> List[Tuple[ComponentType, ComponentType]]:
+        return [pair for pair in self.compatibility_rules if pair[0] in CATALOG_NAMES and pair[1] in CATALOG_NAMES]
+
+    # --- Construcción offline ---
+
+    def build(self, catalogs: Dict[str, List[Dict[str, Any]]], full: bool = False) -> Dict[str, Dict[str, int]]:
+        """
+        Evalúa todas las reglas sobre todos los pares de SKUs de tipos distintos y guarda las matrices.
+        :param catalogs: {nombre del catálogo: metadatos por fila} (vector_db['metadata'])
+        :param full: recalcular todo aunque exista una matriz anterior
+        :return: {par: {'rows': filas recalculadas, 'cols': columnas recalculadas, 'evaluations': pares x reglas}}
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        previous = None if full else self._read_manifest()
+        components = {
+            comp_type: [component_info(comp_type, metadata, i) for i, metadata in enumerate(catalogs[name])]
+            for comp_type, name in CATALOG_NAMES.items() if name in catalogs
+        }
+        fingerprints = {CATALOG_NAMES[t]: [fingerprint(c) for c in comps] for t, comps in components.items()}
+
+        stats = {}
+        pairs = {}
+        for first, second in self._catalog_pairs():
+            if first not in components or second not in components:
+                continue
+            name = self._pair_name(first, second)
+            rules = self.compatibility_rules[(first, second)]
+            rule_names = [rule.__name__ for rule in rules]
+            bits, rows, cols = self._reuse_previous(previous, name, rule_names, fingerprints,
+                                                    CATALOG_NAMES[first], CATALOG_NAMES[second])
+
+            all_rows, all_cols = list(range(bits.shape[1])), list(range(bits.shape[2]))
+            for position, rule in enumerate(rules):
+                if rows:
+                    _fill_block(bits[position], rule, components[first], rows, components[second], all_cols)
+                if cols:
+                    _fill_block(bits[position], rule, components[first], all_rows, components[second], cols)
+            evaluations = len(rules) * (len(rows) * len(all_cols) + len(all_rows) * len(cols))
+
+            self._atomic_save(f"{name}.npy", np.packbits(bits, axis=-1))
+            pairs[name] = {'first': CATALOG_NAMES[first], 'second': CATALOG_NAMES[second], 'rules': rule_names}
+            stats[name] = {'rows': len(rows), 'cols': len(cols), 'evaluations': evaluations}
+            print(f"[CompatibilityMatrix] {name}: {len(rows)} filas y {len(cols)} columnas recalculadas "
+                  f"({evaluations} evaluaciones de pares)")
+
+        manifest = {'version': 1, 'fingerprints': fingerprints, 'pairs': pairs}
+        tmp = self._path(MANIFEST + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._path(MANIFEST))
+        self.load()
+        return stats
+
+    def _reuse_previous(self, previous: Optional[Dict[str, Any]], name: str, rule_names: List[str],
+                        fingerprints: Dict[str, List[str]], first: str,
+                        second: str) -> Tuple[np.ndarray, List[int], List[int]]:
+        """Bits de la matriz anterior aún válidos y filas/columnas que hay que recalcular"""
+        n_first, n_second = len(fingerprints[first]), len(fingerprints[second])
+        bits = np.zeros((len(rule_names), n_first, n_second), dtype=bool)
+        old_pair = (previous or {}).get('pairs', {}).get(name)
+        if old_pair is None or old_pair['rules'] != rule_names or not os.path.exists(self._path(f"{name}.npy")):
+            return bits, list(range(n_first)), []
+
+        def dirty(old: List[str], new: List[str]) -> List[int]:
+            return [i for i, fp in enumerate(new) if i >= len(old) or old[i] != fp]
+
+        old_first, old_second = previous['fingerprints'][first], previous['fingerprints'][second]
+        keep_first, keep_second = min(n_first, len(old_first)), min(n_second, len(old_second))
+        old_bits = np.unpackbits(np.load(self._path(f"{name}.npy")), axis=-1, count=len(old_second)).astype(bool)
+        bits[:, :keep_first, :keep_second] = old_bits[:, :keep_first, :keep_second]
+        rows, cols = dirty(old_first, fingerprints[first]), dirty(old_second, fingerprints[second])
+        bits[:, rows, :] = False
+        bits[:, :, cols] = False
+        return bits, rows, cols
+
+    def _atomic_save(self, name: str, array: np.ndarray):
+        tmp = self._path(name + '.tmp.npy')
+        np.save(tmp, array)
+        os.replace(tmp, self._path(name))
+
+    # --- Consulta en la petición ---
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(MANIFEST), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self) -> bool:
+        """Abre las matrices con mmap; False si no se han construido"""
+        manifest = self._read_manifest()
+        if manifest is None:
+            return False
+        matrices = {}
+        for first, second in self._catalog_pairs():
+            name = self._pair_name(first, second)
+            pair = manifest['pairs'].get(name)
+            if pair is None or pair['rules'] != [r.__name__ for r in self.compatibility_rules[(first, second)]]:
+                continue  # Reglas cambiadas desde la construcción: ese par se evalúa en línea
+            matrices[(first, second)] = np.load(self._path(f"{name}.npy"), mmap_mode='r')
+        with self._lock:
+            self.manifest, self._matrices = manifest, matrices
+        print(f"[CompatibilityMatrix] {len(matrices)} matrices cargadas desde {self.directory}")
+        return True
+
+    @staticmethod
+    def _indices(manifest: Dict[str, Any], comp_type: ComponentType,
+                 comps: List[ComponentInfo]) -> Optional[List[int]]:
+        """Filas del catálogo de los componentes; None si alguno no está o la matriz quedó desfasada"""
+        known = manifest['fingerprints'].get(CATALOG_NAMES.get(comp_type), [])
+        indices = []
+        for component in comps:
+            index = component.catalog_index
+            if index is None or not 0 <= index < len(known) or known[index] != fingerprint(component):
+                return None
+            indices.append(index)
+        return indices
+
+    def lookup_pair(self, first: ComponentType, comps_first: List[ComponentInfo],
+                    second: ComponentType, comps_second: List[ComponentInfo],
+                    short_circuit: bool = True) -> Optional[np.ndarray]:
+        """
+        Incompatibilidades de un par de tipos (en el orden de las reglas) leídas de la matriz: filas
+        (índice_1.º, índice_2.º, RuleId) como la evaluación de reglas. None si la matriz no lo cubre.
+        La matriz guarda todas las reglas; con short_circuit se omiten, como en la evaluación, las
+        reglas no críticas de los pares ya incompatibles por una crítica.
+        """
+        with self._lock:
+            manifest, matrix = self.manifest, self._matrices.get((first, second))
+        if manifest is None or matrix is None:
+            return None
+        rows, cols = self._indices(manifest, first, comps_first), self._indices(manifest, second, comps_second)
+        if rows is None or cols is None:
+            return None
+        n_second = len(manifest['fingerprints'][CATALOG_NAMES[second]])
+        bits = np.unpackbits(matrix[:, rows, :], axis=-1, count=n_second)[:, :, cols].astype(bool)
+        rules = self.compatibility_rules[(first, second)]
+        if short_circuit:
+            bits = short_circuit_failing(rules, bits)
+        return _failing_rows(rules, bits)
+
+    def lookup(self, components: Dict[ComponentType, List[ComponentInfo]],
+               short_circuit: bool = True) -> Optional[CompatibilityConflicts]:
+        """
+        Incompatibilidades de las propuestas leídas de la matriz, con el mismo formato y orden que
+        la evaluación de reglas. None si algún par necesario no se puede resolver con la matriz.
+        """
+        found = {}
+        for first, second in self.compatibility_rules:
+            if not components.get(first) or not components.get(second):
+                continue
+            rows = self.lookup_pair(first, components[first], second, components[second], short_circuit)
+            if rows is None:
+                return None
+            found[(first, second)] = rows
+        return assemble_conflicts(components, found, self.compatibility_rules)
@@ -2,7 +2,9 @@
 from datetime import datetime
 from functools import wraps
 from typing import Callable, Any
+import time
 import traceback
+from model.metrics import AGENT_LATENCY, AGENT_ERRORS
 
 def agent_error_handler(func):
     """Decorador que espera recibir self como primer argumento"""
@@ -11,6 +13,7 @@ def agent_error_handler(func):
         try:
             return func(self, *args, **kwargs)
         except Exception as e:
+            AGENT_ERRORS.inc(agent=self.__class__.__name__, stage=func.__name__)
             if hasattr(self, 'blackboard'):
                 error_entry = {
                     'agent': self.__class__.__name__,
@@ -28,3 +31,17 @@ def agent_error_handler(func):
             return None
     return wrapper
 
+def track_latency(func):
+    """Registra la latencia de la etapa en el histograma agent_stage_seconds"""
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            AGENT_LATENCY.observe(
+                time.perf_counter() - start,
+                agent=self.__class__.__name__,
+                stage=func.__name__
+            )
+    return wrapper
@@ -1,72 +1,124 @@
-from typing import Dict, List, Any, Tuple, Set, Optional
+from typing import Dict, List, Any, Tuple, Set, Optional, Callable
 from blackboard import Blackboard, EventType
-from agents.decorators import agent_error_handler
-from agents.compatibility_agent import ComponentType, CompatibilityIssue
+from agents.decorators import agent_error_handler, track_latency
+from agents.compatibility_agent import ComponentType, CompatibilityConflicts
 from model.GeneticOptimizer import GeneticOptimizer
-import copy
+from model.conflict_graph import ConflictGraph, to_bitset
+from model.metrics import (
+    OPTIMIZER_LATENCY, OPTIMIZER_GENERATIONS, OPTIMIZER_FITNESS_LOOKUPS, OPTIMIZER_FITNESS_HIT_RATE,
+    OPTIMIZER_DUPLICATE_CHILDREN
+)
+from model.process_pool import run_in_pool, deadline_checker
+import os
 import re
+import time
+from collections import deque
+
+# Tiempo mínimo (segundos) del solver aunque el plazo de la petición haya vencido: es la última etapa y
+# debe entregar alguna build dentro del margen de la interfaz
+OPTIMIZER_MIN_SECONDS = float(os.getenv("OPTIMIZER_MIN_SECONDS", "2"))
+
+# Campos de los metadatos que necesitan AC-3, el backtracking y el genético
+SOLVER_FIELDS = ("Model_Name", "Price", "Type", "score", "multicore_score", "_Best Seller Ranking")
 
 class OptimizationAgent:
-    def __init__(self, blackboard: Blackboard):
+    def __init__(self, blackboard: Optional[Blackboard]):
+        """
+        :param blackboard: Instancia compartida del blackboard (None para usar solo el solver,
+                           p. ej. dentro del pool de procesos)
+        """
         self.blackboard = blackboard
 
-        self.blackboard.subscribe(
-            EventType.COMPATIBILITY_CHECKED,
-            self.optimize
-        )
+        if self.blackboard is not None:
+            self.blackboard.subscribe(
+                EventType.COMPATIBILITY_CHECKED,
+                self.optimize
+            )
 
+    @track_latency
     @agent_error_handler
     def optimize(self):
         proposals: Dict[str, List[Dict]] = self.blackboard.get_consolidated_components() or {}
         requirements = self.blackboard.get("user_requirements") or {}
-        issues: List[CompatibilityIssue] = self.blackboard.get("compatibility_issues") or []
+        conflicts = self.blackboard.get("compatibility_issues")
+        if not isinstance(conflicts, CompatibilityConflicts):
+            # Sin pasar por `or`: un resultado sin incompatibilidades pero con pares sin verificar es falsy
+            conflicts = CompatibilityConflicts()
 
         if not proposals:
             return
 
         domains = { k : [] for k in proposals}
-        url_set = set()
+        positions = { k : {} for k in proposals}   # posición en las propuestas -> posición en el dominio
+        url_set = {}
         for k, v in proposals.items():
-            for comp in v:
+            for position, comp in enumerate(v):
                 meta = comp["metadata"]
-                if meta.get('URL') not in url_set:
+                if meta.get('URL') in url_set:
+                    seen_type, seen_index = url_set[meta.get('URL')]
+                    if seen_type == k:
+                        positions[k][position] = seen_index
+                else:
                     price = meta.get("price", meta.get("Price", 1e9))
                     if isinstance(price, str):
                         price = price.replace(',', '')
-                    meta["Price"] = float(price)
+                    # Copia: la metadata de la propuesta es compartida (caché de propuestas, catálogo)
+                    meta = {**meta, "Price": float(price)}
 
                     if k == ComponentType.CPU.value:
                         meta['score'] = comp['score']['score']
                         meta['multicore_score'] = comp['score']['multicore_score']
 
+                    positions[k][position] = len(domains[k])
+                    url_set[meta.get('URL')] = (k, len(domains[k]))
                     domains[k].append(meta)
-                    url_set.add(meta.get('URL'))
 
-        reduced_domains = self._ac3(domains, issues)
-        if any(len(v) == 0 for v in reduced_domains.values()):
+        max_budget = requirements.budget.get("max", float("inf"))
+        conflict_graph = self._build_conflict_graph(conflicts, positions, domains)
+
+        # Entradas compactas para el pool: solo los campos que usa el solver, indexados por posición
+        compact_domains = {
+            k: [self._compact_component(meta, i) for i, meta in enumerate(v)] for k, v in domains.items()
+        }
+        if self.blackboard.time_remaining() < OPTIMIZER_MIN_SECONDS:
+            # Se ejecuta con el tiempo mínimo, fuera del plazo de la petición
+            self.blackboard.mark_degraded('optimization_agent')
+        result = run_in_pool(
+            solve_builds,
+            compact_domains,
+            conflict_graph,
+            max_budget,
+            self.blackboard.stage_deadline(OPTIMIZER_MIN_SECONDS),
+            should_stop=self.blackboard.is_cancelled
+        )
+        if result is None:
+            return  # Petición cancelada
+
+        for stage, seconds in result["timings"].items():
+            OPTIMIZER_LATENCY.observe(seconds, stage=stage)
+        if result["generations"] is not None:
+            OPTIMIZER_GENERATIONS.observe(result["generations"])
+        if result.get("genetic_stats"):
+            stats = result["genetic_stats"]
+            OPTIMIZER_FITNESS_LOOKUPS.inc(stats["cache_hits"], result='hit')
+            OPTIMIZER_FITNESS_LOOKUPS.inc(stats["evaluations"], result='miss')
+            OPTIMIZER_FITNESS_HIT_RATE.observe(stats["hit_rate"])
+            OPTIMIZER_DUPLICATE_CHILDREN.inc(stats["duplicates_remutated"])
+
+        if result["inconsistent"]:
             print("[OptimizationAgent] AC-3 detectó inconsistencia: no hay combinaciones válidas")
             self.blackboard.update("optimized_configs", [], agent_id="optimization_agent")
             return
 
-        max_budget = requirements.budget.get("max", float("inf"))
-        conflict_set = self._build_conflict_set(issues)
-
-        builds = []
-
-        cheapest = self._find_cheapest_build(reduced_domains, max_budget, conflict_set)
-        if cheapest:
-            builds.append(self._package_build(cheapest, label="Build Más Económica"))
-
-        optimizer = GeneticOptimizer(
-            domains=reduced_domains,
-            budget_limit=max_budget,
-            compatibility_conflicts=conflict_set,
-            fitness_mode='performance'
-        )
+        builds = [
+            self._package_build({k: domains[k][i] for k, i in selection.items()}, label=label,
+                                unverified=conflicts.unverified)
+            for label, selection in result["builds"]
+        ]
 
-        performance = optimizer.run()
-        if performance:
-            builds.append(self._package_build(performance, label="Build Con Mejor Rendimiento"))
+        if result["out_of_time"]:
+            # Las fases se cortaron por plazo: se publica lo mejor encontrado
+            self.blackboard.mark_degraded('optimization_agent')
 
         self.blackboard.update(
             section="optimized_configs",
@@ -81,7 +133,7 @@ class OptimizationAgent:
         self,
         domains: Dict[str, List[Dict]],
         max_budget: float,
-        compatibility_conflicts: Set[Tuple[Tuple[str, str], Tuple[str, str]]]
+        compatibility_conflicts: ConflictGraph
     ) -> Optional[Dict[str, Dict]]:
         max_perf = {
             k: max((self._estimate_individual_perf(c) for c in comps), default=0) for k, comps in domains.items()
@@ -123,12 +175,10 @@ class OptimizationAgent:
                 if not model_name:
                     continue
 
-                conflict = False
-                for prev_type, prev_comp in assignment.items():
-                    prev_name = prev_comp.get('Model_Name', 'Unknown')
-                    if ((var, model_name), (prev_type, prev_name)) in compatibility_conflicts:
-                        conflict = True
-                        break
+                conflict = any(
+                    compatibility_conflicts.conflicts(var, value['_index'], prev_type, prev_comp['_index'])
+                    for prev_type, prev_comp in assignment.items()
+                )
                 if conflict:
                     num_chop[0] += 1
                     continue
@@ -137,7 +187,7 @@ class OptimizationAgent:
                 skip_branch = False
                 for next_var in remaining_vars:
                     compatible = any(
-                        ((next_var, c.get("Model_Name", "Unknown")), (var, model_name)) not in compatibility_conflicts
+                        not compatibility_conflicts.conflicts(next_var, c['_index'], var, value['_index'])
                         for c in domains_sorted[next_var]
                     )
                     if not compatible:
@@ -169,7 +219,8 @@ class OptimizationAgent:
         self,
         domains: Dict[str, List[Dict]],
         max_budget: float,
-        compatibility_conflicts: Set[Tuple[Tuple[str, str], Tuple[str, str]]]
+        compatibility_conflicts: ConflictGraph,
+        should_stop: Callable[[], bool] = lambda: False
     ) -> Optional[Dict[str, Dict]]:
         variables = sorted(domains.keys())
         domains_sorted = {
@@ -177,6 +228,8 @@ class OptimizationAgent:
         }
 
         def backtrack_cheapest(assignment):
+            if should_stop():
+                return None
             if len(assignment) == len(variables):
                 if self._is_valid(assignment, max_budget):
                     return assignment.copy()
@@ -188,12 +241,10 @@ class OptimizationAgent:
                 if not model_name:
                     continue
 
-                conflict = False
-                for prev_type, prev_comp in assignment.items():
-                    prev_name = prev_comp.get('Model_Name', 'Unknown')
-                    if ((var, model_name), (prev_type, prev_name)) in compatibility_conflicts:
-                        conflict = True
-                        break
+                conflict = any(
+                    compatibility_conflicts.conflicts(var, value['_index'], prev_type, prev_comp['_index'])
+                    for prev_type, prev_comp in assignment.items()
+                )
                 if conflict:
                     continue
 
@@ -207,69 +258,100 @@ class OptimizationAgent:
 
         return backtrack_cheapest({})
 
-    def _package_build(self, build: Dict[str, Dict], label: str) -> Dict:
+    @staticmethod
+    def _compact_component(meta: Dict, index: int) -> Dict:
+        compact = {field: meta[field] for field in SOLVER_FIELDS if field in meta}
+        compact["_index"] = index
+        return compact
+
+    def _package_build(self, build: Dict[str, Dict], label: str,
+                       unverified: Set[Tuple[str, str]] = frozenset()) -> Dict:
         total_price = sum(float(comp.get("price", comp.get("Price", 0))) for comp in build.values())
+        # Pares cuyas reglas no críticas no se evaluaron por plazo: la build se entrega, pero sin verificar
+        warnings = [
+            f"No verificado: {type_a} y {type_b} solo pasaron las reglas críticas (límite de tiempo)"
+            for type_a, type_b in sorted(unverified) if type_a in build and type_b in build
+        ]
         return {
             "components": build,
             "total_price": round(total_price, 2),
             "performance_rating": self._estimate_build_performance(build),
-            "compatibility_warnings": [],
+            "compatibility_warnings": warnings,
             "upgrade_paths": {},
             "label": label
         }
 
-    def _ac3(self, domains: Dict[str, List[Dict]], issues: List[CompatibilityIssue]) -> Dict[str, List[Dict]]:
-        queue: List[Tuple[str, str]] = []
+    def _ac3(
+        self,
+        domains: Dict[str, List[Dict]],
+        conflicts: ConflictGraph,
+        should_stop: Callable[[], bool] = lambda: False
+    ) -> Dict[str, List[Dict]]:
+        """
+        AC-3 sobre índices enteros. Cada dominio es un bitset de los '_index' vivos. Los soportes de
+        cada arco se precalculan del ConflictGraph agrupando los candidatos de Xi con las mismas
+        incompatibilidades: una clase sigue viva si alive[Xj] & soportes != 0, así que revisar un arco
+        cuesta una operación de bitset por clase. Solo se encolan los arcos entre tipos con
+        incompatibilidades (los demás no pueden podar). Los metadatos no se copian: se devuelven los
+        mismos dicts filtrados.
+        """
         variables = list(domains.keys())
+        alive = {
+            k: to_bitset([c['_index'] for c in comps], max((c['_index'] for c in comps), default=-1) + 1)
+            for k, comps in domains.items()
+        }
 
-        for i, a in enumerate(variables):
-            for b in variables[i+1:]:
-                queue.append((a, b))
-                queue.append((b, a))
-
-        conflicts = set()
-        for issue in issues:
-            a = issue.component_a.model_name
-            b = issue.component_b.model_name
-            type_a = issue.component_a.type.value
-            type_b = issue.component_b.type.value
-            conflicts.add(((type_a, a), (type_b, b)))
-            conflicts.add(((type_b, b), (type_a, a)))
+        supports: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+        for Xi in variables:
+            for Xj in variables:
+                if Xi != Xj:
+                    classes = conflicts.support_classes(Xi, Xj)
+                    if classes is not None:
+                        supports[(Xi, Xj)] = classes
+        incoming = {k: [arc for arc in supports if arc[1] == k] for k in variables}
 
-        domains = copy.deepcopy(domains)
+        queue = deque(supports)
+        queued = set(supports)
 
         def revise(Xi: str, Xj: str) -> bool:
-            revised = False
-            new_domain = []
-            for x in domains[Xi]:
-                name_x = x.get('Model_Name', 'Unknown')
-                consistent = any(((Xi, name_x), (Xj, y.get('Model_Name', 'Unknown'))) not in conflicts for y in domains[Xj])
-                if consistent:
-                    new_domain.append(x)
-                else:
-                    revised = True
-            domains[Xi] = new_domain
-            return revised
+            alive_j = alive[Xj]
+            removed = 0
+            for arc_supports, members in supports[(Xi, Xj)]:
+                if not alive_j & arc_supports:
+                    removed |= members
+            removed &= alive[Xi]
+            alive[Xi] ^= removed
+            return bool(removed)
 
         while queue:
-            Xi, Xj = queue.pop(0)
+            # Sin tiempo: los dominios parcialmente reducidos siguen siendo válidos
+            if should_stop():
+                break
+            Xi, Xj = queue.popleft()
+            queued.discard((Xi, Xj))
             if revise(Xi, Xj):
-                if len(domains[Xi]) == 0:
-                    return domains
-                for Xk in variables:
-                    if Xk != Xi and Xk != Xj:
-                        queue.append((Xk, Xi))
-
-        return domains
-
-    def _build_conflict_set(self, issues: List[CompatibilityIssue]) -> Set[Tuple[Tuple[str, str], Tuple[str, str]]]:
-        conflict_set = set()
-        for issue in issues:
-            a = (issue.component_a.type.value, issue.component_a.model_name)
-            b = (issue.component_b.type.value, issue.component_b.model_name)
-            conflict_set.add((a, b))
-            conflict_set.add((b, a))
-        return conflict_set
+                if not alive[Xi]:
+                    break
+                for arc in incoming[Xi]:
+                    if arc[0] != Xj and arc not in queued:
+                        queue.append(arc)
+                        queued.add(arc)
+
+        return {k: [c for c in comps if alive[k] >> c['_index'] & 1] for k, comps in domains.items()}
+
+    @staticmethod
+    def _build_conflict_graph(
+        conflicts: CompatibilityConflicts,
+        positions: Dict[str, Dict[int, int]],
+        domains: Dict[str, List[Dict]]
+    ) -> ConflictGraph:
+        """Traslada las incompatibilidades (posiciones en las propuestas) a índices de los dominios"""
+        graph = ConflictGraph({k: len(v) for k, v in domains.items()})
+        for type_a, index_a, type_b, index_b, _ in conflicts:
+            domain_a, domain_b = positions.get(type_a, {}).get(index_a), positions.get(type_b, {}).get(index_b)
+            if domain_a is not None and domain_b is not None:
+                graph.add(type_a, domain_a, type_b, domain_b)
+        return graph
 
     def _is_valid(self, build: Dict[str, Dict], max_budget: float) -> bool:
         total_price = 0
@@ -317,3 +399,61 @@ class OptimizationAgent:
         if match:
             return int(match.group(1))
         return float("inf")
+
+
+def solve_builds(
+    domains: Dict[str, List[Dict]],
+    conflict_graph: ConflictGraph,
+    max_budget: float,
+    deadline: Optional[float]
+) -> Dict[str, Any]:
+    """
+    Punto de entrada para el pool de procesos: AC-3, build más económica y genético.
+    Los dominios llevan solo SOLVER_FIELDS y '_index' (posición en el dominio original);
+    las builds se devuelven como {tipo: _index}.
+    """
+    solver = OptimizationAgent(blackboard=None)
+    should_stop = deadline_checker(deadline)
+    timings = {}
+
+    start = time.perf_counter()
+    reduced_domains = solver._ac3(domains, conflict_graph, should_stop)
+    timings["ac3"] = time.perf_counter() - start
+
+    if any(len(v) == 0 for v in reduced_domains.values()):
+        return {"inconsistent": True, "builds": [], "timings": timings, "generations": None, "out_of_time": should_stop()}
+
+    builds = []
+
+    start = time.perf_counter()
+    cheapest = solver._find_cheapest_build(reduced_domains, max_budget, conflict_graph, should_stop)
+    timings["cheapest_build"] = time.perf_counter() - start
+    if cheapest:
+        builds.append(("Build Más Económica", {k: c["_index"] for k, c in cheapest.items()}))
+
+    # Motor vectorizado por defecto: ~10 veces más generaciones con una latencia similar al clásico
+    engine = os.getenv("GENETIC_ENGINE", "numpy")
+    optimizer = GeneticOptimizer(
+        domains=reduced_domains,
+        budget_limit=max_budget,
+        compatibility_conflicts=conflict_graph,
+        fitness_mode='performance',
+        generations=int(os.getenv("GENETIC_GENERATIONS", "1000" if engine == "numpy" else "100")),
+        should_stop=should_stop,
+        engine=engine
+    )
+
+    start = time.perf_counter()
+    performance = optimizer.run()
+    timings["genetic"] = time.perf_counter() - start
+    if performance:
+        builds.append(("Build Con Mejor Rendimiento", {k: c["_index"] for k, c in performance.items()}))
+
+    return {
+        "inconsistent": False,
+        "builds": builds,
+        "timings": timings,
+        "generations": optimizer.generations_run,
+        "genetic_stats": optimizer.run_stats(),
+        "out_of_time": should_stop()
+    }
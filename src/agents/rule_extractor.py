@@ -0,0 +1,271 @@
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from model.catalog_names import CatalogNames
+
+# Palabras clave por caso de uso (texto normalizado: minúsculas y sin tildes)
+USE_CASE_KEYWORDS = {
+    'gaming': [r'gam(?:ing|er|ear)', r'jueg(?:o|os|ar)', r'jugar', r'videojueg', r'esports?', r'fortnite',
+               r'warzone', r'call of duty', r'cyberpunk', r'valorant', r'\bfps\b', r'streaming de juegos'],
+    'video_editing': [r'edit(?:ar|or|ing)\s+(?:de\s+)?videos?', r'edicion(?:\s+de)?\s+videos?', r'video editing',
+                      r'premiere', r'davinci', r'after effects', r'final cut', r'render(?:izar|ing)?\s+(?:de\s+)?video',
+                      r'edicion\b', r'\bedit(?:ar|ando)\b', r'youtuber?'],
+    'data_science': [r'ciencia de datos', r'data scien', r'analisis de datos', r'data analy', r'jupyter',
+                     r'\bpandas\b', r'big data', r'estadistic'],
+    'machine_learning': [r'machine learning', r'aprendizaje automatico', r'deep learning', r'redes neuronales',
+                         r'inteligencia artificial', r'\bia\b', r'\bai\b', r'pytorch', r'tensorflow', r'\bllms?\b',
+                         r'entrenar modelos'],
+    'server': [r'servidor', r'\bserver\b', r'hosting', r'\bnas\b', r'homelab', r'virtualizac'],
+    'crypto_mining': [r'miner(?:ia|ar|o)', r'\bminar\b', r'mining', r'cripto', r'crypto', r'bitcoin', r'ethereum'],
+    'web_development': [r'desarrollo web', r'programacion web', r'web develop', r'frontend', r'backend',
+                        r'javascript', r'\breact\b', r'programar', r'programacion', r'desarrollador'],
+    'general': [r'ofimatica', r'oficina', r'office', r'navegar', r'estudiar', r'estudiante', r'uso general',
+                r'uso basico', r'tareas basicas', r'\bhogar\b', r'\bcasa\b']
+}
+
+# Combinaciones admitidas por UseCase (ver BDI_agent)
+ALLOWED_COMBINATIONS = {
+    frozenset({'gaming', 'video_editing'}): 'gaming/video_editing',
+    frozenset({'gaming', 'data_science'}): 'gaming/data_science',
+    frozenset({'video_editing', 'data_science'}): 'video_editing/data_science',
+    frozenset({'gaming', 'video_editing', 'data_science'}): 'gaming/video_editing/data_science'
+}
+
+SOFTWARE = ['Premiere Pro', 'DaVinci Resolve', 'After Effects', 'Final Cut Pro', 'Photoshop', 'Blender',
+            'AutoCAD', 'SolidWorks', 'Unreal Engine', 'Unity', 'OBS', 'Visual Studio', 'Docker',
+            'PyTorch', 'TensorFlow', 'Jupyter', 'Excel', 'Lightroom', 'Cinema 4D', 'Maya']
+
+COLORS = {
+    'black': [r'negr[oa]s?', r'black'], 'white': [r'blanc[oa]s?', r'white'], 'pink': [r'rosad?[oa]s?', r'pink'],
+    'red': [r'roj[oa]s?', r'\bred\b'], 'blue': [r'azul(?:es)?', r'blue'], 'gray': [r'gris(?:es)?', r'gr[ae]y'],
+    'silver': [r'platead[oa]s?', r'silver'], 'green': [r'verdes?', r'green']
+}
+
+CONSTRAINTS = {
+    'small_form_factor': [r'compact[oa]', r'pequen[oa]', r'mini[\s-]?itx', r'\bsff\b', r'small form'],
+    'low_noise': [r'silencios[oa]', r'sin ruido', r'poco ruido', r'quiet', r'silent'],
+    'high_reliability': [r'confiab', r'fiabl', r'24/7', r'reliab']
+}
+
+# Mínimos por caso de uso (nombres que resuelven contra los benchmarks de CPU/GPU).
+# Ordenados de menor a mayor exigencia: en combinaciones se toma el más exigente
+CPU_TIERS = ['Core i3-12100F', 'Core i5-12400F', 'Ryzen 5 7600X', 'Ryzen 7 7700X', 'Ryzen 9 7950X']
+GPU_TIERS = ['GTX 1650', 'RTX 3050', 'RTX 3060', 'RTX 3060 Ti', 'RTX 3070', 'RTX 3080']
+
+DEFAULT_CPU = {
+    'general': 'Core i3-12100F', 'web_development': 'Core i3-12100F', 'crypto_mining': 'Core i3-12100F',
+    'gaming': 'Core i5-12400F', 'data_science': 'Ryzen 7 7700X', 'video_editing': 'Ryzen 7 7700X',
+    'machine_learning': 'Ryzen 7 7700X', 'server': 'Ryzen 9 7950X'
+}
+DEFAULT_GPU = {
+    'general': 'GTX 1650', 'web_development': 'GTX 1650', 'server': 'GTX 1650', 'data_science': 'RTX 3050',
+    'gaming': 'RTX 3060', 'video_editing': 'RTX 3060', 'crypto_mining': 'RTX 3060 Ti', 'machine_learning': 'RTX 3070'
+}
+GAMING_GPU_BY_RESOLUTION = {'1080p': 'RTX 3060', '1440p': 'RTX 3070', '4K': 'RTX 3080'}
+GAMING_CPU_BY_RESOLUTION = {'1080p': 'Core i5-12400F', '1440p': 'Ryzen 5 7600X', '4K': 'Ryzen 5 7600X'}
+
+RAM_DEFAULTS = {
+    'general': ('16GB', 'DDR4', 3200), 'web_development': ('16GB', 'DDR4', 3200),
+    'crypto_mining': ('16GB', 'DDR4', 3200), 'gaming': ('32GB', 'DDR5', 5600),
+    'video_editing': ('32GB', 'DDR5', 5600), 'data_science': ('32GB', 'DDR5', 5600),
+    'machine_learning': ('64GB', 'DDR5', 5600), 'server': ('64GB', 'DDR5', 5600)
+}
+STORAGE_DEFAULTS = {
+    'general': '512GB', 'web_development': '1TB', 'crypto_mining': '512GB', 'gaming': '1TB',
+    'video_editing': '2TB', 'data_science': '1TB', 'machine_learning': '2TB', 'server': '4TB'
+}
+
+_CURRENCY = r'(?:\$|us\$|usd|dolares|dollars|euros?|eur|€)'
+_AMOUNT = r'(\d{1,3}(?:[.,]\d{3})+|\d+(?:[.,]\d+)?)\s*(k|mil)?'
+_NOT_AMOUNT_UNIT = r'(?!\s*(?:gb|tb|mb|mhz|ghz|hz|fps|p\b|w\b|nm|mm|"|pulgadas|k\b(?!\s*(?:\$|usd|dolares|euros?))))'
+_BUDGET_WORDS = (r'(?:presupuesto(?:\s+(?:de|maximo|max))?|budget(?:\s+of)?|bajo|menos\s+de|hasta|por\s+debajo\s+de|'
+                 r'no\s+mas\s+de|sin\s+pasar(?:se)?\s+de|maximo(?:\s+de)?|max\.?|under|below|up\s+to|'
+                 r'alrededor\s+de|around|unos|aprox\w*)')
+_MIN_WORDS = r'(?:mas\s+de|al\s+menos|minimo(?:\s+de)?|desde|over|at\s+least|from)'
+# Negación pocas palabras antes de un mínimo: "no quiero gastar mas de $1000" es un máximo
+_NEGATION = r'\b(?:no|sin|nunca|not|never|without)\b(?:\s+\w+){0,3}\s*$'
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas y sin tildes, para que las expresiones sean independientes de la ortografía"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def _parse_amount(number: str, multiplier: Optional[str]) -> float:
+    if re.fullmatch(r'\d{1,3}(?:[.,]\d{3})+', number):
+        value = float(re.sub(r'[.,]', '', number))
+    else:
+        value = float(number.replace(',', '.'))
+    return value * 1000 if multiplier else value
+
+
+def _matches_any(patterns: List[str], text: str) -> bool:
+    return any(re.search(p, text) for p in patterns)
+
+
+class RuleBasedExtractor:
+    """
+    Extractor determinista de requisitos para consultas comunes ("PC gaming 1440p bajo $1500").
+
+    Devuelve un diccionario con la misma forma que la respuesta JSON del LLM, de modo que
+    BDIAgent lo valida igual, junto con una confianza en [0, 1]. Por debajo del umbral
+    del agente se recurre al LLM.
+    """
+
+    def __init__(self, catalog: Optional[CatalogNames] = None):
+        self.catalog = catalog or CatalogNames()
+
+    def extract(self, text: str) -> Tuple[Dict[str, Any], float]:
+        original = text or ""
+        text = normalize_text(original)
+
+        use_cases, use_case = self._extract_use_case(text)
+        if use_case is None:
+            return {}, 0.0  # Combinación no admitida: mejor que la interprete el LLM
+
+        budget = self._extract_budget(text)
+        resolution = self._extract_resolution(text)
+        fps = self._extract_fps(text)
+        software = [s for s in SOFTWARE if normalize_text(s) in text]
+        cpu_mention = self.catalog.resolve('CPU', original)
+        gpu_mention = self.catalog.resolve('GPU', original)
+        aesthetics = self._extract_aesthetics(text)
+        constraints = [c for c, patterns in CONSTRAINTS.items() if _matches_any(patterns, text)]
+        ram = self._extract_ram(text, use_case)
+        storage = self._extract_storage(text, use_case)
+
+        raw = {
+            'use_case': use_case,
+            'budget': budget,
+            'performance': {
+                'resolution': resolution or '1080p',
+                'fps': fps or (60 if 'gaming' in use_cases or resolution else 30),
+                'software': software
+            },
+            'aesthetics': aesthetics,
+            'cpu': cpu_mention or self._default_component(use_cases, resolution, DEFAULT_CPU,
+                                                          GAMING_CPU_BY_RESOLUTION, CPU_TIERS),
+            'gpu': gpu_mention or self._default_component(use_cases, resolution, DEFAULT_GPU,
+                                                          GAMING_GPU_BY_RESOLUTION, GPU_TIERS),
+            'storage': storage,
+            'ram': ram,
+            'constraints': constraints
+        }
+
+        confidence = 0.0
+        if use_cases:
+            confidence += 0.4
+        if budget['max'] is not None:
+            confidence += 0.35
+        if resolution or fps or software or cpu_mention or gpu_mention:
+            confidence += 0.15
+        if aesthetics['rgb'] or aesthetics['color'] or constraints:
+            confidence += 0.1
+        # Peticiones largas suelen tener matices que las reglas no capturan
+        if len(text.split()) > 60:
+            confidence *= 0.7
+        return raw, min(confidence, 1.0)
+
+    def _extract_use_case(self, text: str) -> Tuple[List[str], Optional[str]]:
+        found = [uc for uc, patterns in USE_CASE_KEYWORDS.items() if _matches_any(patterns, text)]
+        specific = [uc for uc in found if uc != 'general']
+        if not specific:
+            return found, 'general'
+        if len(specific) == 1:
+            return specific, specific[0]
+        return specific, ALLOWED_COMBINATIONS.get(frozenset(specific))
+
+    def _extract_budget(self, text: str) -> Dict[str, Optional[float]]:
+        amount = _AMOUNT + _NOT_AMOUNT_UNIT
+
+        # Rango explícito: "entre 1000 y 1500", "de $800 a $1200", "1000-1500 usd"
+        match = re.search(rf'(?:entre|between|de|from)\s*{_CURRENCY}?\s*{amount}\s*{_CURRENCY}?\s*(?:y|a|and|to|-)\s*'
+                          rf'{_CURRENCY}?\s*{amount}\s*{_CURRENCY}?', text)
+        if match and (re.search(_CURRENCY, match.group()) or re.search(r'presupuesto|budget', text)):
+            low, high = _parse_amount(match.group(1), match.group(2)), _parse_amount(match.group(3), match.group(4))
+            return {'min': min(low, high), 'max': max(low, high)}
+
+        candidates = []
+        for m in re.finditer(rf'(?:({_BUDGET_WORDS}|{_MIN_WORDS})\s+)?({_CURRENCY})?\s*{amount}\s*({_CURRENCY})?', text):
+            keyword, prefix, number, multiplier, suffix = m.group(1), m.group(2), m.group(3), m.group(4), m.group(5)
+            if not (prefix or suffix or (keyword and re.fullmatch(r'presupuesto.*|budget.*', keyword))):
+                continue
+            value = _parse_amount(number, multiplier)
+            if value < 100:
+                continue  # Un presupuesto de PC no baja de esto: probablemente es otra cosa
+            is_min = bool(keyword and re.fullmatch(_MIN_WORDS, keyword)) and not re.search(_NEGATION, text[:m.start()])
+            candidates.append((is_min, value))
+
+        budget = {'min': None, 'max': None}
+        for is_min, value in candidates:
+            key = 'min' if is_min else 'max'
+            if budget[key] is None:
+                budget[key] = value
+        return budget
+
+    @staticmethod
+    def _extract_resolution(text: str) -> Optional[str]:
+        if re.search(r'\b(?:4k|uhd|2160p?)\b', text):
+            return '4K'
+        if re.search(r'\b(?:1440p?|2k|qhd|wqhd)\b', text):
+            return '1440p'
+        if re.search(r'\b(?:1080p?|fhd|full\s*hd)\b', text):
+            return '1080p'
+        return None
+
+    @staticmethod
+    def _extract_fps(text: str) -> Optional[int]:
+        match = re.search(r'(\d{2,3})\s*(?:fps|hz|cuadros)', text)
+        return int(match.group(1)) if match else None
+
+    @staticmethod
+    def _extract_aesthetics(text: str) -> Dict[str, Any]:
+        no_rgb = re.search(r'(?:sin|no|without)\s+(?:luces|rgb|leds?)', text)
+        rgb = not no_rgb and bool(re.search(r'\brgb\b|\bargb\b|luces|iluminacion|\bleds?\b', text))
+        color = next((c for c, patterns in COLORS.items() if _matches_any(patterns, text)), None)
+        window = bool(re.search(r'ventana|vidrio|cristal templado|tempered glass|\bwindow\b', text))
+        return {'color': color, 'rgb': rgb, 'window': window}
+
+    @staticmethod
+    def _default_component(use_cases: List[str], resolution: Optional[str], defaults: Dict[str, str],
+                           gaming_by_resolution: Dict[str, str], tiers: List[str]) -> str:
+        picks = []
+        for uc in use_cases or ['general']:
+            if uc == 'gaming' and resolution:
+                picks.append(gaming_by_resolution[resolution])
+            else:
+                picks.append(defaults[uc])
+        return max(picks, key=tiers.index)
+
+    @staticmethod
+    def _extract_ram(text: str, use_case: str) -> Dict[str, Any]:
+        capacity, ram_type, speed = max(
+            (RAM_DEFAULTS[uc] for uc in use_case.split('/')), key=lambda d: int(d[0][:-2]))
+        match = re.search(r'(\d{1,3})\s*gb\s*(?:de\s+)?(?:ram|memoria)|(?:ram|memoria)\s*(?:de\s+)?(\d{1,3})\s*gb', text)
+        if match:
+            capacity = f"{match.group(1) or match.group(2)}GB"
+        type_match = re.search(r'\bddr([345])\b', text)
+        if type_match:
+            ram_type = f"DDR{type_match.group(1)}"
+        return {'capacity': capacity, 'type': ram_type, 'speed': speed}
+
+    @staticmethod
+    def _extract_storage(text: str, use_case: str) -> Dict[str, Any]:
+        use_cases = use_case.split('/')
+        capacity = max((STORAGE_DEFAULTS[uc] for uc in use_cases),
+                       key=lambda c: int(c[:-2]) * (1000 if c.endswith('TB') else 1))
+        match = re.search(r'(\d{1,4})\s*(gb|tb)\s*(?:de\s+)?(?:ssd|nvme|almacenamiento|disco|hdd|storage)'
+                          r'|(?:ssd|nvme|almacenamiento|disco|hdd|storage)\s*(?:de\s+)?(\d{1,4})\s*(gb|tb)', text)
+        if match:
+            number, unit = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+            capacity = f"{number}{unit.upper()}"
+        include_hdd = bool(re.search(r'\bhdd\b|disco duro|mecanico', text)) or \
+            any(uc in ('video_editing', 'data_science', 'server') for uc in use_cases)
+        return {
+            'prefer_ssd': not re.search(r'solo\s+hdd|sin\s+ssd', text),
+            'include_hdd': include_hdd,
+            'capacity': capacity,
+            'performance': {'read_speed': '3500MB/s'}
+        }
@@ -1,8 +1,7 @@
 from typing import Dict, List, Any
 from enum import Enum
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from agents.decorators import agent_error_handler
+from agents.decorators import agent_error_handler, track_latency
 from blackboard import Blackboard, EventType
 from agents.BDI_agent import HardwareRequirements
 
@@ -27,6 +26,7 @@ class StorageAgent:
             self.process_requirements
         )
 
+    @track_latency
     @agent_error_handler
     def process_requirements(self):
         """Procesa los requisitos del usuario para recomendar almacenamiento"""
@@ -81,6 +81,7 @@ class StorageAgent:
         requirement_embedding = vector_db['model'].encode([requirement_text])[0]
         
         # 3. Calcular similitud con todos los items
+        from sklearn.metrics.pairwise import cosine_similarity  # import diferido (arranque)
         similarities = cosine_similarity(
             [requirement_embedding],
             vector_db['embeddings']
@@ -89,6 +90,11 @@ class StorageAgent:
         # 4. Filtrar y ordenar candidatos
         candidates = []
         for i, metadata in enumerate(vector_db['metadata']):
+            # Plazo agotado o petición cancelada: proponer lo encontrado hasta ahora
+            if self.blackboard.should_stop():
+                self.blackboard.mark_degraded('storage_agent')
+                break
+            
             # Verificar capacidad mínima
             if min_capacity > 0:
                 storage_cap = self._normalize_capacity(metadata.get('Capacity', '0GB'))
@@ -115,6 +121,7 @@ class StorageAgent:
             
             candidates.append({
                 'metadata': metadata,
+                'catalog_index': i,
                 'similarity': similarities[i],
                 'price': price,
                 'type': storage_type.value,
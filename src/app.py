@@ -1,28 +1,33 @@
-import streamlit as st
 import os
-from time import sleep
+from model.startup_profiler import get_startup_profiler
+
+# PROFILE_STARTUP=1 imprime el desglose de tiempos de import y de inicialización
+startup_profiler = get_startup_profiler(os.getenv("PROFILE_STARTUP") == "1")
+startup_profiler.start()
+
+import streamlit as st
+import time
 from dotenv import load_dotenv
-from agents.MB_agent import MotherboardAgent
-from agents.compatibility_agent import CompatibilityAgent
-from blackboard import Blackboard, EventType
-from agents.BDI_agent import BDIAgent, HardwareRequirements
-from agents.CPU_agent import CPUAgent
-from agents.GPU_agent import GPUAgent
-from agents.MB_agent import MotherboardAgent
-from agents.storage_agent import StorageAgent
-from agents.RAM_agent import RAMAgent
-from agents.PSU_agent import PSUAgent
-from agents.case_agent import CaseAgent
-from agents.compatibility_agent import CompatibilityAgent
-from agents.optimization_agent import OptimizationAgent
-from agents.optimization_agent import OptimizationAgent
-from model.vectorDB import CSVToEmbeddings
-from model.LLMClient import OpenAIClient, GeminiClient
+from blackboard import Blackboard
+from model.metrics import start_metrics_server
+from model.session_recorder import SessionRecorder
+
+# Los agentes, los SDK de los proveedores y los modelos de embeddings se importan
+# en init_agents(): la interfaz se dibuja antes de pagar su coste
 
 # --- Configuración inicial ---
 load_dotenv()
 st.set_page_config(page_title="ExpertBot de Hardware", layout="wide")
 
+# Endpoint Prometheus (idempotente entre reruns de Streamlit)
+if os.getenv("METRICS_PORT", "9108") != "0":
+    start_metrics_server(port=int(os.getenv("METRICS_PORT", "9108")))
+
+# Plazo interno de cada petición (segundos): al vencer, las etapas entregan resultados parciales
+REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "60"))
+# Margen de la interfaz tras el plazo para recibir esos resultados parciales antes de cancelar la petición
+RESPONSE_GRACE = float(os.getenv("RESPONSE_GRACE", "15"))
+
 # --- Inicialización de modelos ---
 MODEL_OPTIONS = {
     "google": ["gemini-1.5-flash", "gemini-pro", "gemini-1.5-pro"],
@@ -42,79 +47,142 @@ if "model" not in st.session_state:
     st.session_state.model = MODEL_OPTIONS["openai"][0]
 
 if "blackboard" not in st.session_state:
-    st.session_state.blackboard = Blackboard(7)
+    st.session_state.blackboard = Blackboard(7, request_timeout=REQUEST_TIMEOUT)
 
 if "user_response" not in st.session_state:
     st.session_state.user_response = None
 
 # --- Inicializar sistema y agentes ---
+@st.cache_resource(show_spinner=False)
+def load_vector_dbs() -> dict:
+    """Embeddings de todos los componentes, compartidos entre sesiones y reruns"""
+    from model.vectorDB import CSVToEmbeddings
+    return {
+        component_type: CSVToEmbeddings.load_embeddings(component_type)
+        for component_type in ('CPU', 'GPU', 'Motherboard', 'HDD', 'SSD', 'RAM', 'PSU', 'case')
+    }
+
+
+@st.cache_resource
+def load_requirements_cache():
+    """Caché semántica de requisitos, compartida entre sesiones (SEMANTIC_CACHE=0 la desactiva)"""
+    if os.getenv("SEMANTIC_CACHE", "1") == "0":
+        return None
+    from model.semantic_cache import SemanticRequirementsCache
+    return SemanticRequirementsCache(
+        load_vector_dbs()['CPU']['model'],
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+    )
+
+
+@st.cache_resource
+def load_compat_matrix():
+    """Matriz de compatibilidad precalculada (src/build_compat_matrix.py); None si no existe o COMPAT_MATRIX=0"""
+    if os.getenv("COMPAT_MATRIX", "1") == "0":
+        return None
+    from agents.compatibility_matrix import CompatibilityMatrixStore
+    store = CompatibilityMatrixStore(os.getenv("COMPAT_MATRIX_DIR", "src/data/compat_matrix"))
+    return store if store.load() else None
+
+
+def build_llm_client():
+    """
+    Cliente LLM de la extracción y las respuestas: proveedor elegido como primario y, si el otro
+    tiene API key, cobertura (hedging) hacia él. Cada proveedor con límites, reintentos y caché.
+    """
+    from model.LLMClient import OpenAIClient, GeminiClient
+    from model.llm_cache import with_cache
+    from model.llm_resilience import with_resilience
+    from model.llm_hedging import HedgedLLMClient
+
+    def model_for(provider: str) -> str:
+        return st.session_state.model if st.session_state.provider == provider else MODEL_OPTIONS[provider][0]
+
+    factories = {
+        # Sin reintentos del SDK: los gestiona ResilientLLMClient
+        "openai": lambda: OpenAIClient(model=model_for("openai"), max_retries=0),
+        "google": lambda: GeminiClient(model=model_for("google"), sdk_retries=False)
+    }
+    if os.getenv("GEMINI_FAKE") == "1":
+        # Pruebas de carga sin red (ver src/mock_llm_server.py); OpenAI se redirige con OPENAI_BASE_URL
+        from model.mock_llm import FakeGeminiClient
+        factories["google"] = lambda: FakeGeminiClient(model=model_for("google"), sdk_retries=False)
+    clients = []
+    for provider in sorted(factories, key=lambda p: p != st.session_state.provider):
+        try:
+            clients.append(with_resilience(factories[provider]()))
+        except ValueError as e:
+            print(f"[App] Proveedor {provider} no disponible: {e}")
+    if not clients:
+        raise ValueError("No hay ningún proveedor LLM configurado (OPENAI_API_KEY / GOOGLE_API_KEY)")
+
+    if len(clients) == 1 or os.getenv("LLM_HEDGING", "1") == "0":
+        return with_cache(clients[0])
+    return with_cache(HedgedLLMClient(
+        clients[0], clients[1],
+        percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+    ))
+
+
 def init_agents():
-    st.session_state.init_agents = True
+    with startup_profiler.phase("import agentes"):
+        from agents.BDI_agent import BDIAgent
+        from agents.CPU_agent import CPUAgent
+        from agents.GPU_agent import GPUAgent
+        from agents.MB_agent import MotherboardAgent
+        from agents.storage_agent import StorageAgent
+        from agents.RAM_agent import RAMAgent
+        from agents.PSU_agent import PSUAgent
+        from agents.case_agent import CaseAgent
+        from agents.compatibility_agent import CompatibilityAgent
+        from agents.optimization_agent import OptimizationAgent
+        from model.catalog_names import CatalogNames
 
-    processor = CSVToEmbeddings()
     blackboard = st.session_state.blackboard
 
-    llm_client = OpenAIClient(model=st.session_state.model) if st.session_state.provider == "openai" else GeminiClient()
-
-    cpu_db = processor.load_embeddings('CPU')
-    gpu_db = processor.load_embeddings('GPU')
-    mb_db = processor.load_embeddings('Motherboard')
-    hdd_db = processor.load_embeddings('HDD')
-    ssd_db = processor.load_embeddings('SSD')
-    ram_db = processor.load_embeddings('RAM')
-    psu_db = processor.load_embeddings('PSU')
-    case_db = processor.load_embeddings('case')
-    
-    
-    agents = {
-        'bdi': BDIAgent(
-            llm_client=GeminiClient(),
-            blackboard=blackboard
-        ),
-        'cpu': CPUAgent(
-            vector_db=cpu_db ,
+    # Grabación de sesiones para reproducirlas offline (src/replay_sessions.py)
+    if os.getenv("RECORD_SESSIONS_DIR"):
+        SessionRecorder(blackboard, os.getenv("RECORD_SESSIONS_DIR"))
+
+    with startup_profiler.phase("carga de embeddings"):
+        dbs = load_vector_dbs()
+
+    with startup_profiler.phase("catálogo de nombres CPU/GPU"):
+        catalog = CatalogNames(embedding_model=dbs['CPU']['model'])
+        catalog.names('CPU')
+        catalog.names('GPU')
+
+    with startup_profiler.phase("creación de agentes"):
+        BDIAgent(
+            llm_client=build_llm_client(),
+            blackboard=blackboard,
+            fast_path_threshold=float(os.getenv("FAST_PATH_THRESHOLD", "0.7")),
+            catalog=catalog,
+            name_token_budget=int(os.getenv("PROMPT_NAMES_TOKEN_BUDGET", "100")),
+            llm_response=os.getenv("LLM_RESPONSES", "0") == "1",
+            requirements_cache=load_requirements_cache()
+        )
+        CPUAgent(
+            vector_db=dbs['CPU'],
             cpu_scores_path='src/data/benchmarks/CPU_benchmarks.json',
             blackboard=blackboard
-        ),
-        'gpu': GPUAgent(
-            vector_db=gpu_db,
+        )
+        GPUAgent(
+            vector_db=dbs['GPU'],
             gpu_benchmarks_path='src/data/benchmarks/GPU_benchmarks_v7.csv',
             blackboard=blackboard
-        ),
-        'mb': MotherboardAgent(
-            vector_db=mb_db,
-            blackboard=blackboard
-        ),
-        'storage': StorageAgent(
-            ssd_vector_db=ssd_db,
-            hdd_vector_db=hdd_db,
-            blackboard=blackboard
-        ),
-        'ram': RAMAgent(
-            vector_db=ram_db,
-            blackboard=blackboard
-        ),
-        'psu': PSUAgent(
-            vector_db=psu_db,
-            blackboard=blackboard
-        ),
-        'case': CaseAgent(
-            vector_db=case_db, 
-            blackboard=blackboard
-        ),
-        'comp': CompatibilityAgent(
-            blackboard=blackboard,
-        ),
-        'opt': OptimizationAgent(
-            blackboard=blackboard,
         )
-    }
-    
-    def handle_user_response():
-        st.session_state.user_response = blackboard.get("user_response")
-        
-if not st.session_state.get("init_agents"):
-    init_agents()
+        MotherboardAgent(vector_db=dbs['Motherboard'], blackboard=blackboard)
+        StorageAgent(ssd_vector_db=dbs['SSD'], hdd_vector_db=dbs['HDD'], blackboard=blackboard)
+        RAMAgent(vector_db=dbs['RAM'], blackboard=blackboard)
+        PSUAgent(vector_db=dbs['PSU'], blackboard=blackboard)
+        CaseAgent(vector_db=dbs['case'], blackboard=blackboard)
+        CompatibilityAgent(blackboard=blackboard, matrix_store=load_compat_matrix())
+        OptimizationAgent(blackboard=blackboard)
+
+    # Los agentes quedan vivos a través de sus suscripciones en el blackboard
+    st.session_state.init_agents = True
 
 # --- Sidebar de configuración ---
 with st.sidebar:
@@ -144,6 +212,16 @@ for msg in st.session_state.messages:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
 
+# Inicialización tras el primer render: el usuario ve la interfaz mientras cargan los agentes
+first_run = not st.session_state.get("init_agents")
+if first_run:
+    with st.spinner("Cargando agentes y catálogos..."):
+        init_agents()
+# Streamlit re-ejecuta el script en cada interacción: el perfilador se detiene siempre, el informe solo al arrancar
+startup_profiler.stop()
+if first_run and startup_profiler.report():
+    print(startup_profiler.report())
+
 # --- Entrada del usuario ---
 if prompt := st.chat_input("Describe tu necesidad de hardware..."):
     st.session_state.user_response = None
@@ -155,13 +233,26 @@ if prompt := st.chat_input("Describe tu necesidad de hardware..."):
     st.session_state.blackboard.update("user_input", {"user_input": prompt}, "user_interface")
 
     with st.chat_message("assistant"):
+        placeholder = st.empty()
+        blackboard = st.session_state.blackboard
+        deadline = time.monotonic() + REQUEST_TIMEOUT + RESPONSE_GRACE
         with st.spinner("Analizando componentes y generando configuración óptima..."):
-            for _ in range(60):
-                st.session_state.user_response = st.session_state.blackboard.get("user_response", None)
-                if st.session_state.user_response or st.session_state.blackboard.state['errors']:
+            # Sondeo frecuente: la respuesta parcial (LLM en streaming) se va mostrando según llega
+            while time.monotonic() < deadline:
+                st.session_state.user_response = blackboard.get("user_response", None)
+                if st.session_state.user_response or blackboard.state['errors']:
                     break
-                sleep(1)
+                partial = blackboard.get("partial_response", None)
+                if partial:
+                    placeholder.markdown(partial + "▌")
+                time.sleep(0.1)
+            else:
+                # La interfaz deja de esperar: cancelar el trabajo pendiente de la petición
+                blackboard.cancel_request()
 
-            response = st.session_state.user_response.get("response") or "⚠️ No se recibió respuesta del sistema. Intenta nuevamente."
-            st.markdown(response)
-            st.session_state.messages.append({"role": "assistant", "content": response})
+        response = (st.session_state.user_response or {}).get("response") or "⚠️ No se recibió respuesta del sistema. Intenta nuevamente."
+        placeholder.markdown(response)
+        usage = blackboard.get("llm_usage")
+        if usage is not None and usage.calls:
+            st.caption(f"LLM: {usage.format()}")
+        st.session_state.messages.append({"role": "assistant", "content": response})
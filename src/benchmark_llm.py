@@ -0,0 +1,111 @@
+"""
+Benchmark offline de la capa LLM (límites, reintentos, hedging) contra proveedores simulados.
+
+Lanza N peticiones de extracción con una concurrencia dada a través de la misma pila de
+clientes que usa la app y mide rendimiento y latencia de cola. OpenAI se atiende con un
+MockLLMServer local (HTTP real) y Gemini con FakeGeminiClient; con la misma semilla y
+concurrencia 1 la secuencia de latencias y errores es reproducible.
+
+Uso:
+    python src/benchmark_llm.py --provider openai --requests 200 --concurrency 16
+    python src/benchmark_llm.py --provider hedged --latency lognormal:0.5:0.8 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+from typing import List, Tuple
+
+from model.LLMClient import LLMClient, OpenAIClient
+from model.async_runtime import run_sync
+from model.llm_hedging import HedgedLLMClient
+from model.llm_resilience import ResilientLLMClient
+from model.metrics import LLM_HEDGES
+from model.mock_llm import FakeGeminiClient, MockLLMConfig, MockLLMServer
+
+QUERIES = [
+    "Quiero una PC para gaming en 4K con presupuesto máximo de $1500. Prefiero NVIDIA para la GPU.",
+    "Necesito una PC para jugar en 1440p a 144fps con presupuesto de $1200",
+    "Workstation para edición 4K en Premiere (budget $2500)",
+    "PC familiar económica para oficina y Netflix",
+    "Build para machine learning local (GPU con mucho VRAM)",
+    "Servidor doméstico para Plex/NAS (bajo consumo, 24/7)",
+]
+
+
+def build_client(provider: str, config: MockLLMConfig, server: MockLLMServer, timeout: float,
+                 max_retries: int) -> LLMClient:
+    def resilient(client: LLMClient) -> LLMClient:
+        return ResilientLLMClient(client, timeout=timeout, max_retries=max_retries)
+
+    openai = lambda: resilient(OpenAIClient(model="mock", base_url=server.base_url, max_retries=0))
+    gemini = lambda: resilient(FakeGeminiClient(config=config, timeout=timeout, sdk_retries=False))
+    if provider == 'openai':
+        return openai()
+    if provider == 'gemini':
+        return gemini()
+    return HedgedLLMClient(openai(), gemini())
+
+
+async def run_load(client: LLMClient, requests: int, concurrency: int) -> List[Tuple[float, str]]:
+    """(latencia, resultado) por petición; resultado 'ok' o el tipo de error"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> Tuple[float, str]:
+        prompt = f'Texto del usuario: "{QUERIES[i % len(QUERIES)]}" (#{i})\nDevuelve SOLO un JSON con los requisitos.'
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await client.agenerate(prompt)
+                return time.perf_counter() - start, 'ok'
+            except Exception as e:
+                status = getattr(e, 'status_code', None)
+                return time.perf_counter() - start, f"{type(e).__name__}({status})" if status else type(e).__name__
+
+    return await asyncio.gather(*(one(i) for i in range(requests)))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la capa LLM con proveedores simulados")
+    parser.add_argument('--provider', choices=('openai', 'gemini', 'hedged'), default='openai')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', default=MockLLMConfig.latency)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--hang-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=10.0, help="Plazo por intento")
+    parser.add_argument('--max-retries', type=int, default=3)
+    args = parser.parse_args()
+
+    config = MockLLMConfig(latency=args.latency, error_rate=args.error_rate, hang_rate=args.hang_rate,
+                           hang_seconds=args.timeout * 2, seed=args.seed)
+    server = MockLLMServer(port=0, config=config).start()
+    try:
+        client = build_client(args.provider, config, server, args.timeout, args.max_retries)
+        start = time.perf_counter()
+        results = run_sync(run_load(client, args.requests, args.concurrency))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.stop()
+
+    latencies = [latency for latency, outcome in results if outcome == 'ok']
+    outcomes = Counter(outcome for _, outcome in results)
+    print(f"Proveedor: {args.provider} | peticiones: {args.requests} | concurrencia: {args.concurrency}")
+    print(f"Tiempo total: {elapsed:.2f}s | rendimiento: {args.requests / elapsed:.1f} peticiones/s")
+    if latencies:
+        print(f"Latencia (s): p50={_percentile(latencies, 0.5):.3f} p95={_percentile(latencies, 0.95):.3f} "
+              f"p99={_percentile(latencies, 0.99):.3f} máx={max(latencies):.3f}")
+    print("Resultados: " + ", ".join(f"{outcome}={count}" for outcome, count in outcomes.most_common()))
+    if args.provider == 'hedged':
+        hedges = {o: int(LLM_HEDGES.value(outcome=o)) for o in ('not_needed', 'primary_won', 'secondary_won', 'failed')}
+        print("Hedging: " + ", ".join(f"{o}={n}" for o, n in hedges.items()))
+
+
+if __name__ == "__main__":
+    main()
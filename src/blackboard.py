@@ -1,9 +1,12 @@
 from typing import Dict, List, Any, Optional, Callable
 from dataclasses import dataclass
 from enum import Enum
+from collections import deque
 import threading
 import time
 import json
+from model.metrics import CANDIDATES_PROPOSED
+from model.llm_usage import LLMUsage, usage_scope, record_request_usage
 
 class EventType(Enum):
     """Tipos de eventos para notificaciones"""
@@ -22,28 +25,70 @@ class BlackboardEntry:
     agent_id: str
     version: int = 1
 
+class RequestContext:
+    """Plazo y cancelación cooperativa de una petición del usuario"""
+    def __init__(self, request_id: int, timeout: float):
+        self.request_id = request_id
+        self.deadline = time.time() + timeout
+        self._cancelled = threading.Event()
+        self.llm_usage = LLMUsage()  # Llamadas al LLM hechas por los agentes de esta petición
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+    
+    def cancel(self):
+        self._cancelled.set()
+    
+    def remaining(self) -> float:
+        """Segundos restantes hasta el plazo (0 si ya venció)"""
+        return max(0.0, self.deadline - time.time())
+    
+    def expired(self) -> bool:
+        return time.time() >= self.deadline
+    
+    def should_stop(self) -> bool:
+        return self.cancelled or self.expired()
+
 class Blackboard:
-    def __init__(self, components_agent_number = 7):
+    def __init__(self, components_agent_number = 7, request_timeout: float = 60.0, synchronous: bool = False):
         # Estado estructurado del sistema
         self.state = {
             'user_input': None,
             'user_response': None,          # Respuesta del usuario a la propuesta
+            'partial_response': None,       # Respuesta en curso mientras el LLM la genera
+            'llm_usage': None,              # LLMUsage de la petición: tokens, tiempo y coste por llamada
             'user_requirements': None,       # Requisitos extraídos por BDI
             'component_proposals': {},       # {agent_id: [components]}
             'compatibility_issues': [],      # Problemas detectados
             'optimized_configs': [],         # Configuraciones finales
             'knowledge_updates': {},          # Datos para actualizar RAG
             'compatibility_status': {'ready_for_compability': False},
-            'errors': []
+            'errors': [],
+            'request': None,                 # RequestContext de la petición en curso
+            'degraded_stages': []            # Etapas que devolvieron resultados parciales por plazo
         }
         
         # Control de concurrencia
         self.lock = threading.RLock()
+        self._local = threading.local()      # Petición asociada a cada hilo de callback
+        
+        # Plazo por petición (segundos desde user_input)
+        self.request_timeout = request_timeout
+        self._request_counter = 0
         self.subscribers: Dict[EventType, List[Callable]] = {e: [] for e in EventType}
         
         # Histórico de cambios (para debugging/experimentación)
         self.audit_log = []
         
+        # Observadores de cada actualización (p. ej. SessionRecorder)
+        self.observers: List[Callable[[str, BlackboardEntry], None]] = []
+        self._pending_observations = deque()  # (sección, entrada) por entregar, en el orden del audit_log
+        self._observers_lock = threading.Lock()
+        
+        # Ejecutar callbacks en el hilo que notifica (reproducción determinista de sesiones)
+        self.synchronous = synchronous
+        
         # Número de agentes que deben proponer componentes
         self.total_components_agent_proposal = components_agent_number
         self.actual_components_agent_proposal = 0
@@ -57,9 +102,23 @@ class Blackboard:
         with self.lock:
             self.subscribers[event_type].append(callback)
     
+    def add_observer(self, callback: Callable[[str, BlackboardEntry], None]):
+        """Registra un observador que recibe (sección, entrada) en cada actualización"""
+        with self.lock:
+            self.observers.append(callback)
+    
     def update(self, section: str, data: Any, agent_id: str, notify: bool = True):
         """Actualiza una sección del estado de manera segura"""
+        bound = getattr(self._local, 'request', None)
+        if bound is not None and bound.cancelled:
+            # Trabajo de una petición abandonada: se descarta
+            print(f"[Blackboard] Actualización de '{section}' descartada ({agent_id}): petición {bound.request_id} cancelada")
+            return
+        
         with self.lock:
+            if section == 'user_input':
+                self._start_request()
+            
             # Registrar cambio
             entry = BlackboardEntry(
                 data=data,
@@ -67,6 +126,10 @@ class Blackboard:
                 agent_id=agent_id
             )
             
+            if section == 'component_proposals' and isinstance(data, dict):
+                for comp_type, candidates in data.items():
+                    CANDIDATES_PROPOSED.observe(len(candidates), component_type=comp_type)
+            
             # Secciones especiales con versionado
             if section in self.state and isinstance(self.state[section], dict):
                 self.state[section][agent_id] = data
@@ -75,21 +138,53 @@ class Blackboard:
                 self.state[section] = data
             
             self.audit_log.append((section, entry))
+            request = self.state.get('request') if section == 'user_response' else None
+            if self.observers:
+                self._pending_observations.append((section, entry))
+        
+        # Observadores (p. ej. escritura a disco) fuera del lock: no bloquean al resto de agentes
+        self._deliver_observations()
+        
+        if request is not None:
+            # Consumo del LLM de la petición (presupuesto de latencia y coste)
+            record_request_usage(request.request_id, request.llm_usage)
+        
+        # Notificar según tipo de cambio
+        if notify:
+            event_map = {
+                'user_input': EventType.USER_INPUT,
+                'user_requirements': EventType.REQUIREMENTS_UPDATED,
+                'component_proposals': EventType.COMPONENTS_PROPOSED,
+                'compatibility_status': EventType.TRIGGER_COMPATIBILITY,
+                'compatibility_issues': EventType.COMPATIBILITY_CHECKED,
+                'optimized_configs': EventType.OPTIMIZATION_DONE,
+                'user_response': EventType.USER_RESPONSE
+            }
             
-            # Notificar según tipo de cambio
-            if notify:
-                event_map = {
-                    'user_input': EventType.USER_INPUT,
-                    'user_requirements': EventType.REQUIREMENTS_UPDATED,
-                    'component_proposals': EventType.COMPONENTS_PROPOSED,
-                    'compatibility_status': EventType.TRIGGER_COMPATIBILITY,
-                    'compatibility_issues': EventType.COMPATIBILITY_CHECKED,
-                    'optimized_configs': EventType.OPTIMIZATION_DONE,
-                    'user_response': EventType.USER_RESPONSE
-                }
-                
-                if section in event_map:
-                    self._notify(event_map[section])
+            if section in event_map:
+                self._notify(event_map[section])
+    
+    def _deliver_observations(self):
+        """
+        Entrega a los observadores las actualizaciones pendientes, de una en una y en orden.
+        Si otro hilo ya está entregando, él se encarga también de las nuevas.
+        """
+        while self._observers_lock.acquire(blocking=False):
+            try:
+                while True:
+                    with self.lock:
+                        if not self._pending_observations:
+                            break
+                        section, entry = self._pending_observations.popleft()
+                        observers = self.observers[:]
+                    for observer in observers:
+                        observer(section, entry)
+            finally:
+                self._observers_lock.release()
+            # Una actualización encolada justo antes de soltar el lock no debe quedarse sin entregar
+            with self.lock:
+                if not self._pending_observations:
+                    return
     
     def get(self, section: str, agent_id: str = None) -> Any:
         """Obtiene datos de una sección de manera segura"""
@@ -104,10 +199,87 @@ class Blackboard:
         """Notifica a agentes suscritos de manera asíncrona"""
         with self.lock:
             callbacks = self.subscribers[event_type][:]
+        request = self.current_request()
         
         # Ejecutar en hilos separados para no bloquear
         for callback in callbacks:
-            threading.Thread(target=callback, daemon=True).start()
+            if self.synchronous:
+                self._run_bound(request, callback)
+            else:
+                threading.Thread(target=self._run_bound, args=(request, callback), daemon=True).start()
+    
+    def _run_bound(self, request: Optional[RequestContext], callback: Callable):
+        """Ejecuta el callback asociando el hilo a la petición que lo originó"""
+        previous = getattr(self._local, 'request', None)
+        self._local.request = request
+        try:
+            if request is not None and request.cancelled:
+                return
+            with usage_scope(request.llm_usage if request is not None else None):
+                callback()
+        finally:
+            self._local.request = previous
+    
+    def _start_request(self):
+        """Abre una nueva petición: cancela la anterior y limpia las secciones por petición"""
+        previous = self.state.get('request')
+        if previous is not None:
+            previous.cancel()
+        
+        self._request_counter += 1
+        self.state['request'] = RequestContext(self._request_counter, self.request_timeout)
+        self.state['user_response'] = None
+        self.state['partial_response'] = None
+        self.state['llm_usage'] = self.state['request'].llm_usage
+        self.state['component_proposals'] = {}
+        self.state['compatibility_issues'] = []
+        self.state['optimized_configs'] = []
+        self.state['compatibility_status'] = {'ready_for_compability': False}
+        self.state['errors'] = []
+        self.state['degraded_stages'] = []
+        self.actual_components_agent_proposal = 0
+    
+    def current_request(self) -> Optional[RequestContext]:
+        """Petición asociada al hilo actual o, en su defecto, la petición en curso"""
+        return getattr(self._local, 'request', None) or self.state.get('request')
+    
+    def should_stop(self) -> bool:
+        """True si la petición fue cancelada o se agotó su plazo"""
+        request = self.current_request()
+        return request is not None and request.should_stop()
+    
+    def is_cancelled(self) -> bool:
+        """True solo si la petición fue abandonada (no por plazo vencido)"""
+        request = self.current_request()
+        return request is not None and request.cancelled
+    
+    def time_remaining(self) -> float:
+        request = self.current_request()
+        return request.remaining() if request is not None else float('inf')
+    
+    def stage_deadline(self, min_seconds: float = 0.0) -> Optional[float]:
+        """
+        Plazo absoluto (time.time()) para una etapa: el tiempo que le queda a la petición, pero al menos
+        min_seconds (etapas que deben entregar algo aunque el plazo haya vencido). None si no hay petición
+        """
+        remaining = self.time_remaining()
+        if remaining == float('inf'):
+            return None
+        return time.time() + max(remaining, min_seconds)
+    
+    def cancel_request(self):
+        """Cancela la petición en curso (p. ej. cuando la interfaz deja de esperar)"""
+        with self.lock:
+            request = self.state.get('request')
+        if request is not None:
+            request.cancel()
+    
+    def mark_degraded(self, stage: str):
+        """Registra que una etapa devolvió un resultado parcial por falta de tiempo"""
+        with self.lock:
+            if stage not in self.state['degraded_stages']:
+                self.state['degraded_stages'].append(stage)
+                print(f"[Blackboard] Plazo agotado: {stage} devolvió resultados parciales")
     
     def trigger_compability_event(self):
         self.actual_components_agent_proposal += 1
@@ -128,12 +300,21 @@ class Blackboard:
         :return: {component_type: [components]}
         """
         with self.lock:
-            proposals = self.state.get('component_proposals', {})
-            
             if self.actual_components_agent_proposal < self.total_components_agent_proposal:
                 #raise ValueError(f"Faltan contribuciones de agentes. Solo {len(proposals)}/{min_agents}")
                 return []
             
+            return self.get_proposed_components()
+    
+    def get_proposed_components(self) -> Dict[str, List]:
+        """
+        Propuestas recibidas hasta ahora combinadas por tipo, aunque falten agentes por proponer
+        (compatibilidad incremental)
+        :return: {component_type: [components]}
+        """
+        with self.lock:
+            proposals = self.state.get('component_proposals', {})
+            
             # Combinar propuestas eliminando duplicados
             consolidated = {}
             for agent, components in proposals.items():
@@ -162,13 +343,17 @@ class Blackboard:
         self.state = {
             'user_input': None,
             'user_response': None,          # Respuesta del usuario a la propuesta
+            'partial_response': None,       # Respuesta en curso mientras el LLM la genera
+            'llm_usage': None,              # LLMUsage de la petición: tokens, tiempo y coste por llamada
             'user_requirements': None,       # Requisitos extraídos por BDI
             'component_proposals': {},       # {agent_id: [components]}
             'compatibility_issues': [],      # Problemas detectados
             'optimized_configs': [],         # Configuraciones finales
             'knowledge_updates': {},          # Datos para actualizar RAG
             'compatibility_status': {'ready_for_compability': False},
-            'errors': []
+            'errors': [],
+            'request': None,
+            'degraded_stages': []
         }
         
         # Histórico de cambios (para debugging/experimentación)
@@ -0,0 +1,39 @@
+"""
+Precalcula la matriz de compatibilidad de todo el catálogo para CompatibilityAgent.
+
+Evalúa todas las reglas de compatibilidad sobre todos los pares de SKUs de tipos distintos
+y guarda una matriz de bits por par de tipos en src/data/compat_matrix/. Si ya existe, solo
+se recalculan las filas y columnas de los SKUs añadidos o modificados en los catálogos.
+La app la carga al arrancar (COMPAT_MATRIX=0 la desactiva).
+
+Uso:
+    python src/build_compat_matrix.py
+    python src/build_compat_matrix.py --full --output src/data/compat_matrix
+"""
+import argparse
+import time
+
+from agents.compatibility_matrix import CATALOG_NAMES, CompatibilityMatrixStore
+from model.vectorDB import CSVToEmbeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precalcula la matriz de compatibilidad del catálogo")
+    parser.add_argument('--output', default="src/data/compat_matrix", help="Directorio de la matriz")
+    parser.add_argument('--embeddings', default="src/data/component_embeddings", help="Directorio de los catálogos")
+    parser.add_argument('--full', action='store_true', help="Recalcular todo aunque exista una matriz anterior")
+    args = parser.parse_args()
+
+    catalogs = {
+        name: CSVToEmbeddings.load_embeddings(name, args.embeddings)['metadata']
+        for name in sorted(set(CATALOG_NAMES.values()))
+    }
+    start = time.perf_counter()
+    stats = CompatibilityMatrixStore(args.output).build(catalogs, full=args.full)
+    evaluations = sum(s['evaluations'] for s in stats.values())
+    print(f"Matriz construida en {time.perf_counter() - start:.2f}s: {len(stats)} pares de tipos, "
+          f"{evaluations} evaluaciones de pares")
+
+
+if __name__ == "__main__":
+    main()
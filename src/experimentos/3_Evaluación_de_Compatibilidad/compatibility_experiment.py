@@ -28,7 +28,7 @@ class CompatibilityExperiment:
             self.compatibility_agent.check_compatibility()
             
             # Obtener resultados
-            issues = self.agents['blackboard'].get('compatibility_issues', [])
+            issues = self._detected_issues()
             detected = self._was_incompatibility_detected(issues, comp1_type, comp1_model, comp2_type, comp2_model)
             
             # Registrar resultado
@@ -82,6 +82,16 @@ class CompatibilityExperiment:
         # Si no se encuentra, seleccionar aleatorio
         return random.choice(db['metadata'])
     
+    def _detected_issues(self) -> List:
+        """Incompatibilidades publicadas, con componentes y motivo (el blackboard guarda solo índices)"""
+        conflicts = self.agents['blackboard'].get('compatibility_issues')
+        if not conflicts:
+            return []
+        components = self.compatibility_agent._extract_component_info(
+            self.agents['blackboard'].get_consolidated_components() or {}
+        )
+        return conflicts.issues(components)
+    
     def _was_incompatibility_detected(self, issues, comp1_type, comp1_model, comp2_type, comp2_model) -> bool:
         """Verifica si se detectó la incompatibilidad específica"""
         for issue in issues:
@@ -0,0 +1,56 @@
+"""
+Servidor LLM simulado compatible con la API chat-completions de OpenAI, para pruebas de carga.
+
+Uso:
+    python src/mock_llm_server.py --port 8099 --latency lognormal:0.8:0.5 --error-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 streamlit run src/app.py
+
+Con GEMINI_FAKE=1 la app usa además FakeGeminiClient (configurado con MOCK_LLM_LATENCY,
+MOCK_LLM_ERROR_RATE, MOCK_LLM_HANG_RATE y MOCK_LLM_SEED).
+"""
+import argparse
+import json
+
+from model.mock_llm import MockLLMConfig, MockLLMServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor LLM simulado (API de OpenAI)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', default=MockLLMConfig.latency,
+                        help="fixed:S, uniform:MIN:MAX, exponential:MEDIA o lognormal:MEDIANA:SIGMA")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fracción de respuestas con error HTTP")
+    parser.add_argument('--error-statuses', default="429,500,503", help="Códigos de error posibles")
+    parser.add_argument('--hang-rate', type=float, default=0.0, help="Fracción de peticiones colgadas")
+    parser.add_argument('--hang-seconds', type=float, default=60.0)
+    parser.add_argument('--token-delay', type=float, default=0.02, help="Pausa entre fragmentos en streaming")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--canned', default=None, help="JSON {regex del prompt: respuesta}")
+    args = parser.parse_args()
+
+    canned = {}
+    if args.canned:
+        with open(args.canned, encoding='utf-8') as f:
+            canned = json.load(f)
+
+    config = MockLLMConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        error_statuses=tuple(int(s) for s in args.error_statuses.split(',')),
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+        token_delay=args.token_delay,
+        seed=args.seed,
+        canned=canned
+    )
+    server = MockLLMServer(args.port, args.host, config)
+    print(f"[MockLLM] Escuchando en {server.base_url} (latencia {config.latency}, errores {config.error_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
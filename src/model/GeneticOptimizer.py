@@ -1,21 +1,34 @@
 import random
 import re
 import time
+from collections import OrderedDict
 from typing import Dict, List, Tuple, Set, Optional, Callable
 
+import numpy as np
+
+from model.conflict_graph import ConflictGraph
+
+ENGINES = ("python", "numpy")
+MAX_REMUTATIONS = 3  # intentos de volver a mutar un hijo repetido antes de aceptarlo
+
 class GeneticOptimizer:
     def __init__(
         self,
         domains: Dict[str, List[Dict]],
         budget_limit: float,
-        compatibility_conflicts: Set[Tuple[Tuple[str, str], Tuple[str, str]]],
+        compatibility_conflicts: ConflictGraph,  # índices '_index' de los dominios
         fitness_mode: str = "quality_price",
         population_size: int = 50,
         generations: int = 100,
         mutation_rate: float = 0.1,
         elite_ratio: float = 0.1,
-        timeout: float = 5.0  # segundos
+        timeout: float = 5.0,  # segundos
+        should_stop: Optional[Callable[[], bool]] = None,  # plazo/cancelación de la petición
+        engine: str = "python",  # "numpy": población como matriz de índices y generaciones vectorizadas
+        cache_size: int = 10000  # genotipos con aptitud memorizada (motor clásico)
     ):
+        if engine not in ENGINES:
+            raise ValueError(f"Motor desconocido: {engine}. Opciones: {', '.join(ENGINES)}")
         self.domains = domains
         self.budget_limit = budget_limit
         self.compatibility_conflicts = compatibility_conflicts
@@ -25,20 +38,54 @@ class GeneticOptimizer:
         self.mutation_rate = mutation_rate
         self.elite_ratio = elite_ratio
         self.timeout = timeout
+        self.should_stop = should_stop or (lambda: False)
+        self.engine = engine
+        self.cache_size = cache_size
         self.component_types = sorted(domains.keys())
+        self.generations_run = 0
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._fitness_cache: "OrderedDict[Tuple[int, ...], Optional[float]]" = OrderedDict()
+        self.cache_hits = 0
+        self.evaluations = 0
+        self.duplicates_remutated = 0
+
+    def run_stats(self) -> Dict[str, float]:
+        """
+        Aptitudes reutilizadas de la LRU frente a calculadas e hijos repetidos vueltos a mutar en la última corrida.
+        El motor vectorizado no usa la LRU: sus aciertos son siempre 0
+        """
+        lookups = self.cache_hits + self.evaluations
+        return {
+            'evaluations': self.evaluations,
+            'cache_hits': self.cache_hits,
+            'hit_rate': self.cache_hits / lookups if lookups else 0.0,
+            'duplicates_remutated': self.duplicates_remutated
+        }
 
     def run(self) -> Optional[Dict[str, Dict]]:
         print("start")
+        self._reset_stats()
+        best = self._run_numpy() if self.engine == "numpy" else self._run_python()
+        stats = self.run_stats()
+        print(f"[GeneticOptimizer] {self.generations_run} generaciones, {stats['evaluations']} evaluaciones, "
+              f"{stats['hit_rate']:.0%} de aptitudes reutilizadas, {stats['duplicates_remutated']} hijos repetidos mutados")
+        return best
+
+    def _run_python(self) -> Optional[Dict[str, Dict]]:
         population = self._initialize_population()
         best = None
         best_score = float("-inf")
         start_time = time.time()
+        self.generations_run = 0
 
         for generation in range(self.generations):
-            if time.time() - start_time > self.timeout:
+            if time.time() - start_time > self.timeout or self.should_stop():
                 break
+            self.generations_run += 1
 
-            scored = [(ind, self._fitness(ind)) for ind in population]
+            scored = [(ind, self._cached_fitness(ind)) for ind in population]
             scored = [s for s in scored if s[1] is not None]
             if not scored:
                 continue
@@ -48,11 +95,14 @@ class GeneticOptimizer:
 
             elites = [ind for ind, _ in scored[:int(self.elite_ratio * self.population_size)]]
             new_population = elites[:]
+            genotypes = {self._genotype(ind) for ind in new_population}
 
             while len(new_population) < self.population_size:
                 p1, p2 = self._select_parents(scored)
                 child = self._crossover(p1, p2)
                 child = self._mutate(child)
+                child = self._remutate_duplicate(child, genotypes)
+                genotypes.add(self._genotype(child))
                 new_population.append(child)
 
             population = new_population
@@ -71,6 +121,33 @@ class GeneticOptimizer:
             attempts += 1
         return population
 
+    def _genotype(self, build: Dict[str, Dict]) -> Tuple[int, ...]:
+        return tuple(build[comp]["_index"] for comp in self.component_types)
+
+    def _cached_fitness(self, build: Dict[str, Dict]) -> Optional[float]:
+        """_fitness memorizada por genotipo (LRU de cache_size entradas): las élites y los hijos ya vistos no se recalculan"""
+        key = self._genotype(build)
+        if key in self._fitness_cache:
+            self._fitness_cache.move_to_end(key)
+            self.cache_hits += 1
+            return self._fitness_cache[key]
+        self.evaluations += 1
+        fitness = self._fitness(build)
+        self._fitness_cache[key] = fitness
+        if len(self._fitness_cache) > self.cache_size:
+            self._fitness_cache.popitem(last=False)
+        return fitness
+
+    def _remutate_duplicate(self, child: Dict[str, Dict], genotypes: Set[Tuple[int, ...]]) -> Dict[str, Dict]:
+        """Un hijo idéntico a otro individuo de la nueva población vuelve a mutar un gen en lugar de evaluarse de nuevo"""
+        for _ in range(MAX_REMUTATIONS):
+            if self._genotype(child) not in genotypes:
+                break
+            self.duplicates_remutated += 1
+            comp = random.choice(self.component_types)
+            child = {**child, comp: random.choice(self.domains[comp])}
+        return child
+
     def _fitness(self, build: Dict[str, Dict]) -> Optional[float]:
         if not self._is_valid(build):
             return None
@@ -84,10 +161,10 @@ class GeneticOptimizer:
             return None
 
     def _is_valid(self, build: Dict[str, Dict]) -> bool:
-        names = [(t, c.get("Model_Name", "Unknown")) for t, c in build.items()]
-        for i in range(len(names)):
-            for j in range(i + 1, len(names)):
-                if (names[i], names[j]) in self.compatibility_conflicts:
+        chosen = [(t, c["_index"]) for t, c in build.items()]
+        for i in range(len(chosen)):
+            for j in range(i + 1, len(chosen)):
+                if self.compatibility_conflicts.conflicts(*chosen[i], *chosen[j]):
                     return False
         total = sum(float(c.get("price", c.get("Price", 1e9))) for c in build.values())
         return total <= self.budget_limit
@@ -146,3 +223,134 @@ class GeneticOptimizer:
         match = re.search(r"#(\d+)", raw)
         if match:
             return int(match.group(1))
+
+    # --- Motor vectorizado ---
+    # Individuo = fila de una matriz (individuos x tipos) con la posición elegida en el dominio de
+    # cada tipo. Precio, rendimiento e incompatibilidades se precalculan una vez por tipo/par y cada
+    # generación (aptitud, presupuesto, torneo, cruce y mutación) son operaciones sobre la matriz.
+
+    def _prepare_arrays(self):
+        self._sizes = np.array([len(self.domains[t]) for t in self.component_types], dtype=np.intp)
+        # Pesos para codificar un genotipo como entero, si el espacio de combinaciones cabe en int64
+        self._strides = None
+        if float(np.prod(self._sizes.astype(float))) < 2 ** 62:
+            self._strides = np.concatenate([np.cumprod(self._sizes[::-1])[::-1][1:], [1]]).astype(np.int64)
+        self._prices = [
+            np.array([float(c.get("price", c.get("Price", 1e9))) for c in self.domains[t]])
+            for t in self.component_types
+        ]
+        self._perfs = [
+            np.array([self._estimate_component_perf(c) for c in self.domains[t]])
+            for t in self.component_types
+        ]
+        indices = {t: [c["_index"] for c in self.domains[t]] for t in self.component_types}
+        self._pair_conflicts = []  # (columna_i, columna_j, matriz booleana de incompatibilidades)
+        for i, type_i in enumerate(self.component_types):
+            for j in range(i + 1, len(self.component_types)):
+                type_j = self.component_types[j]
+                matrix = self.compatibility_conflicts.matrix(type_i, indices[type_i], type_j, indices[type_j])
+                if matrix is not None and matrix.any():
+                    self._pair_conflicts.append((i, j, matrix))
+
+    def _random_genes(self, rng: np.random.Generator, count: int) -> np.ndarray:
+        return (rng.random((count, len(self._sizes))) * self._sizes).astype(np.intp)
+
+    def _population_fitness(self, population: np.ndarray) -> np.ndarray:
+        """Aptitud de cada fila; -inf si incumple presupuesto o compatibilidad (como _fitness -> None)"""
+        price = np.zeros(len(population))
+        perf = np.zeros(len(population))
+        for column in range(population.shape[1]):
+            price += self._prices[column][population[:, column]]
+            perf += self._perfs[column][population[:, column]]
+        valid = price <= self.budget_limit
+        for i, j, matrix in self._pair_conflicts:
+            valid &= ~matrix[population[:, i], population[:, j]]
+
+        if self.fitness_mode == "quality_price":
+            fitness = np.divide(perf, price, out=np.zeros_like(perf), where=price > 0)
+        elif self.fitness_mode == "performance":
+            fitness = perf
+        else:
+            return np.full(len(population), -np.inf)
+        return np.where(valid, fitness, -np.inf)
+
+    def _repeated_rows(self, population: np.ndarray) -> np.ndarray:
+        """Máscara de las filas iguales a otra anterior"""
+        repeated = np.zeros(len(population), dtype=bool)
+        if self._strides is not None:
+            # Cada genotipo como un único entero (posición en el espacio de combinaciones)
+            keys = population @ self._strides
+            order = np.argsort(keys, kind="stable")
+            repeated[order[1:][keys[order[1:]] == keys[order[:-1]]]] = True
+        else:
+            _, first = np.unique(population, axis=0, return_index=True)
+            repeated[:] = True
+            repeated[first] = False
+        return repeated
+
+    def _remutate_duplicates(self, rng: np.random.Generator, population: np.ndarray, protected: int) -> np.ndarray:
+        """Vuelve a mutar un gen de las filas repetidas; las `protected` primeras (élites) no se tocan"""
+        for _ in range(MAX_REMUTATIONS):
+            repeated = self._repeated_rows(population)
+            repeated[:protected] = False
+            rows = np.flatnonzero(repeated)
+            if not len(rows):
+                break
+            self.duplicates_remutated += len(rows)
+            columns = rng.integers(0, population.shape[1], size=len(rows))
+            population[rows, columns] = (rng.random(len(rows)) * self._sizes[columns]).astype(np.intp)
+        return population
+
+    def _run_numpy(self) -> Optional[Dict[str, Dict]]:
+        start_time = time.time()
+        self.generations_run = 0
+        if not self.component_types or any(not self.domains[t] for t in self.component_types):
+            return None
+        self._prepare_arrays()
+        # Semilla desde random: random.seed() también hace reproducible este motor
+        rng = np.random.default_rng(random.getrandbits(64))
+
+        # Población inicial: muestras aleatorias válidas, con el mismo número de intentos que el motor clásico
+        candidates = self._random_genes(rng, self.population_size * 10)
+        candidate_fitness = self._population_fitness(candidates)
+        self.evaluations += len(candidates)
+        kept = np.isfinite(candidate_fitness)
+        population = candidates[kept][:self.population_size]
+        fitness = candidate_fitness[kept][:self.population_size]
+        n_elite = int(self.elite_ratio * self.population_size)
+        best, best_score = None, float("-inf")
+
+        for generation in range(self.generations):
+            if time.time() - start_time > self.timeout or self.should_stop():
+                break
+            if not len(population):
+                break
+            self.generations_run += 1
+
+            valid = np.flatnonzero(np.isfinite(fitness))
+            if not len(valid):
+                break
+            ranked = valid[np.argsort(-fitness[valid], kind="stable")]
+            if fitness[ranked[0]] > best_score:
+                best, best_score = population[ranked[0]].copy(), fitness[ranked[0]]
+
+            elites = population[ranked[:n_elite]]
+            n_children = self.population_size - len(elites)
+
+            # Torneos de 3 entre los individuos válidos, cruce uniforme y mutación por gen
+            contenders = valid[rng.integers(0, len(valid), size=(n_children, 2, 3))]
+            winners = np.take_along_axis(contenders, fitness[contenders].argmax(axis=2)[..., None], axis=2)[..., 0]
+            parent_1, parent_2 = population[winners[:, 0]], population[winners[:, 1]]
+            children = np.where(rng.random(parent_1.shape) < 0.5, parent_1, parent_2)
+            mutated = rng.random(children.shape) < self.mutation_rate
+            children = np.where(mutated, self._random_genes(rng, n_children), children)
+
+            # Las élites conservan su aptitud; solo se evalúan los hijos, sin repetidos.
+            # Arrastrar la aptitud de las élites no es una consulta a la LRU: no cuenta como acierto
+            population = self._remutate_duplicates(rng, np.vstack([elites, children]), len(elites))
+            fitness = np.concatenate([fitness[ranked[:n_elite]], self._population_fitness(population[len(elites):])])
+            self.evaluations += n_children
+
+        if best is None:
+            return None
+        return {t: self.domains[t][best[column]] for column, t in enumerate(self.component_types)}
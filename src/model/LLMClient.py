@@ -1,12 +1,49 @@
 from abc import ABC, abstractmethod
+import asyncio
 import os
+import time
+from typing import AsyncIterator, Iterator, Optional, Tuple
 from dotenv import load_dotenv
-import google.generativeai as genai
-from openai import OpenAI
+from model.metrics import LLM_LATENCY, LLM_ERRORS, LLM_TIME_TO_FIRST_TOKEN
+from model.llm_usage import record_llm_call
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Códigos HTTP transitorios: límite de cuota, timeouts y errores del servidor
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """Código HTTP de una excepción de los SDK (openai: status_code; google: code)"""
+    for candidate in (getattr(error, 'status_code', None), getattr(error, 'code', None),
+                      getattr(getattr(error, 'response', None), 'status_code', None)):
+        if isinstance(candidate, int):
+            return candidate
+    return None
+
+
+class LLMError(RuntimeError):
+    """Error de un proveedor LLM, con el código HTTP (si lo hay) y si merece reintentarse"""
+
+    def __init__(self, message: str, provider: str = None, status_code: Optional[int] = None,
+                 retryable: bool = False):
+        super().__init__(message)
+        self.provider = provider
+        self.status_code = status_code
+        self.retryable = retryable
+
+    @classmethod
+    def from_exception(cls, error: Exception, provider: str, prefix: str) -> "LLMError":
+        if isinstance(error, LLMError):
+            return error
+        status = _status_code(error)
+        transient = isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)) or any(
+            word in type(error).__name__ for word in ('Timeout', 'Connection', 'DeadlineExceeded', 'Unavailable'))
+        retryable = transient or (status is not None and (status in RETRYABLE_STATUS or status >= 500))
+        return cls(f"{prefix}: {str(error)}", provider, status, retryable)
+
+
 class LLMClient(ABC):
     """Interfaz abstracta para clientes de LLM"""
     
@@ -15,6 +52,24 @@ class LLMClient(ABC):
         """Método principal para generar texto"""
         pass
 
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        """Versión asíncrona; por defecto ejecuta generate() en un hilo"""
+        return await asyncio.to_thread(self.generate, prompt, **kwargs)
+
+    def generate_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Genera el texto por fragmentos; por defecto, la respuesta completa en un único fragmento"""
+        yield self.generate(prompt, **kwargs)
+
+    async def agenerate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Versión asíncrona de generate_stream()"""
+        yield await self.agenerate(prompt, **kwargs)
+
+    def _record_usage(self, prompt: str, completion: Optional[str], start: float,
+                      usage: Optional[Tuple[int, int]] = None, status: str = 'ok'):
+        """Contabiliza la llamada (tokens, tiempo y coste) en métricas y en el ámbito de la petición"""
+        model = getattr(self, 'model', None) or getattr(self, 'model_name', '')
+        record_llm_call(self.provider, model, prompt, completion, time.perf_counter() - start, usage, status)
+
     @staticmethod
     def validate_key(key: str) -> bool:
         """Valida que la API key tenga formato correcto"""
@@ -22,33 +77,156 @@ class LLMClient(ABC):
 
 class OpenAIClient(LLMClient):
     """Implementación para OpenAI"""
+    provider = "openai"
     
-    def __init__(self, model: str = "gpt-4-turbo"):
-        self.client = OpenAI(api_key=self._get_api_key())
+    def __init__(self, model: str = "gpt-4-turbo", timeout: float = 30.0, max_retries: int = 2,
+                 base_url: Optional[str] = None):
+        """
+        :param timeout: Plazo por llamada (segundos)
+        :param max_retries: Reintentos internos del SDK (0 si los gestiona ResilientLLMClient)
+        :param base_url: Endpoint compatible con OpenAI (p. ej. model.mock_llm.MockLLMServer);
+            por defecto OPENAI_BASE_URL o la API de OpenAI
+        """
+        # SDK importado en el primer uso: no penaliza el arranque si se usa otro proveedor
+        from openai import OpenAI
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+        self.client = OpenAI(api_key=self._get_api_key(), timeout=timeout, max_retries=max_retries,
+                             base_url=self.base_url)
+        self._async_client = None
         self.model = model
     
     def _get_api_key(self) -> str:
         key = os.getenv("OPENAI_API_KEY")
         if not self.validate_key(key):
+            if self.base_url:
+                # Los endpoints locales no comprueban la clave
+                return key or "sk-local"
             raise ValueError("OpenAI API key inválida o no configurada en .env")
         return key
+
+    def _get_async_client(self):
+        # Cliente async persistente (pool de conexiones httpx); ligado al loop que lo usa primero
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+            self._async_client = AsyncOpenAI(api_key=self._get_api_key(), timeout=self.timeout,
+                                             max_retries=self.max_retries, base_url=self.base_url)
+        return self._async_client
     
+    @staticmethod
+    def _usage(response) -> Optional[Tuple[int, int]]:
+        usage = getattr(response, 'usage', None)
+        if usage is None or usage.prompt_tokens is None:
+            return None
+        return usage.prompt_tokens, usage.completion_tokens or 0
+
     def generate(self, prompt: str, **kwargs) -> str:
+        start = time.perf_counter()
+        try:
+            with LLM_LATENCY.time(provider=self.provider, model=self.model):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    **kwargs
+                )
+            text = response.choices[0].message.content
+        except Exception as e:
+            LLM_ERRORS.inc(provider=self.provider, model=self.model)
+            self._record_usage(prompt, None, start, status='error')
+            raise LLMError.from_exception(e, self.provider, "Error en OpenAI")
+        self._record_usage(prompt, text, start, self._usage(response))
+        return text
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        client = self._get_async_client()
+        start = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                **kwargs
-            )
-            return response.choices[0].message.content
+            with LLM_LATENCY.time(provider=self.provider, model=self.model):
+                response = await client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    **kwargs
+                )
+            text = response.choices[0].message.content
+        except asyncio.CancelledError:
+            self._record_usage(prompt, None, start, status='cancelled')
+            raise
         except Exception as e:
-            raise RuntimeError(f"Error en OpenAI: {str(e)}")
+            LLM_ERRORS.inc(provider=self.provider, model=self.model)
+            self._record_usage(prompt, None, start, status='error')
+            raise LLMError.from_exception(e, self.provider, "Error en OpenAI")
+        self._record_usage(prompt, text, start, self._usage(response))
+        return text
+
+    def generate_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        start = time.perf_counter()
+        chunks = []
+        try:
+            with LLM_LATENCY.time(provider=self.provider, model=self.model):
+                stream = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    stream=True,
+                    **kwargs
+                )
+                for chunk in stream:
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if text:
+                        if not chunks:
+                            LLM_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start, provider=self.provider, model=self.model)
+                        chunks.append(text)
+                        yield text
+        except GeneratorExit:
+            self._record_usage(prompt, ''.join(chunks), start, status='cancelled')
+            raise
+        except Exception as e:
+            LLM_ERRORS.inc(provider=self.provider, model=self.model)
+            self._record_usage(prompt, None, start, status='error')
+            raise LLMError.from_exception(e, self.provider, "Error en OpenAI")
+        # Sin stream_options el flujo no informa del uso: tokens estimados
+        self._record_usage(prompt, ''.join(chunks), start)
+
+    async def agenerate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        client = self._get_async_client()
+        start = time.perf_counter()
+        chunks = []
+        try:
+            with LLM_LATENCY.time(provider=self.provider, model=self.model):
+                stream = await client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    stream=True,
+                    **kwargs
+                )
+                async for chunk in stream:
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if text:
+                        if not chunks:
+                            LLM_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start, provider=self.provider, model=self.model)
+                        chunks.append(text)
+                        yield text
+        except (asyncio.CancelledError, GeneratorExit):
+            self._record_usage(prompt, ''.join(chunks), start, status='cancelled')
+            raise
+        except Exception as e:
+            LLM_ERRORS.inc(provider=self.provider, model=self.model)
+            self._record_usage(prompt, None, start, status='error')
+            raise LLMError.from_exception(e, self.provider, "Error en OpenAI")
+        self._record_usage(prompt, ''.join(chunks), start)
 
 class GeminiClient(LLMClient):
     """Implementación para Google Gemini"""
+    provider = "gemini"
     
-    def __init__(self, model: str = "gemini-1.5-flash"):
+    def __init__(self, model: str = "gemini-1.5-flash", timeout: float = 30.0, sdk_retries: bool = True):
+        """
+        :param timeout: Plazo por llamada (segundos)
+        :param sdk_retries: Reintentos internos del SDK (False si los gestiona ResilientLLMClient)
+        """
         self.model_name = model
+        self.timeout = timeout
+        self.sdk_retries = sdk_retries
         self.client = self._initialize_client()
     
     def _get_api_key(self) -> str:
@@ -58,12 +236,93 @@ class GeminiClient(LLMClient):
         return key
     
     def _initialize_client(self):
+        import google.generativeai as genai
         genai.configure(api_key=self._get_api_key())
         return genai.GenerativeModel(self.model_name)
     
+    @staticmethod
+    def _usage(response) -> Optional[Tuple[int, int]]:
+        metadata = getattr(response, 'usage_metadata', None)
+        if metadata is None or not getattr(metadata, 'prompt_token_count', None):
+            return None
+        return metadata.prompt_token_count, getattr(metadata, 'candidates_token_count', 0) or 0
+
+    def _request_options(self) -> dict:
+        # retry=None desactiva la política de reintentos por defecto de google-api-core
+        return {'timeout': self.timeout} if self.sdk_retries else {'timeout': self.timeout, 'retry': None}
+
     def generate(self, prompt: str, **kwargs) -> str:
+        kwargs.setdefault('request_options', self._request_options())
+        start = time.perf_counter()
+        try:
+            with LLM_LATENCY.time(provider=self.provider, model=self.model_name):
+                response = self.client.generate_content(prompt, **kwargs)
+            text = response.text
+        except Exception as e:
+            LLM_ERRORS.inc(provider=self.provider, model=self.model_name)
+            self._record_usage(prompt, None, start, status='error')
+            raise LLMError.from_exception(e, self.provider, "Error en Gemini")
+        self._record_usage(prompt, text, start, self._usage(response))
+        return text
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        kwargs.setdefault('request_options', self._request_options())
+        start = time.perf_counter()
+        try:
+            with LLM_LATENCY.time(provider=self.provider, model=self.model_name):
+                response = await self.client.generate_content_async(prompt, **kwargs)
+            text = response.text
+        except asyncio.CancelledError:
+            self._record_usage(prompt, None, start, status='cancelled')
+            raise
+        except Exception as e:
+            LLM_ERRORS.inc(provider=self.provider, model=self.model_name)
+            self._record_usage(prompt, None, start, status='error')
+            raise LLMError.from_exception(e, self.provider, "Error en Gemini")
+        self._record_usage(prompt, text, start, self._usage(response))
+        return text
+
+    def generate_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        kwargs.setdefault('request_options', self._request_options())
+        start = time.perf_counter()
+        chunks, usage = [], None
+        try:
+            with LLM_LATENCY.time(provider=self.provider, model=self.model_name):
+                for chunk in self.client.generate_content(prompt, stream=True, **kwargs):
+                    usage = self._usage(chunk) or usage
+                    if chunk.text:
+                        if not chunks:
+                            LLM_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start, provider=self.provider, model=self.model_name)
+                        chunks.append(chunk.text)
+                        yield chunk.text
+        except GeneratorExit:
+            self._record_usage(prompt, ''.join(chunks), start, status='cancelled')
+            raise
+        except Exception as e:
+            LLM_ERRORS.inc(provider=self.provider, model=self.model_name)
+            self._record_usage(prompt, None, start, status='error')
+            raise LLMError.from_exception(e, self.provider, "Error en Gemini")
+        self._record_usage(prompt, ''.join(chunks), start, usage)
+
+    async def agenerate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        kwargs.setdefault('request_options', self._request_options())
+        start = time.perf_counter()
+        chunks, usage = [], None
         try:
-            response = self.client.generate_content(prompt, **kwargs)
-            return response.text
+            with LLM_LATENCY.time(provider=self.provider, model=self.model_name):
+                response = await self.client.generate_content_async(prompt, stream=True, **kwargs)
+                async for chunk in response:
+                    usage = self._usage(chunk) or usage
+                    if chunk.text:
+                        if not chunks:
+                            LLM_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start, provider=self.provider, model=self.model_name)
+                        chunks.append(chunk.text)
+                        yield chunk.text
+        except (asyncio.CancelledError, GeneratorExit):
+            self._record_usage(prompt, ''.join(chunks), start, status='cancelled')
+            raise
         except Exception as e:
-            raise RuntimeError(f"Error en Gemini: {str(e)}")
\ No newline at end of file
+            LLM_ERRORS.inc(provider=self.provider, model=self.model_name)
+            self._record_usage(prompt, None, start, status='error')
+            raise LLMError.from_exception(e, self.provider, "Error en Gemini")
+        self._record_usage(prompt, ''.join(chunks), start, usage)
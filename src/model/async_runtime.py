@@ -0,0 +1,137 @@
+import asyncio
+import contextvars
+import queue
+import threading
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_runtime_loop() -> asyncio.AbstractEventLoop:
+    """
+    Event loop persistente del proceso, en un hilo daemon (se crea en el primer uso).
+    Las llamadas asíncronas a los LLM se ejecutan aquí: las conexiones HTTP de los
+    clientes async y los semáforos por proveedor viven en un único loop.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-runtime", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def in_runtime_loop() -> bool:
+    try:
+        return asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        return False
+
+
+def _with_caller_context(coro: Coroutine) -> Coroutine:
+    """
+    Ejecuta la corrutina con las variables de contexto del llamante (p. ej. el ámbito de
+    contabilidad de model.llm_usage): run_coroutine_threadsafe usaría las del hilo del loop.
+    """
+    context = contextvars.copy_context()
+
+    async def bound():
+        for var, value in context.items():
+            var.set(value)
+        return await coro
+
+    return bound()
+
+
+def run_sync(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """Ejecuta una corrutina en el loop persistente y bloquea el hilo llamante hasta el resultado"""
+    if in_runtime_loop():
+        coro.close()
+        raise RuntimeError("run_sync no puede llamarse desde el propio loop de ejecución")
+    future = asyncio.run_coroutine_threadsafe(_with_caller_context(coro), get_runtime_loop())
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+
+async def run_in_runtime(coro: Coroutine) -> Any:
+    """Ejecuta la corrutina en el loop persistente desde cualquier otro loop (la cancelación se propaga)"""
+    if in_runtime_loop():
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_with_caller_context(coro), get_runtime_loop()))
+
+
+_DONE = object()
+
+
+def iterate_sync(agen: AsyncIterator) -> Iterator:
+    """
+    Consume un generador asíncrono (ejecutado en el loop persistente) desde código síncrono.
+    Si el consumidor abandona la iteración, el generador se cancela.
+    """
+    items: queue.Queue = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put((item, None))
+        except asyncio.CancelledError as e:
+            items.put((_DONE, e))
+            raise
+        except Exception as e:
+            # Se reenvía al consumidor
+            items.put((_DONE, e))
+        else:
+            items.put((_DONE, None))
+
+    future = asyncio.run_coroutine_threadsafe(_with_caller_context(pump()), get_runtime_loop())
+    try:
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error is not None and not isinstance(error, asyncio.CancelledError):
+                    raise error
+                return
+            yield item
+    finally:
+        future.cancel()
+
+
+async def aiterate_in_runtime(agen: AsyncIterator) -> AsyncIterator:
+    """Itera en el loop persistente un generador asíncrono pedido desde cualquier otro loop"""
+    if in_runtime_loop():
+        async for item in agen:
+            yield item
+        return
+
+    caller = asyncio.get_running_loop()
+    items: asyncio.Queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for item in agen:
+                caller.call_soon_threadsafe(items.put_nowait, (item, None))
+        except asyncio.CancelledError as e:
+            caller.call_soon_threadsafe(items.put_nowait, (_DONE, e))
+            raise
+        except Exception as e:
+            # Se reenvía al consumidor
+            caller.call_soon_threadsafe(items.put_nowait, (_DONE, e))
+        else:
+            caller.call_soon_threadsafe(items.put_nowait, (_DONE, None))
+
+    future = asyncio.run_coroutine_threadsafe(_with_caller_context(pump()), get_runtime_loop())
+    try:
+        while True:
+            item, error = await items.get()
+            if item is _DONE:
+                if error is not None and not isinstance(error, asyncio.CancelledError):
+                    raise error
+                return
+            yield item
+    finally:
+        future.cancel()
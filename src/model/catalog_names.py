@@ -0,0 +1,150 @@
+import csv
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+# Modelo de chip dentro de un nombre comercial: "RTX 3060 Ventus 2X 12G OC" -> rtx3060
+_MODEL_PATTERNS = {
+    'CPU': re.compile(
+        r'\b(?:core\s*)?(?:'
+        r'i[3579]\s*-?\s*\d{4,5}[a-z]{0,2}'
+        r'|ultra\s*[3579]\s*\d{3}[a-z]{0,2}'
+        r'|ryzen\s*(?:threadripper\s*)?[3579]?\s*\d{4}(?:x3d|[a-z]{0,2})'
+        r')\b', re.IGNORECASE),
+    'GPU': re.compile(
+        r'\b(?:rtx|gtx|rx|arc)\s*-?\s*[a-z]?\d{3,4}\s*(?:ti\b|super\b|xtx\b|xt\b|gre\b)?'
+        r'(?:\s*(?:ti|super)\b)?', re.IGNORECASE)
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Aproximación de tokens de un texto (~4 caracteres por token), sin depender del tokenizador"""
+    return max(1, (len(text) + 3) // 4)
+
+
+def _tokens(text: str) -> set:
+    # "RTX4060Ti" -> {rtx, 4060, ti}: separa letras y dígitos para comparar nombres compactos
+    return set(re.findall(r'[a-z]+|\d+', text.lower()))
+
+
+def _trigrams(text: str) -> set:
+    compact = re.sub(r'[^a-z0-9]', '', text.lower())
+    return {compact[i:i + 3] for i in range(len(compact) - 2)}
+
+
+def model_key(text: str) -> str:
+    """Clave compacta de un modelo: minúsculas, sin espacios/guiones ni el prefijo 'core'"""
+    key = re.sub(r'[^a-z0-9]', '', text.lower())
+    return key[4:] if key.startswith('core') else key
+
+
+class CatalogNames:
+    """
+    Nombres de modelo de los catálogos de CPU y GPU, leídos una sola vez por proceso.
+    Resuelve menciones del usuario ("una RTX 3060", "ryzen 7 7700x") al nombre del catálogo
+    y selecciona una lista corta de nombres relevantes para incluir en un prompt.
+    """
+
+    def __init__(self, specs_dir: str = "src/data/component_specs", embedding_model: Any = None):
+        """
+        :param embedding_model: Modelo con encode() (p. ej. SentenceTransformer) para ordenar
+            la lista corta por similitud semántica; sin él se usa solo similitud léxica
+        """
+        self.specs_dir = specs_dir
+        self.embedding_model = embedding_model
+        self._names: Dict[str, List[str]] = {}
+        self._index: Dict[str, Dict[str, str]] = {}
+        self._name_embeddings: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def names(self, kind: str) -> List[str]:
+        """Nombres únicos del catálogo ('CPU' o 'GPU'), en el orden del CSV"""
+        with self._lock:
+            if kind not in self._names:
+                self._load(kind)
+            return self._names[kind]
+
+    def _load(self, kind: str):
+        with open(f"{self.specs_dir}/{kind}_specs.csv", encoding='utf-8') as f:
+            names = list(dict.fromkeys(
+                row['Model_Name'].strip() for row in csv.DictReader(f) if row.get('Model_Name', '').strip()))
+
+        # Índice clave de modelo -> nombre más corto del catálogo con ese chip
+        index = {}
+        for name in names:
+            for match in _MODEL_PATTERNS[kind].finditer(name):
+                key = model_key(match.group())
+                if key not in index or len(name) < len(index[key]):
+                    index[key] = name
+        self._names[kind] = names
+        self._index[kind] = index
+
+    def find_mentions(self, kind: str, text: str) -> List[str]:
+        """Modelos de chip mencionados en el texto, tal como aparecen"""
+        return [m.group().strip() for m in _MODEL_PATTERNS[kind].finditer(text)]
+
+    def resolve(self, kind: str, text: str) -> Optional[str]:
+        """
+        Primer modelo mencionado en el texto, resuelto al nombre del catálogo.
+        Si el chip no está en el catálogo se devuelve la mención normalizada
+        (sigue siendo válida para buscar benchmarks).
+        """
+        self.names(kind)
+        for mention in self.find_mentions(kind, text):
+            key = model_key(mention)
+            if key in self._index[kind]:
+                return self._index[kind][key]
+            return re.sub(r'\s+', ' ', mention).strip()
+        return None
+
+    def shortlist(self, kind: str, text: str, token_budget: int = 150) -> List[str]:
+        """
+        Nombres del catálogo más parecidos al texto del usuario, hasta agotar token_budget
+        (los que no caben se saltan y se sigue con los siguientes).
+        Los modelos mencionados explícitamente van primero; a igualdad de similitud se
+        respeta el orden del CSV (ranking de ventas).
+        """
+        names = self.names(kind)
+        scores = self._lexical_scores(names, text)
+        semantic = self._semantic_scores(kind, names, text)
+        if semantic is not None:
+            scores = [lexical + float(sim) for lexical, sim in zip(scores, semantic)]
+
+        mentioned = {self._index[kind].get(model_key(m)) for m in self.find_mentions(kind, text)}
+        order = sorted(range(len(names)), key=lambda i: (names[i] not in mentioned, -scores[i], i))
+
+        costs = [estimate_tokens(name) + 1 for name in names]  # +1: separador de la lista
+        cheapest = min(costs, default=0)
+        selected, used = [], 0
+        for i in order:
+            if used + costs[i] > token_budget:
+                if token_budget - used < cheapest:
+                    break  # Ya no cabe ningún nombre
+                continue  # Nombre largo: uno más corto y algo menos parecido aún puede caber
+            selected.append(names[i])
+            used += costs[i]
+        return selected
+
+    @staticmethod
+    def _lexical_scores(names: List[str], text: str) -> List[float]:
+        text_tokens, text_trigrams = _tokens(text), _trigrams(text)
+        scores = []
+        for name in names:
+            name_tokens = _tokens(name)
+            overlap = len(name_tokens & text_tokens) / len(name_tokens) if name_tokens else 0.0
+            trigrams = _trigrams(name)
+            trigram_sim = len(trigrams & text_trigrams) / len(trigrams) if trigrams else 0.0
+            scores.append(overlap + 0.5 * trigram_sim)
+        return scores
+
+    def _semantic_scores(self, kind: str, names: List[str], text: str):
+        if self.embedding_model is None or not text.strip():
+            return None
+        import numpy as np
+
+        with self._lock:
+            if kind not in self._name_embeddings:
+                embeddings = np.asarray(self.embedding_model.encode(names), dtype=np.float32)
+                self._name_embeddings[kind] = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        query = np.asarray(self.embedding_model.encode([text])[0], dtype=np.float32)
+        return self._name_embeddings[kind] @ (query / np.linalg.norm(query))
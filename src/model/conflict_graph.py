@@ -0,0 +1,85 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+def to_bitset(indices: Iterable[int], size: int) -> int:
+    """Bitset (int) con los bits de indices activos, construido en O(size) con np.packbits"""
+    bits = np.zeros(size, dtype=bool)
+    bits[list(indices)] = True
+    return int.from_bytes(np.packbits(bits, bitorder='little').tobytes(), 'little')
+
+
+
+class ConflictGraph:
+    """
+    Incompatibilidades entre candidatos como bitsets de adyacencia por par de tipos.
+
+    El bit j de rows[(a, b)][i] indica que el candidato i del tipo a es incompatible con el
+    candidato j del tipo b; se guarda en ambos sentidos. Los índices son posiciones en los
+    dominios del solver (el '_index' de cada componente compacto).
+    """
+
+    def __init__(self, sizes: Dict[str, int]):
+        """
+        :param sizes: {tipo: tamaño del dominio}
+        """
+        self.sizes = dict(sizes)
+        self.rows: Dict[Tuple[str, str], List[int]] = {}
+        self.pairs = 0
+
+    def _rows(self, type_a: str, type_b: str) -> List[int]:
+        rows = self.rows.get((type_a, type_b))
+        if rows is None:
+            rows = self.rows[(type_a, type_b)] = [0] * self.sizes[type_a]
+        return rows
+
+    def add(self, type_a: str, index_a: int, type_b: str, index_b: int):
+        rows_a = self._rows(type_a, type_b)
+        if rows_a[index_a] >> index_b & 1:
+            return
+        rows_a[index_a] |= 1 << index_b
+        self._rows(type_b, type_a)[index_b] |= 1 << index_a
+        self.pairs += 1
+
+    def conflicts(self, type_a: str, index_a: int, type_b: str, index_b: int) -> bool:
+        rows = self.rows.get((type_a, type_b))
+        return rows is not None and bool(rows[index_a] >> index_b & 1)
+
+    def row(self, type_a: str, index_a: int, type_b: str) -> int:
+        """Bitset de los candidatos de type_b incompatibles con el candidato index_a de type_a"""
+        rows = self.rows.get((type_a, type_b))
+        return rows[index_a] if rows is not None else 0
+
+    def support_classes(self, type_a: str, type_b: str) -> Optional[List[Tuple[int, int]]]:
+        """
+        Soportes para AC-3: [(bitset de candidatos de type_b compatibles, bitset de candidatos de
+        type_a con exactamente esos soportes)]. Los candidatos con las mismas incompatibilidades
+        (p. ej. el mismo socket) comparten clase y se comprueban de una vez.
+        None si el par no tiene incompatibilidades y por tanto no restringe los dominios.
+        """
+        rows = self.rows.get((type_a, type_b))
+        if rows is None:
+            return None
+        full = (1 << self.sizes[type_b]) - 1
+        classes: Dict[int, List[int]] = {}
+        for index, row in enumerate(rows):
+            classes.setdefault(row, []).append(index)
+        return [(full & ~row, to_bitset(members, len(rows))) for row, members in classes.items()]
+
+    def matrix(self, type_a: str, indices_a: List[int], type_b: str, indices_b: List[int]) -> Optional[np.ndarray]:
+        """
+        Matriz booleana (len(indices_a), len(indices_b)) de incompatibilidades entre esos candidatos
+        de type_a y type_b (desempaquetando los bitsets); None si el par no tiene incompatibilidades
+        """
+        rows = self.rows.get((type_a, type_b))
+        if rows is None:
+            return None
+        n_bytes = (self.sizes[type_b] + 7) // 8
+        packed = np.frombuffer(b''.join(rows[i].to_bytes(n_bytes, 'little') for i in indices_a), dtype=np.uint8)
+        bits = np.unpackbits(packed.reshape(len(indices_a), n_bytes), axis=1, count=self.sizes[type_b],
+                             bitorder='little').astype(bool)
+        return bits[:, indices_b]
+
+    def __len__(self) -> int:
+        return self.pairs
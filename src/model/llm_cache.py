@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from model.LLMClient import LLMClient
+from model.llm_hedging import is_valid_response
+from model.metrics import LLM_CACHE_LOOKUPS, LLM_CACHE_HIT_RATIO, LLM_CACHE_EVICTIONS
+
+
+class CachedLLMClient(LLMClient):
+    """
+    Envoltorio con caché para cualquier LLMClient.
+
+    Clave: proveedor + modelo + hash del prompt + kwargs. Una LRU en memoria evita
+    tocar disco en los aciertos frecuentes; detrás, SQLite conserva las respuestas
+    entre reinicios. Las entradas caducan tras ttl segundos y, si el disco supera
+    max_disk_entries, se expulsan las menos usadas recientemente. Solo se guardan las
+    respuestas que acepta validator (p. ej. JSON parseable si el prompt lo pide).
+    """
+
+    def __init__(self, client: LLMClient, db_path: str = "src/data/cache/llm_cache.sqlite",
+                 ttl: float = 7 * 24 * 3600, max_memory_entries: int = 256,
+                 max_disk_entries: int = 10000,
+                 validator: Callable[[str, str], bool] = is_valid_response):
+        self.client = client
+        self.validator = validator
+        self.provider = getattr(client, 'provider', type(client).__name__)
+        self.model = getattr(client, 'model', None) or getattr(client, 'model_name', '')
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._memory: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {'memory': 0, 'disk': 0}
+        self.misses = 0
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+        self._db.commit()
+
+    def __getattr__(self, name):
+        # Atributos propios del cliente envuelto (p. ej. model_name)
+        if name == 'client':
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def cache_key(self, prompt: str, **kwargs) -> str:
+        params = json.dumps(kwargs, sort_keys=True, default=repr)
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        return hashlib.sha256(f"{self.provider}|{self.model}|{prompt_hash}|{params}".encode('utf-8')).hexdigest()
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        key = self.cache_key(prompt, **kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        # Las llamadas al proveedor quedan fuera del lock para no serializarlas
+        response = self.client.generate(prompt, **kwargs)
+        self._store(key, prompt, response)
+        return response
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        key = self.cache_key(prompt, **kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        response = await self.client.agenerate(prompt, **kwargs)
+        self._store(key, prompt, response)
+        return response
+
+    def generate_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Un acierto se emite de una vez; en un fallo se retransmite el flujo y se guarda al completarse"""
+        key = self.cache_key(prompt, **kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        for chunk in self.client.generate_stream(prompt, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        # Solo llega aquí si el flujo terminó: las respuestas interrumpidas no se guardan
+        self._store(key, prompt, ''.join(chunks))
+
+    def _lookup(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._memory[key] = (entry[0], entry[1], now)
+                self._memory.move_to_end(key)
+                return self._record('memory', entry[0])
+            self._memory.pop(key, None)
+
+            row = self._db.execute("SELECT response, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                if now - row[1] < self.ttl:
+                    self._db.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, row[0], row[1], now)
+                    return self._record('disk', row[0])
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._db.commit()
+                LLM_CACHE_EVICTIONS.inc(reason='ttl')
+
+            return self._record('miss', None)
+
+    def _store(self, key: str, prompt: str, response: str):
+        if not isinstance(response, str) or not self.validator(prompt, response):
+            return  # Una respuesta inválida no debe servirse durante todo el TTL
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now, now)
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now))
+            self._evict_disk()
+            self._db.commit()
+
+    def _remember(self, key: str, response: str, created: float, last_access: float):
+        self._memory[key] = (response, created, last_access)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            # Los aciertos en memoria no tocan disco: se vuelca el último acceso al salir de la LRU
+            old_key, (_, _, old_access) = self._memory.popitem(last=False)
+            self._db.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (old_access, old_key))
+
+    def _evict_disk(self):
+        expired = self._db.execute("DELETE FROM llm_cache WHERE created <= ?", (time.time() - self.ttl,)).rowcount
+        if expired:
+            LLM_CACHE_EVICTIONS.inc(expired, reason='ttl')
+        excess = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_disk_entries
+        if excess > 0:
+            self._db.executemany("UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                                 [(entry[2], key) for key, entry in self._memory.items()])
+            self._db.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+                (excess,))
+            LLM_CACHE_EVICTIONS.inc(excess, reason='size')
+
+    def _record(self, result: str, response: Optional[str]) -> Optional[str]:
+        if result == 'miss':
+            self.misses += 1
+        else:
+            self.hits[result] += 1
+        LLM_CACHE_LOOKUPS.inc(provider=self.provider, model=self.model, result=result)
+        LLM_CACHE_HIT_RATIO.set(self.hit_rate(), provider=self.provider, model=self.model)
+        return response
+
+    def hit_rate(self) -> float:
+        total = sum(self.hits.values()) + self.misses
+        return sum(self.hits.values()) / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'memory_hits': self.hits['memory'],
+                'disk_hits': self.hits['disk'],
+                'misses': self.misses,
+                'hit_rate': self.hit_rate(),
+                'memory_entries': len(self._memory),
+                'disk_entries': self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM llm_cache")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def with_cache(client: LLMClient) -> LLMClient:
+    """
+    Aplica la caché según el entorno: LLM_CACHE=0 la desactiva,
+    LLM_CACHE_PATH y LLM_CACHE_TTL configuran la ubicación y la caducidad (segundos).
+    """
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return client
+    return CachedLLMClient(
+        client,
+        db_path=os.getenv("LLM_CACHE_PATH", "src/data/cache/llm_cache.sqlite"),
+        ttl=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+    )
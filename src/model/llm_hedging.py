@@ -0,0 +1,227 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional
+
+from model.LLMClient import LLMClient, LLMError
+from model.async_runtime import run_sync, run_in_runtime, iterate_sync, aiterate_in_runtime
+from model.metrics import LLM_HEDGES
+
+
+class LatencyTracker:
+    """Ventana deslizante de latencias de llamadas exitosas por proveedor"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, provider: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(provider, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def count(self, provider: str) -> int:
+        with self._lock:
+            return len(self._samples.get(provider, ()))
+
+
+# Compartido por todos los clientes del proceso: las sesiones alimentan las mismas estadísticas
+LATENCY_TRACKER = LatencyTracker()
+
+
+def expects_json(prompt: str) -> bool:
+    return re.search(r'\bJSON\b', prompt) is not None
+
+
+def is_valid_response(prompt: str, response: str) -> bool:
+    """
+    Respuesta aceptable: texto no vacío y, si el prompt pide JSON, con un objeto JSON parseable
+    (directo o embebido, igual que BDIAgent._safe_parse_json).
+    """
+    if not isinstance(response, str) or not response.strip():
+        return False
+    if not expects_json(prompt):
+        return True
+    try:
+        json.loads(response)
+        return True
+    except json.JSONDecodeError:
+        match = re.search(r'\{.*\}', response, re.DOTALL)
+        if not match:
+            return False
+        try:
+            json.loads(match.group())
+            return True
+        except json.JSONDecodeError:
+            return False
+
+
+class HedgedLLMClient(LLMClient):
+    """
+    LLMClient compuesto que recorta la latencia de cola con peticiones de cobertura (hedging).
+
+    La petición va al proveedor primario; si no hay respuesta válida tras el percentil
+    `percentile` de su latencia reciente (acotado a [min_delay, max_delay]), se lanza la misma
+    petición al secundario. Gana la primera respuesta válida y la otra se cancela. Si el
+    primario falla o responde algo inválido antes del plazo, el secundario se lanza de inmediato.
+    """
+
+    def __init__(self, primary: LLMClient, secondary: LLMClient, percentile: float = 0.95,
+                 min_delay: float = 0.5, max_delay: float = 10.0, default_delay: float = 3.0,
+                 min_samples: int = 20, tracker: LatencyTracker = LATENCY_TRACKER,
+                 validator: Callable[[str, str], bool] = is_valid_response):
+        self.primary = primary
+        self.secondary = secondary
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.tracker = tracker
+        self.validator = validator
+        self.provider = f"{self._name(primary)}+{self._name(secondary)}"
+        self.model = f"{self._model(primary)}+{self._model(secondary)}"
+
+    @staticmethod
+    def _name(client: LLMClient) -> str:
+        return getattr(client, 'provider', type(client).__name__)
+
+    @staticmethod
+    def _model(client: LLMClient) -> str:
+        return getattr(client, 'model', None) or getattr(client, 'model_name', '')
+
+    def hedge_delay(self) -> float:
+        """Espera antes de la cobertura: percentil de latencia del primario, o el valor por defecto"""
+        name = self._name(self.primary)
+        if self.tracker.count(name) < self.min_samples:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, self.tracker.percentile(name, self.percentile)))
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        return run_sync(self._hedged(prompt, **kwargs))
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        return await run_in_runtime(self._hedged(prompt, **kwargs))
+
+    def generate_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        return iterate_sync(self._hedged_stream(prompt, **kwargs))
+
+    async def agenerate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        async for chunk in aiterate_in_runtime(self._hedged_stream(prompt, **kwargs)):
+            yield chunk
+
+    async def _call(self, client: LLMClient, prompt: str, **kwargs) -> str:
+        start = time.monotonic()
+        try:
+            response = await client.agenerate(prompt, **kwargs)
+        except asyncio.CancelledError:
+            # Cota inferior de su latencia: sin ella las estadísticas solo verían las respuestas rápidas
+            self.tracker.record(self._name(client), time.monotonic() - start)
+            raise
+        if self.validator(prompt, response):
+            self.tracker.record(self._name(client), time.monotonic() - start)
+            return response
+        raise LLMError(f"Respuesta inválida de {self._name(client)}", self._name(client), retryable=True)
+
+    async def _hedged(self, prompt: str, **kwargs) -> str:
+        tasks = {asyncio.ensure_future(self._call(self.primary, prompt, **kwargs)): 'primary'}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+            if done:
+                task = next(iter(done))
+                tasks.pop(task)
+                if task.exception() is None:
+                    LLM_HEDGES.inc(outcome='not_needed')
+                    return task.result()
+                print(f"[HedgedLLMClient] Primario falló ({task.exception()}); usando el secundario")
+
+            tasks[asyncio.ensure_future(self._call(self.secondary, prompt, **kwargs))] = 'secondary'
+            last_error = None
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    role = tasks.pop(task)
+                    if task.exception() is None:
+                        LLM_HEDGES.inc(outcome=f'{role}_won')
+                        return task.result()
+                    last_error = task.exception()
+            LLM_HEDGES.inc(outcome='failed')
+            raise last_error
+        finally:
+            # Cancelar la petición perdedora (o todas, si el llamante abandonó la espera)
+            for task in tasks:
+                task.cancel()
+
+    async def _first_chunk(self, client: LLMClient, stream: AsyncIterator[str]) -> str:
+        start = time.monotonic()
+        try:
+            chunk = await stream.__anext__()
+        except asyncio.CancelledError:
+            self.tracker.record(self._name(client), time.monotonic() - start)
+            raise
+        except StopAsyncIteration:
+            raise LLMError(f"Respuesta vacía de {self._name(client)}", self._name(client), retryable=True)
+        self.tracker.record(self._name(client), time.monotonic() - start)
+        return chunk
+
+    async def _hedged_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """
+        Cobertura en streaming: compite el tiempo hasta el primer fragmento. El flujo que lo
+        emite primero se sigue hasta el final y el otro se cancela. En streaming no se valida
+        el contenido (el JSON solo es comprobable con la respuesta completa).
+        """
+        streams = {'primary': self.primary.agenerate_stream(prompt, **kwargs)}
+        tasks = {asyncio.ensure_future(self._first_chunk(self.primary, streams['primary'])): 'primary'}
+        winner, first = None, None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+            if done:
+                task = next(iter(done))
+                tasks.pop(task)
+                if task.exception() is None:
+                    LLM_HEDGES.inc(outcome='not_needed')
+                    winner, first = 'primary', task.result()
+                else:
+                    print(f"[HedgedLLMClient] Primario falló ({task.exception()}); usando el secundario")
+
+            if winner is None:
+                streams['secondary'] = self.secondary.agenerate_stream(prompt, **kwargs)
+                tasks[asyncio.ensure_future(self._first_chunk(self.secondary, streams['secondary']))] = 'secondary'
+                last_error = None
+                while tasks and winner is None:
+                    done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        role = tasks.pop(task)
+                        if winner is None and task.exception() is None:
+                            LLM_HEDGES.inc(outcome=f'{role}_won')
+                            winner, first = role, task.result()
+                        elif task.exception() is not None:
+                            last_error = task.exception()
+                if winner is None:
+                    LLM_HEDGES.inc(outcome='failed')
+                    raise last_error
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            for role, stream in streams.items():
+                if role != winner:
+                    await stream.aclose()
+
+        try:
+            yield first
+            async for chunk in streams[winner]:
+                yield chunk
+        finally:
+            await streams[winner].aclose()
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from model.LLMClient import LLMClient, LLMError
+from model.async_runtime import run_sync, run_in_runtime, iterate_sync, aiterate_in_runtime
+from model.metrics import LLM_RETRIES, LLM_INFLIGHT, LLM_THROTTLE_SECONDS
+
+
+class TokenBucket:
+    """
+    Limitador de tasa por cubeta de fichas: rate fichas por segundo, hasta burst acumuladas.
+    try_acquire() no bloquea: devuelve 0 si tomó una ficha o los segundos a esperar.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    async def acquire(self, deadline: float):
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise LLMError("Límite de tasa local: sin cupo dentro del plazo", retryable=True)
+            await asyncio.sleep(wait)
+
+
+class ProviderLimits:
+    """Concurrencia máxima y tasa de un proveedor, compartidas por todos sus clientes del proceso"""
+
+    def __init__(self, max_concurrency: int, rate: float, burst: int):
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Se crea dentro del loop persistente, que es donde se usa siempre
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+
+_limits: Dict[str, ProviderLimits] = {}
+_limits_lock = threading.Lock()
+
+
+def get_provider_limits(provider: str) -> ProviderLimits:
+    """
+    Límites del proveedor, configurables por entorno (LLM_MAX_CONCURRENCY, LLM_RATE_LIMIT en
+    peticiones/s, LLM_BURST) y con variantes por proveedor, p. ej. OPENAI_RATE_LIMIT.
+    """
+    def setting(name: str, default: str) -> str:
+        return os.getenv(f"{provider.upper()}_{name}", os.getenv(f"LLM_{name}", default))
+
+    with _limits_lock:
+        if provider not in _limits:
+            _limits[provider] = ProviderLimits(
+                max_concurrency=int(setting("MAX_CONCURRENCY", "4")),
+                rate=float(setting("RATE_LIMIT", "2")),
+                burst=int(setting("BURST", "5"))
+            )
+        return _limits[provider]
+
+
+class ResilientLLMClient(LLMClient):
+    """
+    Envoltorio de un LLMClient con límites por proveedor y reintentos.
+
+    - Semáforo de concurrencia y cubeta de fichas compartidos por proveedor: muchas sesiones
+      simultáneas no superan la cuota ni acumulan hilos bloqueados en el SDK.
+    - Plazo por llamada (timeout) aplicado con asyncio.wait_for.
+    - Reintentos con backoff exponencial y jitter completo ante 429/5xx, timeouts y errores de red.
+
+    Las llamadas se ejecutan en el loop persistente de model.async_runtime; generate() es la
+    versión bloqueante para los agentes síncronos.
+    """
+
+    def __init__(self, client: LLMClient, timeout: float = 30.0, max_retries: int = 3,
+                 base_delay: float = 0.5, max_delay: float = 8.0, limits: Optional[ProviderLimits] = None):
+        self.client = client
+        self.provider = getattr(client, 'provider', type(client).__name__)
+        self.model = getattr(client, 'model', None) or getattr(client, 'model_name', '')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limits = limits or get_provider_limits(self.provider)
+
+    def __getattr__(self, name):
+        if name == 'client':
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        return run_sync(self._generate_with_retries(prompt, **kwargs))
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        return await run_in_runtime(self._generate_with_retries(prompt, **kwargs))
+
+    def generate_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        return iterate_sync(self._stream_with_retries(prompt, **kwargs))
+
+    async def agenerate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        async for chunk in aiterate_in_runtime(self._stream_with_retries(prompt, **kwargs)):
+            yield chunk
+
+    def backoff(self, attempt: int) -> float:
+        """Backoff exponencial con jitter completo: uniforme en [0, min(max_delay, base * 2^attempt)]"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def _generate_with_retries(self, prompt: str, **kwargs) -> str:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._attempt(prompt, **kwargs)
+            except LLMError as e:
+                if not e.retryable or attempt == self.max_retries:
+                    raise
+                reason = str(e.status_code) if e.status_code else 'transient'
+                LLM_RETRIES.inc(provider=self.provider, reason=reason)
+                delay = self.backoff(attempt)
+                print(f"[LLMClient] {self.provider}: error reintentable ({reason}); reintento {attempt + 1} en {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, prompt: str, **kwargs) -> str:
+        deadline = time.monotonic() + self.timeout
+        waited = time.monotonic()
+        await self.limits.bucket.acquire(deadline)
+        async with self.limits.semaphore:
+            LLM_THROTTLE_SECONDS.observe(time.monotonic() - waited, provider=self.provider)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMError(f"Error en {self.provider}: plazo agotado esperando cupo", self.provider, retryable=True)
+            LLM_INFLIGHT.inc(provider=self.provider)
+            try:
+                return await asyncio.wait_for(self.client.agenerate(prompt, **kwargs), remaining)
+            except asyncio.TimeoutError:
+                raise LLMError(f"Error en {self.provider}: sin respuesta en {self.timeout:g}s",
+                               self.provider, status_code=408, retryable=True)
+            except LLMError:
+                raise
+            except Exception as e:
+                raise LLMError.from_exception(e, self.provider, f"Error en {self.provider}")
+            finally:
+                LLM_INFLIGHT.inc(-1, provider=self.provider)
+
+    async def _stream_with_retries(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """
+        Reintenta solo mientras no se haya emitido ningún fragmento: una vez empezada la
+        respuesta, repetirla duplicaría texto ya mostrado, así que el error se propaga.
+        """
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                async for chunk in self._stream_attempt(prompt, **kwargs):
+                    started = True
+                    yield chunk
+                return
+            except LLMError as e:
+                if started or not e.retryable or attempt == self.max_retries:
+                    raise
+                reason = str(e.status_code) if e.status_code else 'transient'
+                LLM_RETRIES.inc(provider=self.provider, reason=reason)
+                delay = self.backoff(attempt)
+                print(f"[LLMClient] {self.provider}: error reintentable ({reason}); reintento {attempt + 1} en {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _stream_attempt(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        # El plazo cubre hasta el primer fragmento; después, timeout entre fragmentos consecutivos
+        deadline = time.monotonic() + self.timeout
+        waited = time.monotonic()
+        await self.limits.bucket.acquire(deadline)
+        async with self.limits.semaphore:
+            LLM_THROTTLE_SECONDS.observe(time.monotonic() - waited, provider=self.provider)
+            LLM_INFLIGHT.inc(provider=self.provider)
+            stream = self.client.agenerate_stream(prompt, **kwargs)
+            try:
+                remaining = deadline - time.monotonic()
+                while True:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), remaining)
+                    except StopAsyncIteration:
+                        return
+                    yield chunk
+                    remaining = self.timeout
+            except asyncio.TimeoutError:
+                raise LLMError(f"Error en {self.provider}: sin respuesta en {self.timeout:g}s",
+                               self.provider, status_code=408, retryable=True)
+            except LLMError:
+                raise
+            except Exception as e:
+                raise LLMError.from_exception(e, self.provider, f"Error en {self.provider}")
+            finally:
+                await stream.aclose()
+                LLM_INFLIGHT.inc(-1, provider=self.provider)
+
+
+def with_resilience(client: LLMClient) -> LLMClient:
+    """Aplica límites y reintentos según el entorno (LLM_TIMEOUT, LLM_MAX_RETRIES)"""
+    return ResilientLLMClient(
+        client,
+        timeout=float(os.getenv("LLM_TIMEOUT", "30")),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "3"))
+    )
@@ -0,0 +1,139 @@
+import contextvars
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from model.catalog_names import estimate_tokens
+from model.metrics import LLM_CALLS, LLM_TOKENS, LLM_PROMPT_TOKENS, LLM_COST, LLM_REQUEST_TOKENS, LLM_REQUEST_COST
+
+# USD por 1K tokens (entrada, salida), precios públicos aproximados; LLM_PRICES='{"modelo": [in, out]}' los sustituye
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+    'gpt-4': (0.03, 0.06),
+    'gpt-4-turbo': (0.01, 0.03),
+    'gemini-1.5-flash': (0.000075, 0.0003),
+    'gemini-1.5-pro': (0.00125, 0.005),
+    'gemini-pro': (0.0005, 0.0015),
+}
+
+
+def _load_prices() -> Dict[str, Tuple[float, float]]:
+    prices = dict(DEFAULT_PRICES)
+    if os.getenv("LLM_PRICES"):
+        prices.update({model: tuple(p) for model, p in json.loads(os.getenv("LLM_PRICES")).items()})
+    return prices
+
+
+PRICES = _load_prices()
+
+
+def call_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Coste estimado en USD; 0 para modelos sin precio conocido"""
+    price_in, price_out = PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1000
+
+
+@dataclass
+class LLMCall:
+    provider: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    seconds: float
+    cost: float
+    status: str = 'ok'          # ok, error, cancelled
+    estimated: bool = False     # tokens estimados (el proveedor no los informó)
+
+
+class LLMUsage:
+    """Llamadas al LLM de una petición (o de cualquier ámbito abierto con usage_scope)"""
+
+    def __init__(self):
+        self.calls: List[LLMCall] = []
+        self._lock = threading.Lock()
+
+    def add(self, call: LLMCall):
+        with self._lock:
+            self.calls.append(call)
+
+    def summary(self) -> Dict[str, object]:
+        """Totales del ámbito y desglose por proveedor"""
+        with self._lock:
+            calls = list(self.calls)
+        by_provider: Dict[str, Dict[str, float]] = {}
+        for call in calls:
+            totals = by_provider.setdefault(call.provider, {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                                                            'seconds': 0.0, 'cost': 0.0})
+            totals['calls'] += 1
+            totals['prompt_tokens'] += call.prompt_tokens
+            totals['completion_tokens'] += call.completion_tokens
+            totals['seconds'] += call.seconds
+            totals['cost'] += call.cost
+        return {
+            'calls': len(calls),
+            'errors': sum(1 for c in calls if c.status == 'error'),
+            'cancelled': sum(1 for c in calls if c.status == 'cancelled'),
+            'prompt_tokens': sum(c.prompt_tokens for c in calls),
+            'completion_tokens': sum(c.completion_tokens for c in calls),
+            'max_prompt_tokens': max((c.prompt_tokens for c in calls), default=0),
+            'seconds': sum(c.seconds for c in calls),
+            'cost': sum(c.cost for c in calls),
+            'by_provider': by_provider
+        }
+
+    def format(self) -> str:
+        s = self.summary()
+        return (f"{s['calls']} llamadas LLM ({s['errors']} fallidas, {s['cancelled']} canceladas), "
+                f"{s['prompt_tokens']}+{s['completion_tokens']} tokens "
+                f"(prompt máx. {s['max_prompt_tokens']}), {s['seconds']:.2f}s, ${s['cost']:.4f}")
+
+
+# Ámbito activo: el blackboard lo asocia a cada petición y model.async_runtime lo propaga al loop
+_current_usage: contextvars.ContextVar[Optional[LLMUsage]] = contextvars.ContextVar('llm_usage', default=None)
+
+
+@contextmanager
+def usage_scope(usage: Optional[LLMUsage] = None):
+    """Registra en `usage` las llamadas al LLM hechas dentro del bloque (también desde el loop persistente)"""
+    usage = usage if usage is not None else LLMUsage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def record_llm_call(provider: str, model: str, prompt: str, completion: Optional[str], seconds: float,
+                    usage: Optional[Tuple[int, int]] = None, status: str = 'ok') -> LLMCall:
+    """
+    Contabiliza una llamada a un proveedor: métricas por proveedor/modelo y ámbito activo.
+    usage: (tokens de prompt, tokens de respuesta) informados por el proveedor; si faltan se estiman.
+    Las llamadas fallidas o canceladas no suman coste.
+    """
+    estimated = usage is None
+    prompt_tokens, completion_tokens = usage if usage is not None else (
+        estimate_tokens(prompt), estimate_tokens(completion) if completion else 0)
+    cost = call_cost(model, prompt_tokens, completion_tokens) if status == 'ok' else 0.0
+    call = LLMCall(provider, model, prompt_tokens, completion_tokens, seconds, cost, status, estimated)
+
+    LLM_CALLS.inc(provider=provider, model=model, status=status)
+    LLM_TOKENS.inc(prompt_tokens, provider=provider, model=model, kind='prompt')
+    LLM_TOKENS.inc(completion_tokens, provider=provider, model=model, kind='completion')
+    LLM_PROMPT_TOKENS.observe(prompt_tokens, provider=provider, model=model)
+    LLM_COST.inc(cost, provider=provider, model=model)
+
+    scope = _current_usage.get()
+    if scope is not None:
+        scope.add(call)
+    return call
+
+
+def record_request_usage(request_id: int, usage: LLMUsage):
+    """Cierra el consumo de una petición: histogramas por petición y resumen en el log"""
+    summary = usage.summary()
+    LLM_REQUEST_TOKENS.observe(summary['prompt_tokens'] + summary['completion_tokens'])
+    LLM_REQUEST_COST.observe(summary['cost'])
+    print(f"[LLMUsage] Petición {request_id}: {usage.format()}")
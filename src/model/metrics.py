@@ -0,0 +1,308 @@
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Buckets por defecto pensados para latencias (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[str, str] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base común: nombre, ayuda y series indexadas por valores de etiquetas"""
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Etiquetas inválidas para {self.name}: {sorted(labels)} (esperadas {list(self.label_names)})")
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            for key, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = float(value)
+
+
+class Histogram(_Metric):
+    """Histograma acumulativo compatible con histogram_quantile() de Prometheus"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mide la duración del bloque en segundos"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Estimación local de un cuantil por interpolación lineal dentro del bucket"""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if not series or not series['count']:
+                return None
+            target = q * series['count']
+            cumulative = 0
+            lower = 0.0
+            for bound, count in zip(self.buckets, series['counts']):
+                if cumulative + count >= target:
+                    if bound == float('inf'):
+                        return lower
+                    fraction = (target - cumulative) / count if count else 0.0
+                    return lower + (bound - lower) * fraction
+                cumulative += count
+                lower = bound
+            return lower
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    labels = _format_labels(self.label_names, key, ('le', _format_value(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro de métricas del proceso; get-or-create por nombre"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, *args, **kwargs)
+                self._metrics[name] = metric
+            elif type(metric) is not cls:
+                raise ValueError(f"La métrica {name} ya está registrada como {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, label_names)
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, label_names)
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def render(self) -> str:
+        """Exporta todas las métricas en formato de texto de Prometheus (v0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in sorted(metrics, key=lambda m: m.name):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# --- Métricas del pipeline ---
+AGENT_LATENCY = REGISTRY.histogram(
+    'agent_stage_seconds', 'Latencia de cada etapa de los agentes', ['agent', 'stage'])
+CANDIDATES_PROPOSED = REGISTRY.histogram(
+    'agent_candidates', 'Candidatos propuestos por tipo de componente', ['component_type'], buckets=COUNT_BUCKETS)
+AGENT_ERRORS = REGISTRY.counter(
+    'agent_errors_total', 'Excepciones capturadas en los agentes', ['agent', 'stage'])
+COMPATIBILITY_PAIRS = REGISTRY.counter(
+    'compatibility_pair_evaluations_total', 'Evaluaciones de reglas sobre pares de componentes', ['type_a', 'type_b'])
+COMPATIBILITY_ISSUES = REGISTRY.counter(
+    'compatibility_issues_total', 'Incompatibilidades detectadas', ['severity'])
+COMPATIBILITY_CHUNK_SECONDS = REGISTRY.histogram(
+    'compatibility_chunk_seconds', 'Duración de cada bloque de evaluación de reglas en el pool', ['type_a', 'type_b'])
+COMPATIBILITY_MATRIX_LOOKUPS = REGISTRY.counter(
+    'compatibility_matrix_lookups_total',
+    'Pares de tipos resueltos con la matriz precalculada (hit) o evaluando reglas (fallback)',
+    ['result'])
+COMPATIBILITY_PAIR_CACHE = REGISTRY.counter(
+    'compatibility_pair_cache_total',
+    'Pares de tipos reutilizados de la caché por par (hit) o evaluados de nuevo (miss)', ['result'])
+COMPATIBILITY_RULE_CALLS = REGISTRY.counter(
+    'compatibility_rule_calls_total', 'Evaluaciones vectorizadas de cada regla de compatibilidad', ['rule'])
+COMPATIBILITY_RULE_PAIRS = REGISTRY.counter(
+    'compatibility_rule_pairs_total', 'Pares de componentes evaluados por cada regla, por resultado', ['rule', 'result'])
+COMPATIBILITY_RULE_SECONDS = REGISTRY.counter(
+    'compatibility_rule_seconds_total', 'Tiempo acumulado de evaluación de cada regla', ['rule'])
+OPTIMIZER_LATENCY = REGISTRY.histogram(
+    'optimizer_stage_seconds', 'Latencia de las fases del optimizador', ['stage'])
+OPTIMIZER_GENERATIONS = REGISTRY.histogram(
+    'optimizer_generations', 'Generaciones ejecutadas por corrida del algoritmo genético', buckets=COUNT_BUCKETS)
+OPTIMIZER_FITNESS_LOOKUPS = REGISTRY.counter(
+    'optimizer_fitness_lookups_total', 'Aptitudes del genético reutilizadas (hit) o calculadas (miss)', ['result'])
+OPTIMIZER_FITNESS_HIT_RATE = REGISTRY.histogram(
+    'optimizer_fitness_hit_rate', 'Fracción de aptitudes reutilizadas por corrida del genético',
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0))
+OPTIMIZER_DUPLICATE_CHILDREN = REGISTRY.counter(
+    'optimizer_duplicate_children_total', 'Hijos repetidos del genético vueltos a mutar en lugar de evaluarse')
+LLM_LATENCY = REGISTRY.histogram(
+    'llm_request_seconds', 'Latencia de las llamadas al LLM', ['provider', 'model'])
+LLM_ERRORS = REGISTRY.counter(
+    'llm_errors_total', 'Errores en llamadas al LLM', ['provider', 'model'])
+LLM_TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    'llm_time_to_first_token_seconds', 'Tiempo hasta el primer fragmento en respuestas en streaming', ['provider', 'model'])
+LLM_CALLS = REGISTRY.counter(
+    'llm_calls_total', 'Llamadas a proveedores LLM por resultado (ok, error, cancelled)', ['provider', 'model', 'status'])
+LLM_TOKENS = REGISTRY.counter(
+    'llm_tokens_total', 'Tokens consumidos (prompt, completion); estimados si el proveedor no los informa',
+    ['provider', 'model', 'kind'])
+LLM_PROMPT_TOKENS = REGISTRY.histogram(
+    'llm_prompt_tokens', 'Tamaño del prompt por llamada (tokens)', ['provider', 'model'], buckets=TOKEN_BUCKETS)
+LLM_COST = REGISTRY.counter(
+    'llm_cost_usd_total', 'Coste estimado de las llamadas al LLM (USD)', ['provider', 'model'])
+LLM_REQUEST_TOKENS = REGISTRY.histogram(
+    'request_llm_tokens', 'Tokens (prompt + respuesta) consumidos por petición del usuario', buckets=TOKEN_BUCKETS)
+LLM_REQUEST_COST = REGISTRY.histogram(
+    'request_llm_cost_usd', 'Coste estimado del LLM por petición del usuario (USD)',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0))
+LLM_RETRIES = REGISTRY.counter(
+    'llm_retries_total', 'Reintentos de llamadas al LLM por motivo (código HTTP o transient)', ['provider', 'reason'])
+LLM_INFLIGHT = REGISTRY.gauge(
+    'llm_inflight_requests', 'Llamadas al LLM en curso', ['provider'])
+LLM_THROTTLE_SECONDS = REGISTRY.histogram(
+    'llm_throttle_seconds', 'Espera por límite de tasa y concurrencia antes de llamar al LLM', ['provider'])
+LLM_HEDGES = REGISTRY.counter(
+    'llm_hedged_requests_total', 'Resultado de las peticiones con cobertura entre proveedores', ['outcome'])
+REQUIREMENTS_EXTRACTIONS = REGISTRY.counter(
+    'requirements_extractions_total', 'Extracciones de requisitos por vía (rules, cache, llm)', ['path'])
+LLM_CACHE_LOOKUPS = REGISTRY.counter(
+    'llm_cache_lookups_total', 'Consultas a la caché de respuestas del LLM (memory, disk, miss)',
+    ['provider', 'model', 'result'])
+LLM_CACHE_HIT_RATIO = REGISTRY.gauge(
+    'llm_cache_hit_ratio', 'Proporción de aciertos de la caché de respuestas del LLM', ['provider', 'model'])
+LLM_CACHE_EVICTIONS = REGISTRY.counter(
+    'llm_cache_evictions_total', 'Entradas expulsadas de la caché del LLM en disco', ['reason'])
+SEMANTIC_CACHE_LOOKUPS = REGISTRY.counter(
+    'semantic_cache_lookups_total', 'Consultas a la caché semántica de requisitos (hit, miss, number_mismatch)',
+    ['result'])
+SEMANTIC_CACHE_HIT_RATIO = REGISTRY.gauge(
+    'semantic_cache_hit_ratio', 'Proporción de aciertos de la caché semántica de requisitos')
+SEMANTIC_CACHE_EVICTIONS = REGISTRY.counter(
+    'semantic_cache_evictions_total', 'Entradas expulsadas de la caché semántica de requisitos', ['reason'])
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = 9108, host: str = '127.0.0.1',
+                         registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Levanta (una sola vez por proceso) un endpoint HTTP local que expone /metrics.
+    Llamadas posteriores devuelven el servidor ya iniciado.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+            _server = ThreadingHTTPServer((host, port), handler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            print(f"[Metrics] Endpoint Prometheus en http://{host}:{port}/metrics")
+        return _server
@@ -0,0 +1,327 @@
+"""
+Proveedores LLM simulados para pruebas de carga sin red ni coste.
+
+- MockLLMServer: servidor HTTP local compatible con la API chat-completions de OpenAI
+  (/v1/chat/completions, con y sin stream). OpenAIClient lo usa con base_url.
+- FakeGeminiClient: GeminiClient con el SDK sustituido por un modelo simulado en proceso.
+
+Ambos comparten MockLLMConfig: distribución de latencia, tasa de errores HTTP y de
+peticiones colgadas, y semilla. Las respuestas de extracción (prompts que piden JSON) se
+generan con RuleBasedExtractor a partir del texto del usuario; el resto son textos fijos.
+"""
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from model.LLMClient import GeminiClient
+from model.catalog_names import estimate_tokens
+
+CANNED_RESPONSE = (
+    "Basado en tus requisitos, estas son las configuraciones recomendadas. "
+    "Cada build equilibra rendimiento y precio dentro de tu presupuesto, con componentes "
+    "compatibles entre sí y margen en la fuente de alimentación para futuras ampliaciones."
+)
+
+
+@dataclass
+class MockLLMConfig:
+    """
+    latency: "fixed:S", "uniform:MIN:MAX", "exponential:MEDIA" o "lognormal:MEDIANA:SIGMA" (segundos)
+    error_rate: fracción de peticiones que fallan con un código de error_statuses
+    hang_rate: fracción de peticiones que tardan hang_seconds (para ejercitar timeouts y hedging)
+    token_delay: pausa entre fragmentos en streaming
+    """
+    latency: str = "lognormal:0.8:0.5"
+    error_rate: float = 0.0
+    error_statuses: Tuple[int, ...] = (429, 500, 503)
+    hang_rate: float = 0.0
+    hang_seconds: float = 60.0
+    token_delay: float = 0.02
+    seed: int = 0
+    canned: Dict[str, str] = field(default_factory=dict)  # regex del prompt -> respuesta
+
+    @classmethod
+    def from_env(cls) -> "MockLLMConfig":
+        """Configuración desde MOCK_LLM_LATENCY, MOCK_LLM_ERROR_RATE, MOCK_LLM_HANG_RATE, MOCK_LLM_SEED"""
+        return cls(
+            latency=os.getenv("MOCK_LLM_LATENCY", cls.latency),
+            error_rate=float(os.getenv("MOCK_LLM_ERROR_RATE", "0")),
+            hang_rate=float(os.getenv("MOCK_LLM_HANG_RATE", "0")),
+            seed=int(os.getenv("MOCK_LLM_SEED", "0"))
+        )
+
+
+def sample_latency(spec: str, rng: random.Random) -> float:
+    kind, *params = spec.split(':')
+    values = [float(p) for p in params]
+    if kind == 'fixed':
+        return values[0]
+    if kind == 'uniform':
+        return rng.uniform(values[0], values[1])
+    if kind == 'exponential':
+        return rng.expovariate(1 / values[0])
+    if kind == 'lognormal':
+        return rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Distribución de latencia desconocida: {spec}")
+
+
+class FaultInjector:
+    """
+    Decide latencia y fallo de cada petición. La petición n usa un generador sembrado con
+    (seed, n): con el mismo orden de llegada, la secuencia de latencias y errores se repite.
+    """
+
+    def __init__(self, config: MockLLMConfig):
+        self.config = config
+        self._counter = itertools.count()
+
+    def next(self) -> Tuple[float, Optional[int]]:
+        """(segundos de espera, código de error o None)"""
+        rng = random.Random(f"{self.config.seed}:{next(self._counter)}")
+        if rng.random() < self.config.hang_rate:
+            return self.config.hang_seconds, None
+        latency = sample_latency(self.config.latency, rng)
+        if rng.random() < self.config.error_rate:
+            return latency, rng.choice(self.config.error_statuses)
+        return latency, None
+
+
+class MockResponder:
+    """Texto de respuesta para un prompt: canned por regex, JSON por reglas o texto fijo"""
+
+    _USER_TEXT = re.compile(r'Texto del usuario:\s*"(.*?)"\s*\n', re.DOTALL)
+
+    def __init__(self, config: MockLLMConfig):
+        self.config = config
+        self._extractor = None
+        self._lock = threading.Lock()
+
+    def respond(self, prompt: str) -> str:
+        for pattern, response in self.config.canned.items():
+            if re.search(pattern, prompt):
+                return response
+        if re.search(r'\bJSON\b', prompt):
+            match = self._USER_TEXT.search(prompt)
+            raw_data, _ = self._rule_extractor().extract(match.group(1) if match else prompt)
+            return json.dumps(raw_data, ensure_ascii=False)
+        return CANNED_RESPONSE
+
+    def _rule_extractor(self):
+        with self._lock:
+            if self._extractor is None:
+                from agents.rule_extractor import RuleBasedExtractor
+                from model.catalog_names import CatalogNames
+                self._extractor = RuleBasedExtractor(CatalogNames())
+            return self._extractor
+
+
+def split_chunks(text: str) -> List[str]:
+    """Fragmentos de streaming: palabras con su espacio previo"""
+    return re.findall(r'\s*\S+', text) or [text]
+
+
+class _ChatCompletionsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # conexiones persistentes, como la API real
+    server: "MockLLMServer"
+
+    def do_GET(self):
+        if self.path.rstrip('/') in ('/v1/models', '/models'):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        elif self.path == '/health':
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.path.rstrip('/') not in ('/v1/chat/completions', '/chat/completions'):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+
+        prompt = "\n".join(str(m.get('content', '')) for m in body.get('messages', []))
+        model = body.get('model', 'mock')
+        latency, status = self.server.faults.next()
+        time.sleep(latency)
+        if status is not None:
+            self._send_json(status, {"error": {"message": f"Error simulado ({status})", "type": "mock_error",
+                                               "code": status}})
+            return
+
+        content = self.server.responder.respond(prompt)
+        completion_id = f"chatcmpl-mock-{next(self.server.ids)}"
+        if body.get('stream'):
+            self._stream(completion_id, model, content)
+            return
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(content)
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        })
+
+    def _stream(self, completion_id: str, model: str, content: str):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def event(delta: Dict, finish_reason: Optional[str] = None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            self._write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+
+        try:
+            event({"role": "assistant", "content": ""})
+            for piece in split_chunks(content):
+                event({"content": piece})
+                time.sleep(self.server.config.token_delay)
+            event({}, "stop")
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente abandonó el flujo (p. ej. cancelado por hedging)
+            self.close_connection = True
+
+    def _write_chunk(self, text: str):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: Dict):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """Servidor chat-completions local; base_url para OpenAIClient: server.base_url"""
+    daemon_threads = True
+
+    def __init__(self, port: int = 8099, host: str = '127.0.0.1', config: Optional[MockLLMConfig] = None):
+        super().__init__((host, port), _ChatCompletionsHandler)
+        self.config = config or MockLLMConfig()
+        self.faults = FaultInjector(self.config)
+        self.responder = MockResponder(self.config)
+        self.ids = itertools.count(1)
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """Atiende peticiones en un hilo daemon"""
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class MockDeadlineExceeded(Exception):
+    """Equivalente simulado de google.api_core.exceptions.DeadlineExceeded"""
+    code = 504
+
+
+class MockGeminiAPIError(Exception):
+    def __init__(self, message: str, code: int):
+        super().__init__(message)
+        self.code = code
+
+
+class _FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _FakeAsyncStream:
+    def __init__(self, chunks: List[str], token_delay: float):
+        self._chunks = chunks
+        self._token_delay = token_delay
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            yield _FakeResponse(chunk)
+            await asyncio.sleep(self._token_delay)
+
+
+class _FakeGenerativeModel:
+    """Sustituto de genai.GenerativeModel: misma interfaz que usa GeminiClient"""
+
+    def __init__(self, config: MockLLMConfig):
+        self.config = config
+        self.faults = FaultInjector(config)
+        self.responder = MockResponder(config)
+
+    def _plan(self, request_options: Optional[Dict]) -> Tuple[float, Optional[Exception]]:
+        latency, status = self.faults.next()
+        timeout = (request_options or {}).get('timeout')
+        if timeout is not None and latency > timeout:
+            return timeout, MockDeadlineExceeded(f"Deadline Exceeded ({timeout:g}s)")
+        if status is not None:
+            return latency, MockGeminiAPIError(f"Error simulado ({status})", status)
+        return latency, None
+
+    def generate_content(self, prompt: str, stream: bool = False, request_options: Optional[Dict] = None, **kwargs):
+        latency, error = self._plan(request_options)
+        time.sleep(latency)
+        if error is not None:
+            raise error
+        text = self.responder.respond(prompt)
+        if not stream:
+            return _FakeResponse(text)
+        return self._iter_chunks(text)
+
+    def _iter_chunks(self, text: str) -> Iterator[_FakeResponse]:
+        for chunk in split_chunks(text):
+            yield _FakeResponse(chunk)
+            time.sleep(self.config.token_delay)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False,
+                                     request_options: Optional[Dict] = None, **kwargs):
+        latency, error = self._plan(request_options)
+        await asyncio.sleep(latency)
+        if error is not None:
+            raise error
+        text = self.responder.respond(prompt)
+        if not stream:
+            return _FakeResponse(text)
+        return _FakeAsyncStream(split_chunks(text), self.config.token_delay)
+
+
+class FakeGeminiClient(GeminiClient):
+    """GeminiClient sin red ni API key: mismo proveedor, métricas y manejo de errores que el real"""
+
+    def __init__(self, model: str = "gemini-1.5-flash", timeout: float = 30.0,
+                 config: Optional[MockLLMConfig] = None, sdk_retries: bool = True):
+        self.config = config or MockLLMConfig.from_env()
+        super().__init__(model=model, timeout=timeout, sdk_retries=sdk_retries)
+
+    def _initialize_client(self):
+        return _FakeGenerativeModel(self.config)
@@ -0,0 +1,132 @@
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Intervalo de sondeo mientras se espera un resultado (para cancelar peticiones abandonadas)
+POLL_INTERVAL = 0.05
+
+
+def _configured_workers() -> int:
+    """PROCESS_POOL_WORKERS=0 desactiva el pool y ejecuta en el hilo llamante"""
+    value = os.getenv("PROCESS_POOL_WORKERS")
+    if value is None or value == "":
+        return os.cpu_count() or 1
+    return max(0, int(value))
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """Devuelve el pool persistente del proceso (se crea en el primer uso)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = _configured_workers()
+            if workers == 0:
+                return None
+            context = multiprocessing.get_context(os.getenv("PROCESS_POOL_START_METHOD", "spawn"))
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            print(f"[ProcessPool] Pool iniciado con {workers} procesos")
+        return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown_process_pool)
+
+
+def run_in_pool(func: Callable, *args, should_stop: Optional[Callable[[], bool]] = None) -> Any:
+    """
+    Ejecuta func(*args) en el pool de procesos y espera el resultado.
+
+    func debe ser una función de módulo y sus argumentos serializables con pickle.
+    Si should_stop() se vuelve verdadero mientras se espera, la tarea se cancela
+    (si aún no empezó) y se devuelve None; las tareas en curso reciben su propio plazo.
+    Sin pool configurado, o si el pool se rompe, se ejecuta en el hilo actual.
+    """
+    pool = get_process_pool()
+    if pool is None:
+        return func(*args)
+
+    try:
+        future = pool.submit(func, *args)
+    except (BrokenProcessPool, RuntimeError) as e:
+        print(f"[ProcessPool] Pool no disponible ({e}); ejecutando en el hilo actual")
+        shutdown_process_pool()
+        return func(*args)
+
+    while True:
+        try:
+            return future.result(timeout=POLL_INTERVAL)
+        except FutureTimeoutError:
+            if should_stop is not None and should_stop():
+                future.cancel()
+                return None
+        except BrokenProcessPool as e:
+            print(f"[ProcessPool] Un proceso del pool terminó inesperadamente ({e}); reintentando en el hilo actual")
+            shutdown_process_pool()
+            return func(*args)
+
+
+def map_in_pool(func: Callable, arg_list: List[tuple],
+                should_stop: Optional[Callable[[], bool]] = None) -> Optional[List[Any]]:
+    """
+    Ejecuta func(*args) para cada tupla de arg_list en paralelo en el pool y devuelve los
+    resultados en el mismo orden.
+
+    Si should_stop() se vuelve verdadero mientras se espera, se cancelan las tareas que aún
+    no empezaron y se devuelve None. Sin pool configurado las tareas se ejecutan una tras otra
+    en el hilo actual; si el pool se rompe, las que faltan también.
+    """
+    pool = get_process_pool()
+    if pool is None:
+        results = []
+        for args in arg_list:
+            if should_stop is not None and should_stop():
+                return None
+            results.append(func(*args))
+        return results
+
+    try:
+        futures = [pool.submit(func, *args) for args in arg_list]
+    except (BrokenProcessPool, RuntimeError) as e:
+        print(f"[ProcessPool] Pool no disponible ({e}); ejecutando en el hilo actual")
+        shutdown_process_pool()
+        return [func(*args) for args in arg_list]
+
+    results = []
+    for i, future in enumerate(futures):
+        while True:
+            try:
+                results.append(future.result(timeout=POLL_INTERVAL))
+                break
+            except FutureTimeoutError:
+                if should_stop is not None and should_stop():
+                    for pending in futures[i:]:
+                        pending.cancel()
+                    return None
+            except BrokenProcessPool as e:
+                print(f"[ProcessPool] Un proceso del pool terminó inesperadamente ({e}); "
+                      f"ejecutando {len(futures) - i} tareas en el hilo actual")
+                shutdown_process_pool()
+                return results + [func(*args) for args in arg_list[i:]]
+    return results
+
+
+def deadline_checker(deadline: Optional[float]) -> Callable[[], bool]:
+    """Condición de parada para procesos del pool a partir de un plazo absoluto (time.time())"""
+    if deadline is None:
+        return lambda: False
+    return lambda: time.time() >= deadline
@@ -0,0 +1,267 @@
+import ast
+import re
+import string
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, FrozenSet, List, Sequence, Set, Tuple
+
+import numpy as np
+
+
+class RuleSyntaxError(ValueError):
+    """Expresión de regla o de característica fuera del lenguaje admitido"""
+
+
+def _text(value: Any) -> str:
+    return value if isinstance(value, str) else ('' if value is None else str(value))
+
+
+def _number(value: Any) -> float:
+    """Primer número del texto ("300 mm" -> 300.0); NaN si no hay (las comparaciones con NaN son falsas)"""
+    match = re.search(r'[\d.]+', _text(value))
+    try:
+        return float(match.group()) if match else float('nan')
+    except ValueError:
+        return float('nan')
+
+
+def _first_of(value: Any, table: Sequence[str]) -> str:
+    """Primera entrada de la tabla contenida en el texto, en el orden de la tabla; '' si ninguna"""
+    text = _text(value)
+    return next((entry for entry in table if entry in text), '')
+
+
+def _digit_windows(value: Any, size: Any) -> FrozenSet[str]:
+    """Todas las secuencias de `size` dígitos consecutivos del texto (equivale a buscar la subcadena)"""
+    text, size = _text(value), int(size)
+    return frozenset(text[i:i + size] for i in range(len(text) - size + 1) if text[i:i + size].isdigit())
+
+
+# Funciones admitidas en las características (se evalúan una vez por componente)
+FEATURE_FUNCTIONS: Dict[str, Callable] = {
+    'text': _text,
+    'strip': lambda value: _text(value).strip(),
+    'lower': lambda value: _text(value).lower(),
+    'upper': lambda value: _text(value).upper(),
+    'removeprefix': lambda value, prefix: _text(value).removeprefix(prefix),
+    'contains': lambda value, part: part in _text(value),
+    'number': _number,
+    'match': lambda value, pattern: (re.search(pattern, _text(value)) or [''])[0],
+    'first_of': _first_of,
+    'tokens_in': lambda value, table: frozenset(entry for entry in table if entry in _text(value)),
+    'digit_windows': _digit_windows,
+}
+
+
+class Feature:
+    """
+    Característica de un componente definida como expresión sobre sus key_features, p. ej.
+    "removeprefix(strip(socket), 'Socket ')". Los nombres sueltos son claves de key_features
+    ('model_name' es el nombre del modelo) o tablas de búsqueda.
+    """
+
+    def __init__(self, expression: str, tables: Dict[str, Any]):
+        self.expression = expression
+        self.tables = tables
+        try:
+            self._tree = ast.parse(expression, mode='eval').body
+        except SyntaxError as e:
+            raise RuleSyntaxError(f"Característica inválida '{expression}': {e}") from e
+        self.reads: Set[str] = set()
+        self._validate(self._tree)
+
+    def _validate(self, node: ast.AST):
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FEATURE_FUNCTIONS or node.keywords:
+                raise RuleSyntaxError(f"Función no admitida en '{self.expression}'")
+            for arg in node.args:
+                self._validate(arg)
+        elif isinstance(node, ast.Name):
+            if node.id not in self.tables:
+                self.reads.add(node.id)
+        elif not isinstance(node, ast.Constant):
+            raise RuleSyntaxError(f"Elemento no admitido en '{self.expression}': {type(node).__name__}")
+
+    def _eval(self, node: ast.AST, key_features: Dict[str, Any], model_name: str) -> Any:
+        if isinstance(node, ast.Call):
+            args = [self._eval(arg, key_features, model_name) for arg in node.args]
+            return FEATURE_FUNCTIONS[node.func.id](*args)
+        if isinstance(node, ast.Name):
+            if node.id in self.tables:
+                return self.tables[node.id]
+            return model_name if node.id == 'model_name' else key_features.get(node.id, '')
+        return node.value
+
+    def __call__(self, key_features: Dict[str, Any], model_name: str) -> Any:
+        return self._eval(self._tree, key_features, model_name)
+
+
+def feature_array(values: List[Any]) -> np.ndarray:
+    """Columna de una característica: bool o float si todos los valores lo son; si no, object"""
+    if values and all(isinstance(v, (bool, np.bool_)) for v in values):
+        return np.array(values, dtype=bool)
+    if values and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return np.array(values, dtype=float)
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _codes(left: Any, right: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """Codifica dos operandos de texto con un vocabulario común para compararlos como enteros"""
+    left, right = np.asarray(left, dtype=object), np.asarray(right, dtype=object)
+    _, inverse = np.unique(np.concatenate([left.ravel(), right.ravel()]).astype(str), return_inverse=True)
+    return inverse[:left.size].reshape(left.shape), inverse[left.size:].reshape(right.shape)
+
+
+def _membership(values: Any, sets: Any) -> np.ndarray:
+    """values[i] in sets[j] con broadcasting, mediante una matriz de pertenencia (conjunto x vocabulario)"""
+    values, sets = np.asarray(values, dtype=object), np.asarray(sets, dtype=object)
+    vocabulary = {}
+    for entries in sets.ravel():
+        for entry in entries:
+            vocabulary.setdefault(entry, len(vocabulary))
+    members = np.zeros((sets.size, len(vocabulary) + 1), dtype=bool)  # última columna: fuera del vocabulario
+    for row, entries in enumerate(sets.ravel()):
+        members[row, [vocabulary[entry] for entry in entries]] = True
+    value_codes = np.array([vocabulary.get(v, len(vocabulary)) for v in values.ravel()], dtype=np.intp)
+    return members[np.arange(sets.size).reshape(sets.shape), value_codes.reshape(values.shape)]
+
+
+_COMPARATORS = {
+    ast.Eq: np.equal, ast.NotEq: np.not_equal,
+    ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater, ast.GtE: np.greater_equal,
+}
+
+
+class CompiledRule:
+    """
+    Regla entre dos tipos de componente escrita como una lista de comprobaciones
+    (expresión, motivo si falla), p. ej.
+        ("CPU.socket == MOTHERBOARD.socket", "Socket incompatible: CPU ({CPU.socket}) vs ...")
+    Las expresiones combinan características de ambos lados con ==, !=, <, <=, >, >=, in,
+    and, or y not. Se compilan a operaciones NumPy con broadcasting: compatible() devuelve de
+    una vez la matriz booleana (n_primero, n_segundo). Llamarla con dos componentes, como
+    los validadores clásicos, devuelve (compatible, motivo) con el motivo de la primera
+    comprobación que falla.
+    """
+
+    def __init__(self, name: str, first: str, second: str, checks: List[Tuple[str, str]],
+                 features: Dict[str, Dict[str, Feature]]):
+        """
+        :param first/second: alias de cada lado en las expresiones (p. ej. 'MOTHERBOARD', 'CPU')
+        :param features: {alias: {nombre: Feature}}
+        """
+        self.__name__ = name
+        self.first, self.second = first, second
+        self.features = {alias: features.get(alias, {}) for alias in (first, second)}
+        self.checks = []
+        used: Set[Tuple[str, str]] = set()
+        for expression, reason in checks:
+            try:
+                tree = ast.parse(expression, mode='eval').body
+            except SyntaxError as e:
+                raise RuleSyntaxError(f"Regla {name}: expresión inválida '{expression}': {e}") from e
+            used |= self._validate(tree, expression)
+            for _, field, _, _ in string.Formatter().parse(reason):
+                if field:
+                    used.add(self._reference(*field.split('.', 1), expression=reason))
+            self.checks.append((expression, tree, reason))
+        # Características que usa la regla por lado
+        self.uses: Dict[str, List[str]] = {
+            alias: sorted(field for a, field in used if a == alias) for alias in (first, second)
+        }
+        # key_features que lee cada lado (firma de la regla)
+        self.reads = tuple(
+            tuple(sorted(set().union(*(self.features[alias][f].reads for f in self.uses[alias]))))
+            for alias in (first, second)
+        )
+
+    def _reference(self, alias: str, field: str = '', expression: str = '') -> Tuple[str, str]:
+        if alias not in self.features or field not in self.features[alias]:
+            raise RuleSyntaxError(f"Regla {self.__name__}: característica desconocida '{alias}.{field}' en '{expression}'")
+        return alias, field
+
+    def _validate(self, node: ast.AST, expression: str) -> Set[Tuple[str, str]]:
+        """Comprueba que la expresión esté en el lenguaje y devuelve las características que usa"""
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+            return {self._reference(node.value.id, node.attr, expression)}
+        if isinstance(node, ast.Constant):
+            return set()
+        if isinstance(node, ast.BoolOp):
+            return set().union(*(self._validate(v, expression) for v in node.values))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return self._validate(node.operand, expression)
+        if isinstance(node, ast.Compare) and all(type(op) in _COMPARATORS or isinstance(op, (ast.In, ast.NotIn))
+                                                 for op in node.ops):
+            return set().union(*(self._validate(v, expression) for v in [node.left] + node.comparators))
+        raise RuleSyntaxError(f"Regla {self.__name__}: elemento no admitido en '{expression}': {type(node).__name__}")
+
+    def _columns(self, alias: str, components: Sequence[Any], shape: Tuple[int, int]) -> Dict[str, np.ndarray]:
+        return {
+            field: feature_array([self.features[alias][field](c.key_features, c.model_name) for c in components]
+                                 ).reshape(shape)
+            for field in self.uses[alias]
+        }
+
+    def _eval(self, node: ast.AST, env: Dict[str, Dict[str, np.ndarray]]) -> Any:
+        if isinstance(node, ast.Attribute):
+            return env[node.value.id][node.attr]
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.BoolOp):
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            result = self._eval(node.values[0], env)
+            for value in node.values[1:]:
+                result = combine(result, self._eval(value, env))
+            return result
+        if isinstance(node, ast.UnaryOp):
+            return np.logical_not(self._eval(node.operand, env))
+
+        # Comparación (encadenada: a < b <= c equivale a a < b and b <= c)
+        result, left = True, self._eval(node.left, env)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = self._eval(comparator, env)
+            if isinstance(op, (ast.In, ast.NotIn)):
+                value = _membership(left, right)
+                value = np.logical_not(value) if isinstance(op, ast.NotIn) else value
+            elif isinstance(op, (ast.Eq, ast.NotEq)) and (np.asarray(left).dtype == object
+                                                           or np.asarray(right).dtype == object):
+                value = _COMPARATORS[type(op)](*_codes(left, right))
+            else:
+                with np.errstate(invalid='ignore'):
+                    value = _COMPARATORS[type(op)](left, right)
+            result = np.logical_and(result, value)
+            left = right
+        return result
+
+    def compatible(self, first: Sequence[Any], second: Sequence[Any]) -> np.ndarray:
+        """Matriz (len(first), len(second)): True si el par cumple todas las comprobaciones"""
+        result = np.ones((len(first), len(second)), dtype=bool)
+        if not self.checks or not len(first) or not len(second):
+            return result
+        env = {
+            self.first: self._columns(self.first, first, (len(first), 1)),
+            self.second: self._columns(self.second, second, (1, len(second)))
+        }
+        for _, tree, _ in self.checks:
+            result &= np.broadcast_to(self._eval(tree, env), result.shape)
+        return result
+
+    def __call__(self, first: Any, second: Any) -> Tuple[bool, str]:
+        env = {self.first: self._columns(self.first, [first], (1, 1)),
+               self.second: self._columns(self.second, [second], (1, 1))}
+        for _, tree, reason in self.checks:
+            if not np.all(self._eval(tree, env)):
+                values = {alias: SimpleNamespace(**{f: column.item() for f, column in columns.items()})
+                          for alias, columns in env.items()}
+                return False, reason.format(**values)
+        return True, "Compatible"
+
+
+def compile_features(definitions: Dict[str, Dict[str, str]], tables: Dict[str, Any]) -> Dict[str, Dict[str, Feature]]:
+    """{alias: {nombre: expresión}} -> {alias: {nombre: Feature}}; 'model_name' siempre disponible"""
+    return {
+        alias: {'model_name': Feature('model_name', tables),
+                **{name: Feature(expression, tables) for name, expression in fields.items()}}
+        for alias, fields in definitions.items()
+    }
@@ -0,0 +1,170 @@
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from model.metrics import SEMANTIC_CACHE_LOOKUPS, SEMANTIC_CACHE_HIT_RATIO, SEMANTIC_CACHE_EVICTIONS
+
+# Cantidades del texto: "$1.500", "1500usd", "$1.5k", "2 mil", "1080p", "144 fps".
+# "k" solo multiplica junto a una moneda (como en el extractor por reglas): "4K" es una resolución
+_CURRENCY = r'(?:\$|us\$|usd|d[oó]lares|dollars|euros?|eur|€)'
+_NUMBER = re.compile(rf'({_CURRENCY}\s*)?(\d+(?:[.,]\d+)*)\s*(?:(mil)\b|(k)\b(\s*{_CURRENCY})?)?', re.IGNORECASE)
+
+
+def extract_numbers(text: str) -> Tuple[float, ...]:
+    """Cantidades mencionadas en el texto, normalizadas y ordenadas ($1.5k == $1500 == $1,500)"""
+    numbers = set()
+    for prefix, digits, thousands, k, suffix in _NUMBER.findall(text):
+        if re.fullmatch(r'\d{1,3}([.,]\d{3})+', digits):
+            value = float(re.sub(r'[.,]', '', digits))  # separador de miles
+        else:
+            value = float(digits.replace(',', '.'))
+        if thousands or (k and (prefix or suffix)):
+            value *= 1000
+        numbers.add(value)
+    return tuple(sorted(numbers))
+
+
+class SemanticRequirementsCache:
+    """
+    Caché de requisitos extraídos indexada por el embedding de la entrada del usuario.
+
+    Una consulta reutiliza los requisitos de una entrada anterior si la similitud coseno
+    supera `threshold` y las cantidades del texto (presupuesto, FPS, resolución) son las
+    mismas: "PC gamer barata 1080p" y "gaming barato a 1080p" comparten resultado, pero
+    "gaming hasta $1000" y "gaming hasta $1500" no.
+
+    La búsqueda es aproximada (LSH por hiperplanos aleatorios): `num_tables` tablas de
+    `num_bits` bits; los candidatos de los buckets coincidentes se ordenan por coseno exacto.
+    Las entradas caducan tras `ttl` segundos y, por encima de `max_entries`, se expulsa la
+    menos usada recientemente.
+    """
+
+    def __init__(self, embedding_model: Any, threshold: float = 0.9, max_entries: int = 2000,
+                 ttl: float = 24 * 3600, num_tables: int = 8, num_bits: int = 8, seed: int = 0):
+        """
+        :param embedding_model: Modelo con encode() (el MiniLM ya cargado por las bases vectoriales)
+        """
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.seed = seed
+        self._planes: Optional[np.ndarray] = None   # (num_tables * num_bits, dim)
+        self._buckets: List[Dict[int, set]] = [{} for _ in range(num_tables)]
+        # id -> (embedding, números, requisitos, bucket por tabla, creación)
+        self._entries: "OrderedDict[int, Tuple[np.ndarray, tuple, Any, Tuple[int, ...], float]]" = OrderedDict()
+        self._created: "deque[Tuple[float, int]]" = deque()  # (creación, id) en orden de inserción, para el TTL
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embedding_model.encode([text])[0], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _bucket_keys(self, vector: np.ndarray) -> Tuple[int, ...]:
+        if self._planes is None:
+            rng = np.random.default_rng(self.seed)
+            self._planes = rng.standard_normal((self.num_tables * self.num_bits, vector.shape[0])).astype(np.float32)
+        bits = (self._planes @ vector > 0).reshape(self.num_tables, self.num_bits)
+        weights = 1 << np.arange(self.num_bits)
+        return tuple(int(k) for k in bits @ weights)
+
+    def lookup(self, text: str, vector: Optional[np.ndarray] = None) -> Optional[Any]:
+        """Requisitos de la entrada anterior más parecida que cumpla umbral y cantidades; None si no hay"""
+        vector = self.embed(text) if vector is None else vector
+        numbers = extract_numbers(text)
+        with self._lock:
+            self._expire()
+            keys = self._bucket_keys(vector)
+            candidates = set()
+            for table, key in enumerate(keys):
+                candidates |= self._buckets[table].get(key, set())
+
+            best_id, best_sim, rejected = None, self.threshold, False
+            for entry_id in candidates:
+                embedding, entry_numbers, _, _, _ = self._entries[entry_id]
+                similarity = float(embedding @ vector)
+                if similarity < best_sim:
+                    continue
+                if entry_numbers != numbers:
+                    rejected = True
+                    continue
+                best_id, best_sim = entry_id, similarity
+
+            if best_id is None:
+                return self._record('number_mismatch' if rejected else 'miss', None)
+            self._entries.move_to_end(best_id)
+            requirements = self._entries[best_id][2]
+        print(f"[SemanticCache] Requisitos reutilizados (similitud {best_sim:.3f})")
+        return self._record('hit', copy.deepcopy(requirements))
+
+    def store(self, text: str, requirements: Any, vector: Optional[np.ndarray] = None):
+        vector = self.embed(text) if vector is None else vector
+        with self._lock:
+            keys = self._bucket_keys(vector)
+            entry_id = self._next_id
+            self._next_id += 1
+            created = time.time()
+            self._entries[entry_id] = (vector, extract_numbers(text), copy.deepcopy(requirements), keys, created)
+            self._created.append((created, entry_id))
+            for table, key in enumerate(keys):
+                self._buckets[table].setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                SEMANTIC_CACHE_EVICTIONS.inc(reason='size')
+            if len(self._created) > 2 * len(self._entries):
+                # Ids ya expulsados por tamaño: se descartan para que la cola no crezca sin límite
+                self._created = deque(item for item in self._created if item[1] in self._entries)
+
+    def _expire(self):
+        """Expulsa las entradas caducadas; solo recorre las más antiguas de la cola de creación"""
+        cutoff = time.time() - self.ttl
+        expired = 0
+        while self._created and self._created[0][0] < cutoff:
+            _, entry_id = self._created.popleft()
+            if entry_id in self._entries:
+                self._remove(entry_id)
+                expired += 1
+        if expired:
+            SEMANTIC_CACHE_EVICTIONS.inc(expired, reason='ttl')
+
+    def _remove(self, entry_id: int):
+        _, _, _, keys, _ = self._entries.pop(entry_id)
+        for table, key in enumerate(keys):
+            bucket = self._buckets[table][key]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[table][key]
+
+    def _record(self, result: str, requirements: Optional[Any]) -> Optional[Any]:
+        if result == 'hit':
+            self.hits += 1
+        else:
+            self.misses += 1
+        SEMANTIC_CACHE_LOOKUPS.inc(result=result)
+        SEMANTIC_CACHE_HIT_RATIO.set(self.hit_rate())
+        return requirements
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate(),
+                    'entries': len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._created.clear()
+            self._buckets = [{} for _ in range(self.num_tables)]
@@ -0,0 +1,73 @@
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+
+class SessionRecorder:
+    """
+    Graba cada actualización del blackboard en disco, un archivo por petición.
+    Cada archivo es una secuencia de registros pickle:
+    {'section', 'data', 'agent_id', 'timestamp', 'notify'}
+    El primer registro es siempre el 'user_input' que abrió la petición.
+    """
+
+    def __init__(self, blackboard, output_dir: str = "sessions"):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._file = None
+        self._lock = threading.Lock()
+        self.current_path = None
+        blackboard.add_observer(self._on_update)
+
+    def _on_update(self, section: str, entry):
+        with self._lock:
+            if section == 'user_input':
+                self._open_session()
+            if self._file is None:
+                return  # Actualizaciones previas a la primera petición
+            try:
+                pickle.dump({
+                    'section': section,
+                    'data': entry.data,
+                    'agent_id': entry.agent_id,
+                    'timestamp': entry.timestamp
+                }, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+                self._file.flush()
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                print(f"[SessionRecorder] No se pudo grabar '{section}' de {entry.agent_id}: {str(e)}")
+
+    def _open_session(self):
+        self.close()
+        name = f"session_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{time.time_ns() % 10**6:06d}.pkl"
+        self.current_path = self.output_dir / name
+        self._file = open(self.current_path, 'wb')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def load_session(path: str) -> List[Dict[str, Any]]:
+    """Lee todos los registros de una sesión grabada"""
+    records = []
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                records.append(pickle.load(f))
+            except EOFError:
+                break
+    return records
+
+
+def iter_session_files(paths: List[str]) -> Iterator[Path]:
+    """Expande archivos y directorios a la lista ordenada de sesiones .pkl"""
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            yield from sorted(path.glob("*.pkl"))
+        else:
+            yield path
@@ -0,0 +1,85 @@
+import builtins
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+
+class StartupProfiler:
+    """
+    Perfilador de arranque: mide el tiempo de cada import hecho desde el código de la
+    aplicación (acumulado, incluyendo sus dependencias) y de las fases marcadas con phase().
+    Solo mide imports del hilo que lo activa.
+    """
+
+    def __init__(self):
+        self.imports: Dict[str, float] = {}
+        self.phases: List[Tuple[str, float]] = []
+        self._original_import = None
+        self._thread = None
+        self._depth = 0
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if (threading.get_ident() != self._thread or level != 0
+                or self._depth > 0 or name in sys.modules):
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self._depth -= 1
+            self.imports[name] = self.imports.get(name, 0.0) + time.perf_counter() - start
+
+    def start(self):
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            self._thread = threading.get_ident()
+            builtins.__import__ = self._timed_import
+
+    def stop(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Mide una fase del arranque (p. ej. carga de embeddings)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self, top: int = 15) -> str:
+        lines = ["[StartupProfiler] Fases de arranque:"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<40} {seconds * 1000:9.1f} ms")
+        lines.append(f"[StartupProfiler] Imports más costosos (acumulado, top {top}):")
+        for name, seconds in sorted(self.imports.items(), key=lambda x: -x[1])[:top]:
+            lines.append(f"  {name:<40} {seconds * 1000:9.1f} ms")
+        lines.append(f"  {'TOTAL imports medidos':<40} {sum(self.imports.values()) * 1000:9.1f} ms")
+        return "\n".join(lines)
+
+
+class _NullProfiler:
+    """Sustituto sin coste cuando el perfilado está desactivado"""
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    @contextmanager
+    def phase(self, name: str):
+        yield
+
+    def report(self, top: int = 15) -> str:
+        return ""
+
+
+def get_startup_profiler(enabled: bool):
+    return StartupProfiler() if enabled else _NullProfiler()
@@ -1,15 +1,51 @@
-import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from tqdm import tqdm
 import re
 import pickle
+import threading
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas, tqdm y sentence_transformers se importan en el primer uso: son los
+# módulos más pesados del arranque y no hacen falta para cargar embeddings ya guardados
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_embedding_model(model_name: str):
+    """Devuelve el SentenceTransformer compartido del proceso (se carga una sola vez)"""
+    with _models_lock:
+        if model_name not in _models:
+            from sentence_transformers import SentenceTransformer
+            _models[model_name] = SentenceTransformer(model_name)
+        return _models[model_name]
+
+
+class LazyEmbeddingModel:
+    """
+    Referencia al modelo de embeddings que lo carga en la primera llamada (p. ej. encode).
+    Permite construir los agentes sin pagar la carga del modelo en el arranque.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def __getattr__(self, name):
+        return getattr(get_embedding_model(self.model_name), name)
+
+    def __getstate__(self):
+        return {'model_name': self.model_name}
+
+    def __setstate__(self, state):
+        self.model_name = state['model_name']
+
 
 class CSVToEmbeddings:
     def __init__(self, embedding_model_name: str = 'all-MiniLM-L6-v2'):
         self.embedding_model_name = embedding_model_name
-        self.embedding_model = SentenceTransformer(embedding_model_name)
+        self.embedding_model = LazyEmbeddingModel(embedding_model_name)
         self.component_types = {
             'CPU': ['Details_# of Cores# of Cores', 'CPU Socket Type_CPU Socket Type', 
                    'Details_Operating FrequencyOperating Frequency'],
@@ -17,12 +53,13 @@ class CSVToEmbeddings:
         }
 
     def _clean_text(self, text: str) -> str:
+        import pandas as pd
         if pd.isna(text):
             return ""
         text = re.sub(r'[^\w\s.-]', ' ', str(text))
         return re.sub(r'\s+', ' ', text).strip()
 
-    def _create_dynamic_description(self, row: pd.Series) -> str:
+    def _create_dynamic_description(self, row: 'pd.Series') -> str:
         """Incluye TODOS los campos técnicos del CSV, con limpieza automática"""
         desc_parts = []
         
@@ -52,6 +89,8 @@ class CSVToEmbeddings:
         return ". ".join(desc_parts)
 
     def process_csv(self, csv_path: str, batch_size: int = 32) -> dict:
+        import pandas as pd
+        from tqdm import tqdm
         try:
             df = pd.read_csv(csv_path)
         except UnicodeDecodeError:
@@ -143,7 +182,7 @@ class CSVToEmbeddings:
                 'embeddings': embeddings,
                 'metadata': meta_data['metadata'],
                 'model_name': meta_data['model_name'], 
-                'model': SentenceTransformer(meta_data['model_name']),
+                'model': LazyEmbeddingModel(meta_data['model_name']),
                 'component_type': meta_data['component_type']
             }
         except FileNotFoundError:
@@ -0,0 +1,190 @@
+"""
+Reproduce offline sesiones grabadas con SessionRecorder (RECORD_SESSIONS_DIR en app.py).
+
+Ejecuta las etapas posteriores a las propuestas (compatibilidad y optimización) sobre las
+propuestas grabadas, sin LLM ni embeddings, para medir y perfilar CompatibilityAgent y
+OptimizationAgent con entradas reales.
+
+Uso:
+    python src/replay_sessions.py sessions/ --stage compatibility --repeat 5
+    python src/replay_sessions.py sessions/session_x.pkl --stage optimization --profile
+
+Para resultados reproducibles del genético usar PROCESS_POOL_WORKERS=0 y --seed.
+"""
+import argparse
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import random
+import statistics
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from blackboard import Blackboard
+from agents.compatibility_agent import CompatibilityAgent, CompatibilityConflicts, RuleId
+from agents.optimization_agent import OptimizationAgent
+from model.session_recorder import load_session, iter_session_files
+
+STAGES = ('compatibility', 'optimization')
+
+
+def _build_summary(builds: List[Dict]) -> List[tuple]:
+    return [(b.get('label'), b.get('total_price')) for b in builds or []]
+
+
+def _as_conflicts(issues: Any, consolidated: Dict[str, List[Dict]]) -> CompatibilityConflicts:
+    """
+    Incompatibilidades grabadas en forma compacta. Las sesiones anteriores a CompatibilityConflicts
+    guardaban una lista de CompatibilityIssue: se trasladan a posiciones por nombre de modelo.
+    """
+    if isinstance(issues, CompatibilityConflicts):
+        return issues
+    # Nombre de los validadores de entonces
+    rule_ids = {
+        '_validate_socket_compatibility': RuleId.SOCKET,
+        '_validate_chipset_compatibility': RuleId.CHIPSET,
+        '_validate_pcie_compatibility': RuleId.PCIE,
+        '_validate_size_compatibility': RuleId.SIZE,
+        '_validate_ram_type_compatibility': RuleId.RAM_TYPE,
+        '_validate_ram_speed_compatibility': RuleId.RAM_SPEED,
+        '_validate_tdp_compatibility': RuleId.TDP,
+        '_validate_socket_support': RuleId.SOCKET_SUPPORT,
+        '_validate_power_compatibility': RuleId.POWER,
+    }
+    positions: Dict[str, Dict[str, List[int]]] = {}
+    for comp_type, candidates in consolidated.items():
+        for position, candidate in enumerate(candidates):
+            name = candidate['metadata'].get('Model_Name', 'Unknown')
+            positions.setdefault(comp_type, {}).setdefault(name, []).append(position)
+
+    found: Dict[tuple, set] = {}
+    for issue in issues or []:
+        type_a, type_b = issue.component_a.type.value, issue.component_b.type.value
+        for index_a in positions.get(type_a, {}).get(issue.component_a.model_name, []):
+            for index_b in positions.get(type_b, {}).get(issue.component_b.model_name, []):
+                found.setdefault((type_a, type_b), set()).add((index_a, index_b, int(rule_ids[issue.rule])))
+    return CompatibilityConflicts({pair: np.array(sorted(rows), dtype=np.int32) for pair, rows in found.items()})
+
+
+def replay_session(records: List[Dict[str, Any]], stage: str = 'compatibility') -> Dict[str, Any]:
+    """
+    Reproduce una sesión desde la etapa indicada.
+    - compatibility: reinyecta las propuestas; se ejecutan compatibilidad y optimización.
+    - optimization: reinyecta propuestas e incompatibilidades grabadas; solo optimización.
+    Devuelve el tiempo de las etapas reproducidas y la comparación con lo grabado.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Etapa desconocida: {stage}. Opciones: {', '.join(STAGES)}")
+
+    proposals = [r for r in records if r['section'] == 'component_proposals']
+    recorded = {r['section']: r['data'] for r in records}
+
+    blackboard = Blackboard(len({r['agent_id'] for r in proposals}), request_timeout=float('inf'), synchronous=True)
+    if stage == 'compatibility':
+        # Las sesiones grabadas contienen todas las incompatibilidades, también las de pares ya críticos
+        CompatibilityAgent(blackboard, short_circuit=False)
+    OptimizationAgent(blackboard)
+
+    for record in records:
+        if record['section'] in ('user_input', 'user_requirements'):
+            blackboard.update(record['section'], record['data'], record['agent_id'], notify=False)
+
+    elapsed = 0.0
+    if stage == 'compatibility':
+        for i, record in enumerate(proposals):
+            last = i == len(proposals) - 1
+            start = time.perf_counter()
+            # La última propuesta dispara (de forma síncrona) compatibilidad y optimización
+            blackboard.update('component_proposals', record['data'], record['agent_id'], notify=True)
+            if last:
+                elapsed = time.perf_counter() - start
+    else:
+        for record in proposals:
+            blackboard.update('component_proposals', record['data'], record['agent_id'], notify=False)
+        blackboard.actual_components_agent_proposal = blackboard.total_components_agent_proposal
+        start = time.perf_counter()
+        conflicts = _as_conflicts(recorded.get('compatibility_issues'), blackboard.get_consolidated_components())
+        blackboard.update('compatibility_issues', conflicts, 'compatibility_agent', notify=True)
+        elapsed = time.perf_counter() - start
+
+    issues = blackboard.get('compatibility_issues') or []
+    builds = _build_summary(blackboard.get('optimized_configs'))
+    expected_issues = recorded.get('compatibility_issues') or []
+    expected_builds = _build_summary(recorded.get('optimized_configs'))
+
+    # La build más económica es determinista; la del genético puede variar entre corridas
+    cheapest = [b for b in builds if b[0] == "Build Más Económica"]
+    expected_cheapest = [b for b in expected_builds if b[0] == "Build Más Económica"]
+
+    return {
+        'elapsed': elapsed,
+        'issues': len(issues),
+        'expected_issues': len(expected_issues),
+        'builds': builds,
+        'expected_builds': expected_builds,
+        'match': len(issues) == len(expected_issues) and cheapest == expected_cheapest,
+        'errors': blackboard.get('errors') or []
+    }
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce sesiones grabadas del blackboard")
+    parser.add_argument('paths', nargs='+', help="Archivos .pkl o directorios de sesiones")
+    parser.add_argument('--stage', choices=STAGES, default='compatibility')
+    parser.add_argument('--repeat', type=int, default=1, help="Repeticiones por sesión")
+    parser.add_argument('--seed', type=int, default=None, help="Semilla para el genético (ejecución en el hilo)")
+    parser.add_argument('--profile', action='store_true', help="Perfil cProfile acumulado de todas las corridas")
+    parser.add_argument('--verbose', action='store_true', help="Mostrar la salida de los agentes")
+    args = parser.parse_args()
+
+    files = list(iter_session_files(args.paths))
+    if not files:
+        print("No se encontraron sesiones")
+        return
+
+    profiler = cProfile.Profile() if args.profile else None
+    timings, mismatches = [], 0
+
+    for path in files:
+        records = load_session(str(path))
+        for _ in range(args.repeat):
+            if args.seed is not None:
+                random.seed(args.seed)
+            sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with sink:
+                if profiler:
+                    profiler.enable()
+                result = replay_session(records, args.stage)
+                if profiler:
+                    profiler.disable()
+            timings.append(result['elapsed'])
+            mismatches += 0 if result['match'] else 1
+            status = "OK" if result['match'] else "DIFERENTE"
+            print(f"{path.name}: {result['elapsed'] * 1000:.1f} ms | issues {result['issues']}"
+                  f" (grabado {result['expected_issues']}) | builds {result['builds']} | {status}"
+                  + (f" | errores {len(result['errors'])}" if result['errors'] else ""))
+
+    print(f"\nCorridas: {len(timings)} | sesiones: {len(files)} | etapa: {args.stage}"
+          f" | workers: {os.getenv('PROCESS_POOL_WORKERS', 'auto')}")
+    print(f"media {statistics.mean(timings) * 1000:.1f} ms | p50 {_percentile(timings, 0.5) * 1000:.1f} ms"
+          f" | p95 {_percentile(timings, 0.95) * 1000:.1f} ms | máx {max(timings) * 1000:.1f} ms"
+          f" | diferencias con lo grabado: {mismatches}")
+
+    if profiler:
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(25)
+        print(stream.getvalue())
+
+
+if __name__ == "__main__":
+    main()
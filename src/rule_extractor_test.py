@@ -0,0 +1,34 @@
+from agents.rule_extractor import RuleBasedExtractor, normalize_text
+
+# (consulta, presupuesto esperado)
+budget_cases = [
+    ("PC gaming 1440p bajo $1500", {'min': None, 'max': 1500.0}),
+    ("PC de 1000 dolares para oficina", {'min': None, 'max': 1000.0}),
+    ("Quiero más de $800 en una PC de edición", {'min': 800.0, 'max': None}),
+    ("entre 800 y 1200 dolares para jugar", {'min': 800.0, 'max': 1200.0}),
+    # Negaciones: son máximos, no mínimos
+    ("No quiero gastar más de $1000 en un PC gamer", {'min': None, 'max': 1000.0}),
+    ("PC para jugar que no cueste más de 900 euros", {'min': None, 'max': 900.0}),
+    ("PC gamer sin pasar de 1200 dólares", {'min': None, 'max': 1200.0}),
+    ("PC gamer con 32gb, no rgb, más de $1000", {'min': 1000.0, 'max': None}),
+    # Cantidades que no son dinero
+    ("PC con 16 GB de RAM por $1000", {'min': None, 'max': 1000.0}),
+    ("PC para jugar en 4K con presupuesto de 1500", {'min': None, 'max': 1500.0}),
+    ("PC gaming 1440p de 2k", {'min': None, 'max': None}),
+]
+
+
+def run_budget_cases():
+    extractor = RuleBasedExtractor()
+    failures = 0
+    for text, expected in budget_cases:
+        budget = extractor._extract_budget(normalize_text(text))
+        if budget != expected:
+            failures += 1
+            print(f"❌ {text!r}: {budget} (esperado {expected})")
+    print(f"{len(budget_cases) - failures}/{len(budget_cases)} casos de presupuesto correctos")
+    return failures
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if run_budget_cases() else 0)